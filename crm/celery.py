@@ -28,6 +28,48 @@ app.conf.beat_schedule = {
         "schedule": 60.0,  # every minute
     },
 
+    # 🔹 Recommender — retrain models nightly on the full rating history
+    "recommender-retrain-recommenders": {
+        "task": "recommender.tasks.retrain_recommenders",
+        "schedule": crontab(minute=0, hour=2),  # every day at 2:00 AM
+    },
+
+    # 🔹 Recommender — materialize per-customer recommendations nightly
+    "recommender-refresh-recommendation-cache": {
+        "task": "recommender.tasks.refresh_recommendation_cache",
+        "schedule": crontab(minute=30, hour=2),  # every day at 2:30 AM
+    },
+
+    # 🔹 Recommender — fold invoices whose scheduled co-purchase update was lost
+    "recommender-update-copurchase-baskets": {
+        "task": "recommender.tasks.update_copurchase_baskets",
+        "schedule": crontab(minute="*/10"),  # every 10 minutes
+    },
+
+    # 🔹 CRM — rebuild the dashboard's daily metric rollups nightly
+    "crmapp-rebuild-metric-rollups": {
+        "task": "crmapp.tasks.rebuild_metric_rollups",
+        "schedule": crontab(minute=0, hour=3),  # every day at 3:00 AM
+    },
+
+    # 🔹 CRM — resume import jobs whose worker died
+    "crmapp-resume-stale-import-jobs": {
+        "task": "crmapp.tasks.resume_stale_import_jobs",
+        "schedule": crontab(minute="*/5"),  # every 5 minutes
+    },
+
+    # 🔹 CRM — delete week-old export files
+    "crmapp-purge-export-jobs": {
+        "task": "crmapp.tasks.purge_export_jobs",
+        "schedule": crontab(minute=30, hour=3),  # every day at 3:30 AM
+    },
+
+    # 🔹 CRM — rebuild the lead / customer / quotation / invoice search index nightly
+    "crmapp-refresh-search-index": {
+        "task": "crmapp.tasks.refresh_search_index",
+        "schedule": crontab(minute=0, hour=4),  # every day at 4:00 AM
+    },
+
     # Example: your email sender tasks (uncomment when ready)
     # 'send-hot-lead-emails-every-day-11-12': {
     #     'task': 'email_sender.tasks.send_hot_lead_emails',
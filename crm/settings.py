@@ -148,6 +148,20 @@ REST_FRAMEWORK = {
     ],
 }
 
+# ------------------------------------------------------
+# CACHE
+# ------------------------------------------------------
+# One cache shared by every gunicorn worker and celery process: the
+# generation counters that invalidate per-process copies (rating store,
+# product catalogue, dashboard metrics / charts, export watermark) are only
+# seen by other processes through a shared cache, not a per-process LocMemCache.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": os.environ.get("CACHE_URL", "redis://localhost:6379/1"),
+    }
+}
+
 # ------------------------------------------------------
 # CELERY
 # ------------------------------------------------------
@@ -0,0 +1,226 @@
+# crmapp/dashboard_metrics.py
+"""
+Metrics behind the admin landing page (crmapp.views.index).
+
+Once the daily rollups (crmapp.rollups) are built, date-range charts sum
+rollup rows; before that every chart is computed from the raw tables with
+conditional aggregation (Count(..., filter=Q())). Either way the page
+needs about six queries instead of one per label, and the result is
+cached per date-range combination. Saves / deletes of the
+underlying models (see crmapp.signals) bump a generation counter that is
+part of the cache key, so every process sees fresh numbers right after a
+change.
+"""
+import datetime
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.utils.dateparse import parse_date
+
+from . import rollups
+from .models import Product, invoice, lead_management, main_followup, quotation, service_management
+
+
+CACHE_TTL = 10 * 60
+GENERATION_CACHE_KEY = "crmapp:dashboard_metrics:generation"
+
+LEAD_TYPES = [
+    ("Hot", "Hot"),
+    ("Warm", "Warm"),
+    ("Cold", "Cold"),
+    ("NotInterested", "NotInterested"),
+    ("LossOfOrder", "LossofOrder"),      # (chart label, stored value)
+]
+PRODUCT_CATEGORIES = ["Pest Control", "Fumigation", "Product Sell"]
+FOLLOWUP_REMARKS = [
+    "Call not received",
+    "Give next Follow up date",
+    "Call Out of Coverage Area",
+]
+ORDER_STATUSES = ["Close Win", "Close Loss", "Not Closed"]
+
+# query-string keys that change the numbers
+RANGE_PARAMS = [
+    "start_date", "end_date",
+    "start_date_followup", "end_date_followup",
+    "start_date_service", "end_date_service",
+    "start_date_qo", "end_date_qo", "filter_type",
+    "start_date_order", "end_date_order",
+]
+
+
+# ------------------------
+# Cache invalidation
+# ------------------------
+def generation():
+    generation = cache.get(GENERATION_CACHE_KEY)
+    if generation is None:
+        generation = 1
+        cache.add(GENERATION_CACHE_KEY, generation, None)
+    return generation
+
+
+def invalidate():
+    """Make every cached snapshot stale (called on saves / deletes of the source models)."""
+    try:
+        cache.incr(GENERATION_CACHE_KEY)
+    except ValueError:
+        cache.set(GENERATION_CACHE_KEY, 2, None)
+
+
+def _range(params, start_key, end_key):
+    """(start, end) dates when both parse, else None."""
+    start, end = parse_date(params.get(start_key) or ""), parse_date(params.get(end_key) or "")
+    if start and end:
+        return start, end
+    return None
+
+
+# ------------------------
+# Queries
+# ------------------------
+def _lead_counts(params):
+    leads = lead_management.objects.all()
+    dates = _range(params, "start_date", "end_date")
+    if dates:
+        leads = leads.filter(enquirydate__range=dates)
+    counts = leads.aggregate(**{
+        f"n{i}": Count("id", filter=Q(typeoflead=value)) for i, (_, value) in enumerate(LEAD_TYPES)
+    })
+    return [counts[f"n{i}"] for i in range(len(LEAD_TYPES))]
+
+
+def _product_counts():
+    counts = Product.objects.aggregate(**{
+        f"n{i}": Count("product_id", filter=Q(category=category)) for i, category in enumerate(PRODUCT_CATEGORIES)
+    })
+    return [counts[f"n{i}"] for i in range(len(PRODUCT_CATEGORIES))]
+
+
+def _followup_counts(params):
+    """Follow-up remark counts (by lead enquiry date) and order status counts (by created_at), one query."""
+    remark_q = Q()
+    dates = _range(params, "start_date_followup", "end_date_followup")
+    if dates:
+        remark_q = Q(lead__enquirydate__range=dates)
+
+    order_q = Q()
+    dates = _range(params, "start_date_order", "end_date_order")
+    if dates:
+        order_q = Q(created_at__gte=dates[0], created_at__lt=dates[1] + datetime.timedelta(days=1))
+
+    aggregates = {
+        f"r{i}": Count("id", filter=remark_q & Q(followup_remark=label)) for i, label in enumerate(FOLLOWUP_REMARKS)
+    }
+    aggregates.update({
+        f"o{i}": Count("id", filter=order_q & Q(order_status=label)) for i, label in enumerate(ORDER_STATUSES)
+    })
+    counts = main_followup.objects.aggregate(**aggregates)
+    return (
+        [counts[f"r{i}"] for i in range(len(FOLLOWUP_REMARKS))],
+        [counts[f"o{i}"] for i in range(len(ORDER_STATUSES))],
+    )
+
+
+def _contract_type_counts(params):
+    services = service_management.objects.all()
+    dates = _range(params, "start_date_service", "end_date_service")
+    if dates:
+        services = services.filter(service_date__gte=dates[0], service_date__lte=dates[1])
+    rows = services.values("contract_type").annotate(count=Count("id")).order_by("contract_type")
+    return [r["contract_type"] for r in rows], [r["count"] for r in rows]
+
+
+def _quotation_order_counts(params):
+    dates = _range(params, "start_date_qo", "end_date_qo")
+    filter_type = params.get("filter_type")
+    if dates and filter_type == "quotation":
+        return quotation.objects.filter(quotation_date__range=dates).count(), invoice.objects.count()
+    if dates and filter_type == "invoice":
+        return quotation.objects.count(), invoice.objects.filter(date__range=dates).count()
+    if dates:
+        return 0, 0
+    return quotation.objects.count(), invoice.objects.count()
+
+
+# ------------------------
+# Rollup-backed queries (crmapp.rollups), used once rollups are built
+# ------------------------
+def _rollup_counts(name, dates, dimensions=None):
+    start, end = dates or (None, None)
+    totals = rollups.totals(name, start, end)
+    if dimensions is None:
+        return totals
+    return [totals.get(d, (0, 0))[0] for d in dimensions]
+
+
+def _rollup_total(name, dates):
+    return sum(count for count, _ in _rollup_counts(name, dates).values())
+
+
+def _rollup_metrics(params):
+    contract = _rollup_counts("service", _range(params, "start_date_service", "end_date_service"))
+    dates = _range(params, "start_date_qo", "end_date_qo")
+    filter_type = params.get("filter_type")
+    if dates and filter_type not in ("quotation", "invoice"):
+        quotations_count = orders_count = 0
+    else:
+        quotations_count = _rollup_total("quotation", dates if filter_type == "quotation" else None)
+        orders_count = _rollup_total("invoice", dates if filter_type == "invoice" else None)
+    return {
+        "lead_counts": _rollup_counts(
+            "lead", _range(params, "start_date", "end_date"), [value for _, value in LEAD_TYPES]
+        ),
+        "followup_counts": _rollup_counts(
+            "followup_remark", _range(params, "start_date_followup", "end_date_followup"), FOLLOWUP_REMARKS
+        ),
+        "order_status_counts": _rollup_counts(
+            "order_status", _range(params, "start_date_order", "end_date_order"), ORDER_STATUSES
+        ),
+        "contract_labels": list(contract),
+        "contract_counts": [count for count, _ in contract.values()],
+        "quotations_count": quotations_count,
+        "orders_count": orders_count,
+    }
+
+
+def _raw_metrics(params):
+    followup_data, order_status_data = _followup_counts(params)
+    contract_labels, contract_counts = _contract_type_counts(params)
+    quotations_count, orders_count = _quotation_order_counts(params)
+    return {
+        "lead_counts": _lead_counts(params),
+        "followup_counts": followup_data,
+        "order_status_counts": order_status_data,
+        "contract_labels": contract_labels,
+        "contract_counts": contract_counts,
+        "quotations_count": quotations_count,
+        "orders_count": orders_count,
+    }
+
+
+def compute_metrics(params):
+    counts = _rollup_metrics(params) if rollups.is_ready() else _raw_metrics(params)
+    return dict(
+        counts,
+        lead_labels=[label for label, _ in LEAD_TYPES],
+        product_labels=PRODUCT_CATEGORIES,
+        product_counts=_product_counts(),
+        followup_labels=FOLLOWUP_REMARKS,
+        order_status_labels=ORDER_STATUSES,
+    )
+
+
+def get_dashboard_metrics(params):
+    """Cached metrics snapshot for the date ranges in `params` (e.g. request.GET)."""
+    relevant = {key: params.get(key) or "" for key in RANGE_PARAMS}
+    digest = hashlib.md5(json.dumps(relevant, sort_keys=True).encode()).hexdigest()
+    key = f"crmapp:dashboard_metrics:{generation()}:{digest}"
+
+    metrics = cache.get(key)
+    if metrics is None:
+        metrics = compute_metrics(relevant)
+        cache.set(key, metrics, CACHE_TTL)
+    return metrics
@@ -0,0 +1,421 @@
+# crmapp/exports.py
+"""
+Streaming CSV / XLSX exports of the CRM lists.
+
+An Export names its columns (key, header, values() path) and the views
+hand it the same filtered queryset the list page shows (crmapp.list_filters).
+Rows are read as values_list() tuples CHUNK_SIZE at a time, so no model
+instances are built and only one chunk is in memory at a time. When the
+ordering is on non-null fields ending with the primary key (leads, invoices,
+sales persons, products) chunks are fetched by keyset (WHERE key > last
+key ... LIMIT CHUNK_SIZE), because MySQLdb buffers a whole result set
+client-side even under iterator(); other orderings use
+iterator(chunk_size=CHUNK_SIZE).
+
+- CSV is written row by row straight into a StreamingHttpResponse;
+- XLSX goes through an openpyxl write-only workbook (rows are flushed to
+  its temporary part files as they are appended) into a temporary file
+  that is then streamed back with FileResponse.
+
+Query string: `format=csv|xlsx` and `columns=key,key,...` (default: all).
+
+Big lead / invoice exports can also run as ExportJob rows in the background
+(crmapp.tasks.run_export_job), written to MEDIA_ROOT/exports/. A job's
+cache_key hashes the kind, format, columns, filters, the user's lead scope
+and a watermark of the source tables (a generation counter that
+crmapp.signals bumps on saves / deletes, plus row count and max id, which
+also catch bulk inserts). Asking again for an export of unchanged data
+returns the finished job's file at once; the requester is e-mailed a link
+when a new file is ready. Only the requester, or users of the same scope,
+may open a job; a queued / running job silent for STALE_AFTER (its worker
+died) is marked failed and the next request queues a fresh one.
+"""
+import csv
+import datetime
+import hashlib
+import json
+import tempfile
+import time
+
+import openpyxl
+from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist
+from django.core.files import File
+from django.db.models import Count, F, Max, Q
+from django.http import FileResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils import timezone
+
+from . import list_filters
+from .models import (
+    BankAccounts, ExportJob, Product, SalesPerson, TaxInvoice, TaxInvoiceItem, customer_details,
+    lead_management, quotation_management,
+)
+
+
+CHUNK_SIZE = 2000
+GENERATION_CACHE_KEY = "crmapp:exports:generation"
+JOB_TTL = datetime.timedelta(days=7)
+STALE_AFTER = datetime.timedelta(minutes=10)
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+class Column:
+    def __init__(self, key, header, path=None):
+        self.key = key
+        self.header = header
+        self.path = path or key
+
+
+class Export:
+    def __init__(self, name, columns):
+        self.name = name
+        self.columns = columns
+
+    def select(self, keys):
+        """Columns whose key is in `keys` (in export order); all columns if none match."""
+        keys = {key.strip() for key in keys if key.strip()}
+        return [c for c in self.columns if c.key in keys] or self.columns
+
+    def rows(self, queryset, columns):
+        paths = [c.path for c in columns]
+        keys = _keyset(queryset)
+        if keys is None:
+            return queryset.values_list(*paths).iterator(chunk_size=CHUNK_SIZE)
+        return _keyset_rows(queryset, paths, keys)
+
+
+def _keyset(queryset):
+    """Attnames of the ordering and its direction, if the queryset can be paged by keyset; else None."""
+    opts = queryset.model._meta
+    names, directions = [], set()
+    for order in queryset.query.order_by:
+        if not isinstance(order, str):
+            return None
+        name = order.lstrip("-")
+        try:
+            field = opts.pk if name == "pk" else opts.get_field(name)
+        except FieldDoesNotExist:
+            return None
+        if field.null or (field.is_relation and not field.many_to_one):
+            return None
+        names.append(field.attname)
+        directions.add(order.startswith("-"))
+    if not names or names[-1] != opts.pk.attname or len(directions) != 1:
+        return None
+    return names, directions.pop()
+
+
+def _keyset_rows(queryset, paths, keys):
+    names, descending = keys
+    lookup = "lt" if descending else "gt"
+    aliases = [f"export_key_{i}" for i in range(len(names))]
+    queryset = queryset.annotate(**{alias: F(name) for alias, name in zip(aliases, names)})
+    last = None
+    while True:
+        page = queryset
+        if last is not None:
+            # (a, b, pk) > (la, lb, lpk) spelled out for the ORM
+            after = Q()
+            for i, alias in enumerate(aliases):
+                step = Q(**{f"{alias}__{lookup}": last[i]})
+                for prev, value in zip(aliases[:i], last[:i]):
+                    step &= Q(**{prev: value})
+                after |= step
+            page = page.filter(after)
+        batch = list(page.values_list(*paths, *aliases)[:CHUNK_SIZE])
+        for row in batch:
+            yield row[:len(paths)]
+        if len(batch) < CHUNK_SIZE:
+            return
+        last = batch[-1][len(paths):]
+
+
+def _model_columns(model, paths=None):
+    """One column per concrete field, headed like the old exports ('Customer Type')."""
+    paths = paths or {}
+    return [
+        Column(f.name, f.name.replace('_', ' ').title(), paths.get(f.name, f.name))
+        for f in model._meta.fields
+    ]
+
+
+LEADS = Export("leads_full", _model_columns(lead_management, {"salesperson": "salesperson__full_name"}))
+CUSTOMERS = Export("customer_list", _model_columns(customer_details))
+SALES_PERSONS = Export("sales_persons", [
+    Column("full_name", "Full Name"),
+    Column("date_of_joining", "Date of Joining"),
+    Column("mobile_no", "Mobile No"),
+    Column("email", "Email"),
+    Column("date_of_birth", "Date of Birth"),
+])
+PRODUCTS = Export("product_list", [
+    Column("product_name", "Name"),
+    Column("category", "Category"),
+])
+# one row per invoice item (see invoice_items)
+INVOICES = Export("invoice_list", [
+    Column("invoice_no", "Invoice No", "tax_invoice__tax_invoice_no"),
+    Column("quotation_no", "Quotation No", "tax_invoice__quotation__quotation_no"),
+    Column("customer", "Customer Name", "tax_invoice__customer__fullname"),
+    Column("bank", "Bank Name", "tax_invoice__bank__bank_name"),
+    Column("created_at", "Created At", "tax_invoice__created_at"),
+    Column("grand_total", "Grand Total", "tax_invoice__grand_total"),
+    Column("product_name", "Product Name"),
+    Column("hsn_code", "HSN Code"),
+    Column("quantity", "Quantity"),
+    Column("unit", "Unit"),
+    Column("price", "Price"),
+    Column("gst_percent", "GST %"),
+    Column("gst_amount", "GST Amount"),
+    Column("total", "Total"),
+])
+
+
+def invoice_items(invoices):
+    """Items of the TaxInvoice queryset `invoices`, in the invoices' order."""
+    items = TaxInvoiceItem.objects.filter(tax_invoice__in=invoices.values("pk"))
+    ordering = list(invoices.query.order_by)
+    if ordering in (["id"], ["-id"]):
+        sign = ordering[0][:-2]
+        return items.order_by(f"{sign}tax_invoice_id", f"{sign}id")
+    ordering = [f"-tax_invoice__{o[1:]}" if o.startswith("-") else f"tax_invoice__{o}" for o in ordering]
+    return items.order_by(*ordering, "tax_invoice_id", "id")
+
+
+def sales_persons():
+    return SalesPerson.objects.order_by("id")
+
+
+def products(category=None):
+    items = Product.objects.order_by("product_id")
+    if category and category != "all":
+        items = items.filter(category=category)
+    return items
+
+
+# ------------------------
+# Writers
+# ------------------------
+class _Echo:
+    """File-like object whose write() returns the value, for csv.writer into a generator."""
+
+    def write(self, value):
+        return value
+
+
+def _local(value):
+    if isinstance(value, datetime.datetime) and timezone.is_aware(value):
+        return timezone.localtime(value).replace(tzinfo=None)
+    return value
+
+
+def _csv_value(value):
+    value = _local(value)
+    if isinstance(value, datetime.datetime):
+        return value.strftime('%Y-%m-%d %H:%M')
+    return value
+
+
+def _xlsx_value(value):
+    value = _local(value)
+    if isinstance(value, str):
+        return ILLEGAL_CHARACTERS_RE.sub("", value)
+    return value
+
+
+def csv_lines(columns, rows):
+    """Encoded CSV lines: the header, then one per row."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow([c.header for c in columns])
+    for row in rows:
+        yield writer.writerow([_csv_value(v) for v in row])
+
+
+def write_xlsx(file, columns, rows):
+    """Write an XLSX workbook of `rows` into the binary file `file`."""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet()
+    ws.append([c.header for c in columns])
+    for row in rows:
+        ws.append([_xlsx_value(v) for v in row])
+    wb.save(file)
+
+
+def write_csv(file, columns, rows):
+    """Write CSV lines of `rows` into the binary file `file`."""
+    for line in csv_lines(columns, rows):
+        file.write(line.encode("utf-8"))
+
+
+def export_response(request, export, queryset):
+    """Stream `queryset` as the CSV or XLSX (`?format=`) download of `export`."""
+    columns = export.select(request.GET.get("columns", "").split(","))
+    rows = export.rows(queryset, columns)
+
+    if request.GET.get("format") == "xlsx":
+        file = tempfile.TemporaryFile()
+        write_xlsx(file, columns, rows)
+        file.seek(0)
+        return FileResponse(
+            file, as_attachment=True, filename=f"{export.name}.xlsx", content_type=XLSX_CONTENT_TYPE
+        )
+
+    response = StreamingHttpResponse(csv_lines(columns, rows), content_type="text/csv")
+    response["Content-Disposition"] = f'attachment; filename="{export.name}.csv"'
+    return response
+
+
+# ------------------------
+# Background jobs
+# ------------------------
+# kind: (export, queryset(params, user), source tables of the watermark)
+JOBS = {
+    "leads": (
+        LEADS,
+        lambda params, user: list_filters.filter_leads(params, user),
+        [lead_management, SalesPerson],
+    ),
+    "customers": (
+        CUSTOMERS,
+        lambda params, user: list_filters.filter_customers(params),
+        [customer_details],
+    ),
+    "invoices": (
+        INVOICES,
+        lambda params, user: invoice_items(list_filters.filter_tax_invoices(params)),
+        [TaxInvoice, TaxInvoiceItem, customer_details, quotation_management, BankAccounts],
+    ),
+}
+SOURCE_MODELS = {model for _, _, models in JOBS.values() for model in models}
+IGNORED_PARAMS = {"page", "format", "columns"}
+
+
+def generation():
+    generation = cache.get(GENERATION_CACHE_KEY)
+    if generation is None:
+        # start from the clock, so a counter lost from the cache never repeats an old value
+        cache.add(GENERATION_CACHE_KEY, int(time.time()), None)
+        generation = cache.get(GENERATION_CACHE_KEY)
+    return generation
+
+
+def invalidate():
+    """Make every cached export stale (called on saves / deletes of the source models)."""
+    try:
+        cache.incr(GENERATION_CACHE_KEY)
+    except ValueError:
+        cache.set(GENERATION_CACHE_KEY, int(time.time()), None)
+
+
+def watermark(kind):
+    marks = [generation()]
+    for model in JOBS[kind][2]:
+        counts = model.objects.aggregate(n=Count("pk"), last=Max("pk"))
+        marks.append(f"{model._meta.model_name}:{counts['n']}:{counts['last']}")
+    return marks
+
+
+def job_cache_key(kind, file_format, columns, params, scope):
+    payload = {
+        "kind": kind,
+        "format": file_format,
+        "columns": columns,
+        "params": sorted(params.items()),
+        "scope": scope,
+        "watermark": watermark(kind),
+    }
+    return hashlib.sha256(json.dumps(payload, default=str).encode()).hexdigest()
+
+
+def job_scope(kind, user):
+    """Rows `user` may export of `kind`: their lead_scope for leads, 'all' otherwise."""
+    return list_filters.lead_scope(user) if kind == "leads" else "all"
+
+
+def can_access(job, user):
+    """Whether `user` may see / download `job`: their own, or one of exactly their scope."""
+    return job.created_by_id == user.pk or job.scope == job_scope(job.kind, user)
+
+
+def fail_stale_jobs(jobs):
+    """Mark queued / running jobs of `jobs` with no progress for STALE_AFTER as failed (worker lost)."""
+    return jobs.filter(
+        status__in=[ExportJob.QUEUED, ExportJob.RUNNING], updated_at__lt=timezone.now() - STALE_AFTER
+    ).update(status=ExportJob.FAILED, error="The export stopped making progress; please request it again.")
+
+
+def request_job(kind, request):
+    """
+    (job, created) for this request's export: a finished ExportJob with the
+    same cache key (data unchanged), one still making progress, or a new
+    queued one (created=True; the caller starts crmapp.tasks.run_export_job).
+    """
+    export = JOBS[kind][0]
+    file_format = "csv" if request.GET.get("format") == "csv" else "xlsx"
+    columns = ",".join(c.key for c in export.select(request.GET.get("columns", "").split(",")))
+    params = {k: v for k, v in request.GET.items() if k not in IGNORED_PARAMS and v}
+    scope = job_scope(kind, request.user)
+    key = job_cache_key(kind, file_format, columns, params, scope)
+
+    fail_stale_jobs(ExportJob.objects.filter(cache_key=key))
+    for job in ExportJob.objects.filter(cache_key=key).exclude(status=ExportJob.FAILED).order_by("-id"):
+        if job.status != ExportJob.DONE or (job.file and job.file.storage.exists(job.file.name)):
+            return job, False
+
+    job = ExportJob.objects.create(
+        kind=kind, file_format=file_format, params=params, columns=columns, scope=scope,
+        cache_key=key, created_by=request.user,
+    )
+    return job, True
+
+
+def run_job(job_id):
+    """Write the file of ExportJob `job_id`; returns the finished job (None if already taken)."""
+    claimed = ExportJob.objects.filter(pk=job_id, status=ExportJob.QUEUED).update(
+        status=ExportJob.RUNNING, updated_at=timezone.now()
+    )
+    if not claimed:
+        return None
+    job = ExportJob.objects.select_related("created_by").get(pk=job_id)
+    export, build_queryset, _ = JOBS[job.kind]
+    columns = export.select(job.columns.split(","))
+
+    def counted(rows):
+        for row in rows:
+            job.row_count += 1
+            if job.row_count % CHUNK_SIZE == 0:
+                ExportJob.objects.filter(pk=job.pk).update(row_count=job.row_count, updated_at=timezone.now())  # progress
+            yield row
+
+    try:
+        rows = counted(export.rows(build_queryset(job.params, job.created_by), columns))
+        with tempfile.TemporaryFile() as file:
+            (write_xlsx if job.file_format == "xlsx" else write_csv)(file, columns, rows)
+            file.seek(0)
+            job.file.save(f"{export.name}_{job.pk}.{job.file_format}", File(file), save=False)
+    except Exception as e:
+        ExportJob.objects.filter(pk=job.pk).update(status=ExportJob.FAILED, error=str(e), updated_at=timezone.now())
+        raise
+
+    job.status = ExportJob.DONE
+    job.finished_at = timezone.now()
+    job.save(update_fields=["file", "row_count", "status", "finished_at", "updated_at"])
+    print(f"✅ Export job {job.pk}: {job.row_count} rows written to {job.file.name}")
+    return job
+
+
+def download_url(job):
+    return settings.SITE_URL.rstrip("/") + reverse("download_export", args=[job.pk])
+
+
+def purge_jobs():
+    """Delete export jobs (and their files) older than JOB_TTL."""
+    old = ExportJob.objects.filter(created_at__lt=timezone.now() - JOB_TTL)
+    for job in old:
+        if job.file:
+            job.file.delete(save=False)
+    deleted, _ = old.delete()
+    return deleted
@@ -0,0 +1,55 @@
+# crmapp/followup_worklist.py
+"""
+Follow-up worklists for sales reps (crmapp.views.today_work and
+crmapp.views.pending_followups).
+
+A lead is due on the next_followup_date of its latest main_followup, or on
+its firstfollowupdate while it has no follow-up yet. annotate_latest_followup()
+puts that date (followup_date) and the latest follow-up's order status on
+every lead with correlated subqueries, so a worklist is one lead_management
+queryset: filtered, ordered and paginated in SQL, with a constant number of
+queries however long the backlog is.
+"""
+from django.db.models import Case, DateField, Exists, F, OuterRef, Subquery, When
+
+from .models import main_followup
+
+
+SORT_FIELDS = [
+    "customername", "primarycontact", "typeoflead", "sourceoflead", "customersegment",
+    "branch", "enquirydate", "followup_date", "salesperson__full_name",
+]
+
+
+def annotate_latest_followup(leads):
+    """Annotate `leads` with has_followup, latest_order_status and followup_date (the due date)."""
+    latest = main_followup.objects.filter(lead=OuterRef("pk")).order_by("-created_at", "-id")
+    return leads.annotate(
+        has_followup=Exists(main_followup.objects.filter(lead=OuterRef("pk"))),
+        latest_order_status=Subquery(latest.values("order_status")[:1]),
+    ).annotate(
+        # a follow-up without a next date (e.g. a closed order) takes the lead off the worklists
+        followup_date=Case(
+            When(has_followup=True, then=Subquery(latest.values("next_followup_date")[:1])),
+            default=F("firstfollowupdate"),
+            output_field=DateField(),
+        ),
+    )
+
+
+def due_on(leads, day):
+    """Leads whose follow-up is due on `day`."""
+    return annotate_latest_followup(leads).filter(followup_date=day)
+
+
+def overdue(leads, today):
+    """Leads whose follow-up was due before `today`."""
+    return annotate_latest_followup(leads).filter(followup_date__lt=today)
+
+
+def ordered(worklist, sort_by, descending=False):
+    """Order a worklist by one of SORT_FIELDS (customername otherwise), id as tie-break."""
+    if sort_by not in SORT_FIELDS:
+        sort_by = "customername"
+    prefix = "-" if descending else ""
+    return worklist.order_by(f"{prefix}{sort_by}", f"{prefix}id")
@@ -0,0 +1,430 @@
+# crmapp/importers.py
+"""
+Bulk importers for lead and customer uploads (crmapp.views.import_leads /
+import_customers).
+
+Rows are streamed from the upload: CSV is decoded line by line
+(codecs.iterdecode over the uploaded file), XLSX is read with openpyxl in
+read_only mode, so a 50k-row Justdial / Indiamart export is never held in
+memory as a whole. Rows are taken CHUNK_SIZE at a time and each chunk is
+
+1. cleaned column by column with the model fields' own clean() (types,
+   choices, e-mail / URL validators), salesperson names resolved from a
+   map of SalesPerson loaded once per import;
+2. checked for duplicates against the chunk, the earlier chunks and the
+   database with one `__in` query per unique field;
+3. inserted with bulk_create(batch_size=BATCH_SIZE) in its own
+   transaction. If the batch hits an IntegrityError it is retried row by
+   row (one savepoint each) so a single bad row only rejects itself.
+
+Rejected rows are written to a CSV error report (row number, reason and
+the original values) under REPORT_DIR in default storage; the views link
+it for download.
+
+Uploads run in the background as ImportJob rows (crmapp.tasks.run_import_job).
+Each chunk commits together with the job's checkpoint (rows consumed,
+counters, bytes of error report written), so a job whose worker died is
+claimed again once it has been silent for STALE_AFTER and resumes at its
+last committed chunk; report lines of the lost chunk are truncated away.
+bulk_create sends no post_save, so the importers note the `rollup_field`
+days they inserted rows for, and crmapp.tasks.run_import_job does what the
+signals would have once the job is done: queues the search index and the
+metric rollups of those days, and invalidates the dashboard and export
+caches. (Days of chunks committed by an earlier, dead worker are left to
+the nightly rollup rebuild.)
+"""
+import codecs
+import csv
+import datetime
+import os
+import traceback
+import uuid
+from itertools import islice
+
+import openpyxl
+from django.core.exceptions import ValidationError
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import ImportJob, SalesPerson, customer_details, lead_management
+
+
+CHUNK_SIZE = 1000
+BATCH_SIZE = 500
+REPORT_DIR = "import_reports"
+NULL_VALUES = {"", "null", "none", "nan", "n/a"}
+STALE_AFTER = datetime.timedelta(minutes=10)
+
+
+# ------------------------
+# Row sources
+# ------------------------
+def iter_csv_rows(file):
+    """(row number, values) for every data row of a CSV upload (header skipped)."""
+    reader = csv.reader(codecs.iterdecode(file, "utf-8-sig", errors="replace"))
+    next(reader, None)
+    for number, row in enumerate(reader, start=2):
+        if any(value.strip() for value in row):
+            yield number, row
+
+
+def iter_xlsx_rows(file):
+    """(row number, values) for every data row of the first sheet of an XLSX upload."""
+    wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        for number, row in enumerate(wb.active.iter_rows(min_row=2, values_only=True), start=2):
+            if any(value not in (None, "") for value in row):
+                yield number, row
+    finally:
+        wb.close()
+
+
+def file_extension(name):
+    return name.rsplit(".", 1)[-1].lower()
+
+
+def iter_upload_rows(file, extension):
+    if extension == "csv":
+        return iter_csv_rows(file)
+    if extension == "xlsx":
+        return iter_xlsx_rows(file)
+    raise ValueError("Unsupported file format. Please upload a CSV or XLSX file.")
+
+
+def count_rows(file, extension):
+    """Number of data rows (an upper bound for XLSX, from the sheet dimensions), None if unknown."""
+    if extension == "xlsx":
+        wb = openpyxl.load_workbook(file, read_only=True)
+        try:
+            max_row = wb.active.max_row
+        finally:
+            wb.close()
+        return max_row - 1 if max_row else None
+    return sum(1 for _ in iter_csv_rows(file))
+
+
+def chunked(rows, size=CHUNK_SIZE):
+    rows = iter(rows)
+    while True:
+        chunk = list(islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+# ------------------------
+# Result / error report
+# ------------------------
+class ImportResult:
+    """Running counters of an import, and its error report (an open text file, appended to)."""
+
+    def __init__(self, report, processed=0, created=0, rejected=0):
+        self.processed = processed
+        self.created = created
+        self.rejected = rejected
+        self.days = set()           # rollup days of the rows inserted by this run
+        self._report = report
+        self._writer = csv.writer(report)
+        if report.tell() == 0:
+            self._writer.writerow(["row", "error", "values"])
+
+    def reject(self, number, reason, row):
+        self._writer.writerow([number, reason, *["" if v is None else v for v in row]])
+        self.rejected += 1
+
+    def flush_report(self):
+        """Flush the report; returns its size in bytes."""
+        self._report.flush()
+        return self._report.tell()
+
+
+def _error_text(error):
+    if isinstance(error, ValidationError):
+        return "; ".join(error.messages)
+    return str(error)
+
+
+# ------------------------
+# Importers
+# ------------------------
+class BaseImporter:
+    """
+    Subclasses set `model`, `columns` ({format: {field name: column index}})
+    and `unique_fields`, and may override clean_row() for extra rules.
+    `rollup_field` is the date field crmapp.rollups counts the model's rows by.
+    """
+    model = None
+    columns = {}
+    unique_fields = ()
+    rollup_field = None
+
+    def __init__(self, file_format):
+        self.layout = self.columns[file_format]
+        self.fields = {name: self.model._meta.get_field(name) for name in self.layout}
+        self.seen = {name: set() for name in self.unique_fields}
+
+    def clean_value(self, field, raw):
+        if isinstance(raw, str):
+            raw = raw.strip()
+        if raw is None or (isinstance(raw, str) and raw.lower() in NULL_VALUES):
+            if field.has_default():
+                return field.get_default()
+            raw = None if field.null else ""
+        elif isinstance(raw, datetime.datetime) and field.get_internal_type() == "DateField":
+            raw = raw.date()
+        elif isinstance(raw, float) and raw.is_integer():
+            raw = int(raw)      # numbers from XLSX cells
+        elif field.choices and isinstance(raw, str):
+            raw = self._choice(field, raw)
+        return field.clean(raw, None)
+
+    def _choice(self, field, raw):
+        for value, _ in field.flatchoices:
+            if str(value).lower() == raw.lower():
+                return value
+        return raw
+
+    def clean_row(self, row):
+        values = {}
+        for name, index in self.layout.items():
+            raw = row[index] if index < len(row) else None
+            try:
+                values[name] = self.clean_value(self.fields[name], raw)
+            except ValidationError as e:
+                raise ValidationError(f"{name}: {_error_text(e)}")
+        return values
+
+    def _reject_duplicates(self, cleaned, result):
+        """Drop rows whose unique values repeat earlier rows or existing records (one query per field)."""
+        for name in self.unique_fields:
+            values = {v[name] for _, _, v in cleaned if v.get(name) is not None}
+            existing = set(
+                self.model.objects.filter(**{f"{name}__in": values}).values_list(name, flat=True)
+            ) if values else set()
+            kept = []
+            for number, row, v in cleaned:
+                value = v.get(name)
+                if value is not None and (value in existing or value in self.seen[name]):
+                    result.reject(number, f"{name}: duplicate value {value}", row)
+                    continue
+                if value is not None:
+                    self.seen[name].add(value)
+                kept.append((number, row, v))
+            cleaned = kept
+        return cleaned
+
+    def _insert(self, cleaned, result):
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_create(
+                    [self.model(**v) for _, _, v in cleaned], batch_size=BATCH_SIZE
+                )
+            result.created += len(cleaned)
+            if self.rollup_field:
+                result.days.update(v.get(self.rollup_field) for _, _, v in cleaned)
+        except IntegrityError:
+            for number, row, v in cleaned:
+                try:
+                    with transaction.atomic():
+                        self.model.objects.create(**v)
+                    result.created += 1
+                except IntegrityError as e:
+                    result.reject(number, _error_text(e), row)
+
+    def run(self, rows, result, checkpoint=None):
+        """
+        Import (number, values) rows into `result`. `checkpoint(result)` is
+        called inside each chunk's transaction, after its inserts.
+        """
+        for chunk in chunked(rows):
+            with transaction.atomic():
+                cleaned = []
+                for number, row in chunk:
+                    try:
+                        cleaned.append((number, row, self.clean_row(row)))
+                    except (ValidationError, ValueError, TypeError) as e:
+                        result.reject(number, _error_text(e), row)
+                cleaned = self._reject_duplicates(cleaned, result)
+                if cleaned:
+                    self._insert(cleaned, result)
+                result.processed += len(chunk)
+                if checkpoint is not None:
+                    checkpoint(result)
+        print(f"✅ {self.model.__name__} import: {result.created} created, {result.rejected} rejected")
+        return result
+
+
+class LeadImporter(BaseImporter):
+    model = lead_management
+    rollup_field = "enquirydate"
+    columns = {
+        "csv": {
+            "sourceoflead": 1, "salesperson": 2, "customername": 3, "customersegment": 4,
+            "enquirydate": 5, "contactedby": 6, "maincategory": 7, "subcategory": 8,
+            "primarycontact": 9, "secondarycontact": 10, "customeremail": 11,
+            "customeraddress": 12, "location": 13, "city": 14, "typeoflead": 15,
+            "firstfollowupdate": 16, "stage": 17, "branch": 18, "state": 19,
+        },
+        "xlsx": {
+            "sourceoflead": 0, "salesperson": 1, "primarycontact": 2, "customeraddress": 3,
+            "customeremail": 4, "enquirydate": 5, "typeoflead": 6, "city": 7,
+            "contactedby": 8, "customername": 9, "customersegment": 10, "location": 11,
+            "maincategory": 12, "secondarycontact": 13, "subcategory": 14,
+            "firstfollowupdate": 15, "stage": 16,
+        },
+    }
+
+    def __init__(self, file_format):
+        super().__init__(file_format)
+        # salesperson column holds a name or a mobile number
+        self.salespersons = {}
+        for pk, full_name, mobile_no in SalesPerson.objects.values_list("id", "full_name", "mobile_no"):
+            self.salespersons.setdefault(full_name.strip().lower(), pk)
+            self.salespersons.setdefault(mobile_no.strip(), pk)
+
+    def clean_value(self, field, raw):
+        if field.name != "salesperson":
+            return super().clean_value(field, raw)
+        key = str(int(raw) if isinstance(raw, float) else raw or "").strip().lower()
+        if key not in self.salespersons:
+            raise ValidationError(f"unknown salesperson '{raw}'")
+        return self.salespersons[key]
+
+    def clean_row(self, row):
+        values = super().clean_row(row)
+        values["salesperson_id"] = values.pop("salesperson")
+        return values
+
+
+class CustomerImporter(BaseImporter):
+    model = customer_details
+    columns = {
+        "csv": {
+            "fullname": 1, "primaryemail": 2, "secondaryemail": 3, "primarycontact": 4,
+            "secondarycontact": 5, "contactperson": 6, "customer_type": 7,
+            "shifttopartyaddress": 8, "shifttopartycity": 9, "shifttopartystate": 10,
+            "shifttopartypostal": 11, "soldtopartyaddress": 12, "soldtopartycity": 13,
+            "soldtopartystate": 14, "soldtopartypostal": 15, "customerid": 16,
+        },
+    }
+    unique_fields = ("primarycontact", "customerid")
+
+
+IMPORTERS = {
+    ImportJob.KIND_LEAD: LeadImporter,
+    ImportJob.KIND_CUSTOMER: CustomerImporter,
+}
+
+
+# ------------------------
+# Background jobs
+# ------------------------
+def create_job(kind, upload, user=None):
+    """Store `upload` as a queued ImportJob; ValueError if the importer does not take its format."""
+    formats = IMPORTERS[kind].columns
+    if file_extension(upload.name) not in formats:
+        raise ValueError(f"Only {' / '.join(ext.upper() for ext in formats)} files are supported.")
+    return ImportJob.objects.create(
+        kind=kind,
+        file=upload,
+        original_name=upload.name,
+        report_name=f"{REPORT_DIR}/{uuid.uuid4().hex}.csv",
+        created_by=user if user is not None and user.is_authenticated else None,
+    )
+
+
+def claim_job(job_id):
+    """Mark a queued (or stalled running) job as running; False if another worker holds it."""
+    now = timezone.now()
+    return bool(
+        ImportJob.objects.filter(pk=job_id)
+        .filter(Q(status=ImportJob.QUEUED) | Q(status=ImportJob.RUNNING, updated_at__lt=now - STALE_AFTER))
+        .update(status=ImportJob.RUNNING, started_at=now, updated_at=now, resume_offset=F("rows_processed"))
+    )
+
+
+def run_job(job_id):
+    """
+    Process (or resume) ImportJob `job_id` from its last checkpoint.
+    Returns (job, ImportResult), or None if another worker holds the job.
+    """
+    if not claim_job(job_id):
+        return None
+    job = ImportJob.objects.get(pk=job_id)
+    extension = file_extension(job.original_name)
+    report_path = default_storage.path(job.report_name)
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+
+    def checkpoint(result):
+        ImportJob.objects.filter(pk=job.pk).update(
+            rows_processed=result.processed,
+            rows_created=result.created,
+            rows_failed=result.rejected,
+            report_size=result.flush_report(),
+            updated_at=timezone.now(),
+        )
+
+    try:
+        with job.file.open("rb") as file, open(report_path, "a+", newline="", encoding="utf-8") as report:
+            if job.total_rows is None:
+                job.total_rows = count_rows(file, extension)
+                job.save(update_fields=["total_rows"])
+                file.seek(0)
+            report.truncate(job.report_size)  # drop lines of a chunk that never committed
+            report.seek(job.report_size)
+            result = ImportResult(report, job.rows_processed, job.rows_created, job.rows_failed)
+            rows = islice(iter_upload_rows(file, extension), job.rows_processed, None)
+            IMPORTERS[job.kind](extension).run(rows, result, checkpoint=checkpoint)
+    except Exception:
+        ImportJob.objects.filter(pk=job.pk).update(
+            status=ImportJob.FAILED, error=traceback.format_exc(), updated_at=timezone.now()
+        )
+        raise
+
+    ImportJob.objects.filter(pk=job.pk).update(
+        status=ImportJob.DONE, finished_at=timezone.now(), updated_at=timezone.now()
+    )
+    return job, result
+
+
+def requeue_job(job):
+    """Put a failed (or stalled) job back in the queue; it resumes from its checkpoint."""
+    ImportJob.objects.filter(pk=job.pk).update(status=ImportJob.QUEUED, error="", updated_at=timezone.now())
+
+
+def stale_jobs():
+    """Jobs that should be running but whose worker has gone quiet (or whose message was lost)."""
+    cutoff = timezone.now() - STALE_AFTER
+    return ImportJob.objects.filter(status__in=[ImportJob.QUEUED, ImportJob.RUNNING], updated_at__lt=cutoff)
+
+
+def can_access(job, user):
+    """Whether `user` may see / retry `job` and download its error report: their own, or any as an admin."""
+    return job.created_by_id == user.pk or user.is_superuser or user.userprofile.role == "admin"
+
+
+def job_progress(job):
+    """JSON-ready progress of `job`, with an ETA from this run's throughput."""
+    eta = None
+    if job.status == ImportJob.RUNNING and job.total_rows and job.started_at:
+        done = job.rows_processed - job.resume_offset
+        elapsed = (timezone.now() - job.started_at).total_seconds()
+        if done > 0 and elapsed > 0:
+            eta = round(max(job.total_rows - job.rows_processed, 0) * elapsed / done)
+    report_url = reverse("download_import_report", args=[job.pk]) if job.rows_failed else None
+    return {
+        "id": job.pk,
+        "kind": job.kind,
+        "file": job.original_name,
+        "status": job.status,
+        "total_rows": job.total_rows,
+        "rows_processed": job.rows_processed,
+        "rows_created": job.rows_created,
+        "rows_failed": job.rows_failed,
+        "eta_seconds": eta,
+        "report_url": report_url,
+        "error": job.error.strip().splitlines()[-1] if job.error else "",
+    }
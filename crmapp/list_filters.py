@@ -0,0 +1,83 @@
+# crmapp/list_filters.py
+"""
+Querysets behind the lead, customer and tax invoice list pages, built from
+the list page's query string (request.GET, or the params saved on an
+ExportJob). The list views paginate them and the exports (crmapp.exports)
+stream them, so an export always contains exactly the rows the user
+filtered to.
+
+The search box goes through the search index (crmapp.search) instead of
+icontains over names and phone numbers.
+"""
+from . import search
+from .models import SalesPerson, TaxInvoice, customer_details, lead_management
+
+
+def lead_scope(user):
+    """Which leads `user` may see: 'all', or 'sales:<mobile no>' for a salesperson."""
+    if user.userprofile.role == 'sales':
+        return f"sales:{user.username}"
+    return "all"
+
+
+def filter_leads(params, user):
+    """Leads visible to `user` (sales see their own), filtered by the list page's GET params."""
+    if lead_scope(user) != "all":
+        salesperson = SalesPerson.objects.get(mobile_no=user.username)
+        leads = lead_management.objects.filter(salesperson=salesperson)
+    else:
+        leads = lead_management.objects.all()
+
+    search_query = params.get('search', '').strip()
+    if search_query:
+        leads = leads.filter(pk__in=search.matching_ids("lead", search_query))
+
+    if params.get('typeoflead'):
+        leads = leads.filter(typeoflead=params['typeoflead'])
+    if params.get('sourceoflead'):
+        leads = leads.filter(sourceoflead=params['sourceoflead'])
+    if params.get('salesperson'):
+        leads = leads.filter(salesperson__full_name=params['salesperson'])
+    if params.get('branch'):
+        leads = leads.filter(branch=params['branch'])
+    if params.get('enquiry_from') and params.get('enquiry_to'):
+        leads = leads.filter(enquirydate__range=[params['enquiry_from'], params['enquiry_to']])
+    if params.get('followup_from') and params.get('followup_to'):
+        leads = leads.filter(firstfollowupdate__range=[params['followup_from'], params['followup_to']])
+    if params.get('segments'):
+        leads = leads.filter(customersegment=params['segments'])
+    if params.get('customer_type'):
+        leads = leads.filter(customer_type=params['customer_type'])
+    return leads.order_by('-id')
+
+
+def filter_customers(params):
+    customers = customer_details.objects.all()
+
+    query = params.get('search', '')
+    if query:
+        customers = customers.filter(pk__in=search.matching_ids("customer", query))
+    if params.get('customer_type'):
+        customers = customers.filter(customer_type=params['customer_type'])
+
+    descending = params.get('order', 'asc') == 'desc'
+    if params.get('sort_by', 'customerid') == 'firstname':
+        return customers.order_by('-fullname' if descending else 'fullname')
+    return customers.order_by('-customerid' if descending else 'customerid')
+
+
+def filter_tax_invoices(params):
+    invoices = TaxInvoice.objects.all()
+
+    query = params.get('search', '')
+    if query:
+        invoices = invoices.filter(pk__in=search.matching_ids("invoice", query))
+
+    sort_by = params.get('sort_by', '')
+    if sort_by == 'name':
+        sort_field = 'customer__fullname'
+    elif sort_by == 'invoice_no':
+        sort_field = 'tax_invoice_no'
+    else:
+        sort_field = 'id'  # default sorting if no valid sort_by is provided
+    return invoices.order_by(f'-{sort_field}' if params.get('order', 'asc') == 'desc' else sort_field)
@@ -0,0 +1,30 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crmapp', '0006_sentmessagelog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMetricRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('metric', models.CharField(choices=[('lead', 'Leads by type'), ('followup_remark', 'Follow-ups by remark'), ('order_status', 'Follow-ups by order status'), ('service', 'Services by contract type'), ('quotation', 'Quotations'), ('invoice', 'Invoices')], max_length=20)),
+                ('day', models.DateField(blank=True, null=True)),
+                ('dimension', models.CharField(blank=True, default='', max_length=255)),
+                ('branch', models.CharField(blank=True, default='', max_length=255)),
+                ('count', models.IntegerField(default=0)),
+                ('amount', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('salesperson', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='crmapp.salesperson')),
+            ],
+            options={
+                'db_table': 'crm_daily_metric_rollup',
+                'indexes': [models.Index(fields=['metric', 'day'], name='rollup_metric_day_idx')],
+            },
+        ),
+    ]
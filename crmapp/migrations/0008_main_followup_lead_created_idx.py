@@ -0,0 +1,15 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crmapp', '0007_dailymetricrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='main_followup',
+            index=models.Index(fields=['lead', 'created_at'], name='followup_lead_created_idx'),
+        ),
+    ]
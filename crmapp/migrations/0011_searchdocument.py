@@ -0,0 +1,72 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+SOURCES = [
+    ('lead', 'lead_management'),
+    ('customer', 'customer_details'),
+    ('quotation', 'quotation_management'),
+    ('invoice', 'TaxInvoice'),
+]
+
+
+def backfill_documents(apps, schema_editor):
+    """Index the rows that exist before crmapp.signals starts keeping the index current."""
+    from crmapp.search import BATCH_SIZE, build_document
+
+    SearchDocument = apps.get_model('crmapp', 'SearchDocument')
+    for kind, model_name in SOURCES:
+        queryset = apps.get_model('crmapp', model_name).objects.order_by('pk')
+        if kind in ('quotation', 'invoice'):
+            queryset = queryset.select_related('customer')
+        last = 0
+        while True:
+            batch = list(queryset.filter(pk__gt=last)[:BATCH_SIZE])
+            if not batch:
+                break
+            SearchDocument.objects.bulk_create([build_document(kind, obj, SearchDocument) for obj in batch])
+            last = batch[-1].pk
+
+
+def create_fulltext_index(apps, schema_editor):
+    """ngram FULLTEXT index over the search content (MySQL only; other backends use LIKE)."""
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute(
+        "CREATE FULLTEXT INDEX search_document_content_ft ON crm_search_document (content) WITH PARSER ngram"
+    )
+
+
+def drop_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    schema_editor.execute("DROP INDEX search_document_content_ft ON crm_search_document")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crmapp', '0010_exportjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('lead', 'Lead'), ('customer', 'Customer'), ('quotation', 'Quotation'), ('invoice', 'Tax Invoice')], max_length=20)),
+                ('object_id', models.BigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('subtitle', models.CharField(blank=True, default='', max_length=255)),
+                ('content', models.TextField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('salesperson', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='crmapp.salesperson')),
+            ],
+            options={
+                'db_table': 'crm_search_document',
+                'unique_together': {('kind', 'object_id')},
+            },
+        ),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_fulltext_index, drop_fulltext_index),
+    ]
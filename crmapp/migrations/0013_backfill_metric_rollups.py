@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+def rebuild_rollups(apps, schema_editor):
+    """
+    First full build of the dashboard rollups. Until it has run, rows written
+    by the signals cover only the days touched since deploy, and
+    rollups.is_ready() would switch the dashboard to those partial totals.
+    Runs on the historical models and leaves the cache alone; is_ready()
+    finds the rows itself.
+    """
+    from crmapp import rollups
+
+    rollups.rebuild(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crmapp', '0012_exportjob_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_rollups, migrations.RunPython.noop),
+    ]
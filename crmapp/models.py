@@ -348,6 +348,12 @@ class main_followup(models.Model):
     ], default='Not Closed')
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # latest follow-up per lead (crmapp.followup_worklist)
+            models.Index(fields=['lead', 'created_at'], name='followup_lead_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.lead.customername or 'Unnamed'} - Followup {self.id}"
 
@@ -965,3 +971,163 @@ class CustomerPurchase(models.Model):
     def __str__(self):
         return f"Customer {self.customer_id} → Product {self.product_id}"
 
+
+
+# =========================================================
+# DAILY METRIC ROLLUPS (see crmapp/rollups.py)
+# =========================================================
+class DailyMetricRollup(models.Model):
+    METRIC_CHOICES = [
+        ('lead', 'Leads by type'),
+        ('followup_remark', 'Follow-ups by remark'),
+        ('order_status', 'Follow-ups by order status'),
+        ('service', 'Services by contract type'),
+        ('quotation', 'Quotations'),
+        ('invoice', 'Invoices'),
+    ]
+
+    metric = models.CharField(max_length=20, choices=METRIC_CHOICES)
+    day = models.DateField(null=True, blank=True)
+    dimension = models.CharField(max_length=255, blank=True, default="")
+    branch = models.CharField(max_length=255, blank=True, default="")
+    salesperson = models.ForeignKey(SalesPerson, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    count = models.IntegerField(default=0)
+    amount = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'crm_daily_metric_rollup'
+        indexes = [
+            models.Index(fields=['metric', 'day'], name='rollup_metric_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.metric} {self.day} {self.dimension}: {self.count}"
+
+
+# =========================================================
+# BACKGROUND IMPORT JOBS (see crmapp/importers.py)
+# =========================================================
+class ImportJob(models.Model):
+    KIND_LEAD = 'lead'
+    KIND_CUSTOMER = 'customer'
+    KIND_CHOICES = [
+        (KIND_LEAD, 'Leads'),
+        (KIND_CUSTOMER, 'Customers'),
+    ]
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    file = models.FileField(upload_to='imports/')
+    original_name = models.CharField(max_length=255)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    total_rows = models.IntegerField(null=True, blank=True)
+    # checkpoint, committed with each chunk
+    rows_processed = models.IntegerField(default=0)
+    rows_created = models.IntegerField(default=0)
+    rows_failed = models.IntegerField(default=0)
+    report_name = models.CharField(max_length=255)
+    report_size = models.BigIntegerField(default=0)
+    resume_offset = models.IntegerField(default=0)  # rows_processed when the current run started
+    error = models.TextField(blank=True, default="")
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'crm_import_job'
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='import_job_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} import {self.original_name} ({self.status})"
+
+
+# =========================================================
+# BACKGROUND EXPORT JOBS (see crmapp/exports.py)
+# =========================================================
+class ExportJob(models.Model):
+    KIND_CHOICES = [
+        ('leads', 'Leads'),
+        ('customers', 'Customers'),
+        ('invoices', 'Invoices'),
+    ]
+    FORMAT_CHOICES = [
+        ('csv', 'CSV'),
+        ('xlsx', 'Excel'),
+    ]
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    file_format = models.CharField(max_length=10, choices=FORMAT_CHOICES, default='xlsx')
+    params = models.JSONField(default=dict, blank=True)  # list page filters
+    columns = models.CharField(max_length=1000, blank=True, default="")
+    scope = models.CharField(max_length=100, default='all')
+    # hash of kind, format, columns, params, scope and the data watermark
+    cache_key = models.CharField(max_length=64, db_index=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    file = models.FileField(upload_to='exports/', blank=True)
+    row_count = models.IntegerField(default=0)
+    error = models.TextField(blank=True, default="")
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)  # last progress; stale jobs are failed
+
+    class Meta:
+        db_table = 'crm_export_job'
+
+    def __str__(self):
+        return f"{self.get_kind_display()} export ({self.status})"
+
+
+# =========================================================
+# FULL-TEXT SEARCH INDEX (see crmapp/search.py)
+# =========================================================
+class SearchDocument(models.Model):
+    KIND_CHOICES = [
+        ('lead', 'Lead'),
+        ('customer', 'Customer'),
+        ('quotation', 'Quotation'),
+        ('invoice', 'Tax Invoice'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.BigIntegerField()
+    title = models.CharField(max_length=255)
+    subtitle = models.CharField(max_length=255, blank=True, default="")
+    # names, e-mails, phone digits, customer ids and document numbers, normalised
+    content = models.TextField()
+    # leads only: sales users search their own leads
+    salesperson = models.ForeignKey(SalesPerson, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'crm_search_document'
+        unique_together = ('kind', 'object_id')
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.object_id}: {self.title}"
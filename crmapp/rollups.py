@@ -0,0 +1,218 @@
+# crmapp/rollups.py
+"""
+Per-day, per-branch, per-salesperson rollups of the dashboard's source
+tables, stored in DailyMetricRollup.
+
+Each metric in METRICS names the source model and which of its fields give
+the day, the dimension (lead type, remark, contract type, ...), branch,
+salesperson and summed amount. A rollup row holds the count and amount sum
+of one (metric, day, dimension, branch, salesperson) group.
+
+- rebuild() recomputes metrics from scratch with one GROUP BY per metric
+  (the nightly Celery task crmapp.tasks.rebuild_metric_rollups);
+- refresh_days() recomputes only the given days of one metric. The signal
+  handlers in crmapp.signals collect the days a transaction's saves and
+  deletes touched (old and new day when a date changes) and queue them
+  after commit to crmapp.tasks.refresh_metric_rollups (refresh_changes),
+  so no GROUP BY runs on the request thread.
+
+Migration 0013 runs the first full rebuild() over its historical models
+(rebuild(apps=...)), so the dashboard never reads rollups that only cover
+the days touched since deploy.
+
+Date-range charts then sum rollup rows (totals()) instead of scanning the
+transactional tables.
+"""
+import datetime
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import CharField, Count, F, IntegerField, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import DailyMetricRollup, invoice, lead_management, main_followup, quotation, service_management
+
+
+READY_CACHE_KEY = "crmapp:rollups:ready"
+BATCH_SIZE = 2000
+
+
+class Metric:
+    def __init__(self, model, day, dimension=None, branch=None, salesperson=None, amount=None):
+        self.model = model
+        self.day = day
+        self.dimension = dimension
+        self.branch = branch
+        self.salesperson = salesperson
+        self.amount = amount
+
+    def _expr(self, field):
+        return TruncDate(field) if field == "created_at" else F(field)
+
+    def grouped(self, days=None, start=None, end=None, model=None):
+        """
+        Rows of {r_day, r_dimension, r_branch, r_salesperson, r_count, r_amount}.
+        `model` replaces self.model (a migration's historical model).
+        """
+        empty = Value("", output_field=CharField())
+        qs = (model or self.model).objects.annotate(
+            r_day=self._expr(self.day),
+            r_dimension=Coalesce(F(self.dimension), empty) if self.dimension else empty,
+            r_branch=Coalesce(F(self.branch), empty) if self.branch else empty,
+            r_salesperson=F(self.salesperson) if self.salesperson else Value(None, output_field=IntegerField()),
+        )
+        if days is not None:
+            known = [d for d in days if d is not None]
+            condition = Q(r_day__in=known)
+            if None in days:
+                condition |= Q(r_day__isnull=True)
+            qs = qs.filter(condition)
+        if start is not None:
+            qs = qs.filter(r_day__gte=start)
+        if end is not None:
+            qs = qs.filter(r_day__lte=end)
+
+        aggregates = {"r_count": Count("pk")}
+        if self.amount:
+            aggregates["r_amount"] = Sum(self.amount)
+        return (
+            qs.values("r_day", "r_dimension", "r_branch", "r_salesperson")
+            .annotate(**aggregates)
+            .order_by()
+        )
+
+
+METRICS = {
+    "lead": Metric(lead_management, "enquirydate", "typeoflead", "branch", "salesperson_id"),
+    "followup_remark": Metric(main_followup, "lead__enquirydate", "followup_remark", "lead__branch", "lead__salesperson_id"),
+    "order_status": Metric(main_followup, "created_at", "order_status", "lead__branch", "lead__salesperson_id"),
+    "service": Metric(service_management, "service_date", "contract_type", "branch__branch_name", amount="total_charges"),
+    "quotation": Metric(quotation, "quotation_date", amount="total_amount"),
+    "invoice": Metric(invoice, "date", branch="branch", amount="total_amount"),
+}
+
+
+def _rollup_rows(name, rows, rollup_model=DailyMetricRollup):
+    for row in rows:
+        yield rollup_model(
+            metric=name,
+            day=row["r_day"],
+            dimension=row["r_dimension"],
+            branch=row["r_branch"],
+            salesperson_id=row["r_salesperson"],
+            count=row["r_count"],
+            amount=round(row.get("r_amount") or 0, 2),
+        )
+
+
+def _replace(name, existing, rows):
+    rollup_model = existing.model
+    with transaction.atomic():
+        existing.delete()
+        rollup_model.objects.bulk_create(_rollup_rows(name, rows, rollup_model), batch_size=BATCH_SIZE)
+
+
+# ------------------------
+# Maintenance
+# ------------------------
+def rebuild(metrics=None, start=None, end=None, apps=None):
+    """
+    Recompute rollups for `metrics` (default: all), optionally only days in
+    [start, end]. Migrations pass their `apps` to use the historical models;
+    the ready flag in the cache is then left alone.
+    """
+    rollup_model = apps.get_model("crmapp", "DailyMetricRollup") if apps else DailyMetricRollup
+    for name in metrics or METRICS:
+        metric = METRICS[name]
+        model = apps.get_model("crmapp", metric.model.__name__) if apps else None
+        existing = rollup_model.objects.filter(metric=name)
+        if start is not None:
+            existing = existing.filter(day__gte=start)
+        if end is not None:
+            existing = existing.filter(day__lte=end)
+        _replace(name, existing, metric.grouped(start=start, end=end, model=model))
+        print(f"✅ Rollup '{name}' rebuilt")
+    if apps is None and metrics is None and start is None and end is None:
+        cache.set(READY_CACHE_KEY, True, None)
+
+
+def refresh_days(name, days):
+    """Recompute the rollup rows of metric `name` for `days` (a set of dates, None allowed)."""
+    days = set(days)
+    if not days:
+        return
+    known = [d for d in days if d is not None]
+    condition = Q(day__in=known)
+    if None in days:
+        condition |= Q(day__isnull=True)
+    existing = DailyMetricRollup.objects.filter(condition, metric=name)
+    _replace(name, existing, METRICS[name].grouped(days=days))
+
+
+def refresh_changes(days_by_metric, followup_lead_ids=(), lead_ids=()):
+    """
+    Refresh what a batch of saves / deletes touched: `days_by_metric` is
+    {metric: [day_key, ...]}; the follow-ups of `followup_lead_ids` changed
+    (their lead's enquirydate row of followup_remark); `lead_ids` changed
+    (the order_status days of their follow-ups).
+    """
+    days = {name: {parse_day_key(key) for key in keys} for name, keys in days_by_metric.items()}
+    if followup_lead_ids:
+        days.setdefault("followup_remark", set()).update(
+            lead_management.objects.filter(pk__in=followup_lead_ids).values_list("enquirydate", flat=True)
+        )
+    if lead_ids:
+        days.setdefault("order_status", set()).update(
+            main_followup.objects.filter(lead_id__in=lead_ids)
+            .annotate(day=TruncDate("created_at")).values_list("day", flat=True).distinct()
+        )
+    for name, metric_days in days.items():
+        refresh_days(name, metric_days)
+
+
+def day_key(day):
+    """JSON-safe form of a rollup day (celery task arguments)."""
+    return day.isoformat() if day is not None else None
+
+
+def parse_day_key(key):
+    return datetime.date.fromisoformat(key) if key is not None else None
+
+
+def as_date(value):
+    """Date of `value` as TruncDate sees it (local date for aware datetimes)."""
+    if isinstance(value, datetime.datetime):
+        return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value
+
+
+# ------------------------
+# Reading
+# ------------------------
+def is_ready():
+    """
+    True once rollups have been built. Rows are only present after a full
+    rebuild (migration 0013 runs the first); with no source rows at all the
+    raw queries are just as cheap.
+    """
+    ready = cache.get(READY_CACHE_KEY)
+    if ready is None:
+        ready = DailyMetricRollup.objects.exists()
+        cache.set(READY_CACHE_KEY, ready, None if ready else 60)
+    return ready
+
+
+def totals(name, start=None, end=None, branch=None, salesperson_id=None):
+    """{dimension: (count, amount)} for metric `name` over [start, end] (all days when unbounded)."""
+    qs = DailyMetricRollup.objects.filter(metric=name)
+    if start is not None:
+        qs = qs.filter(day__gte=start)
+    if end is not None:
+        qs = qs.filter(day__lte=end)
+    if branch is not None:
+        qs = qs.filter(branch=branch)
+    if salesperson_id is not None:
+        qs = qs.filter(salesperson_id=salesperson_id)
+    rows = qs.values("dimension").annotate(n=Sum("count"), total=Sum("amount")).order_by("dimension")
+    return {r["dimension"]: (r["n"] or 0, r["total"] or 0) for r in rows}
@@ -0,0 +1,275 @@
+# crmapp/search.py
+"""
+One search index over leads, customers, quotations and tax invoices.
+
+Every indexed row has one SearchDocument (crm_search_document) whose
+`content` holds what people type into the search boxes, normalised:
+names and e-mails lower-cased, phone numbers as bare digits (the models
+store them as BigIntegers, so `primarycontact__icontains` was a CAST of
+every row), customer ids and quotation / invoice numbers both as written
+and without punctuation (2025/04/17 also as 20250417).
+
+On MySQL `content` carries an ngram FULLTEXT index (migration 0011), so a
+fragment of a name or a phone number is looked up as a phrase of
+NGRAM_TOKEN_SIZE-character tokens in the index instead of LIKE '%q%' over
+every lead, and MATCH() ... AGAINST is the relevance global_search ranks
+by. Other backends, and queries shorter than one ngram, fall back to LIKE
+over the one content column.
+
+crmapp.signals collects the rows saved or deleted in a transaction and,
+once it commits, hands them to crmapp.tasks.update_search_index, so the
+request never waits on the index. bulk_create() / update() bypass
+signals: finished imports queue index_missing for their kind and
+crmapp.tasks.refresh_search_index rebuilds the whole index nightly.
+Migration 0011 fills the index for the rows that existed before it.
+
+- matching_ids(kind, query): subquery of matching row ids, for the list
+  pages' filters (`pk__in=`);
+- global_search(query, scope): ranked hits of every kind for the search
+  box (crmapp.views.global_search_view).
+"""
+import re
+
+from django.db import connection
+from django.db.models import Case, Exists, FloatField, OuterRef, Q, Value, When
+from django.db.models.expressions import RawSQL
+from django.urls import reverse
+
+from .models import SearchDocument, TaxInvoice, customer_details, lead_management, quotation_management
+
+
+BATCH_SIZE = 500
+GLOBAL_LIMIT = 20
+NGRAM_TOKEN_SIZE = 2    # MySQL's default ngram_token_size
+PHONE_QUERY_RE = re.compile(r"\+?[\d\s\-()]*\d")
+
+MODELS = {
+    "lead": lead_management,
+    "customer": customer_details,
+    "quotation": quotation_management,
+    "invoice": TaxInvoice,
+}
+URL_NAMES = {
+    "lead": "edit_lead_management",
+    "customer": "edit_customer",
+    "quotation": "edit_quotation",
+    "invoice": "edit_tax_invoice",
+}
+
+
+# ------------------------
+# Documents
+# ------------------------
+def _digits(value):
+    return re.sub(r"\D", "", str(value)) if value is not None else ""
+
+
+def _words(*values):
+    return [" ".join(str(v).lower().split()) for v in values if v not in (None, "")]
+
+
+def _phones(*values):
+    return [d for d in map(_digits, values) if len(d) > 1]
+
+
+def _numbers(*values):
+    """Ids / document numbers as written and with the punctuation removed."""
+    terms = []
+    for value in _words(*values):
+        terms.append(value)
+        compact = re.sub(r"[\W_]+", "", value)
+        if compact and compact != value:
+            terms.append(compact)
+    return terms
+
+
+def _lead_document(lead):
+    terms = (
+        _words(lead.customername, lead.or_name, lead.customeremail, lead.typeoflead)
+        + _phones(lead.primarycontact, lead.secondarycontact, lead.or_contact)
+    )
+    return lead.customername or "Unnamed Lead", _digits(lead.primarycontact), terms
+
+
+def _customer_document(customer):
+    terms = (
+        _words(customer.fullname, customer.contactperson, customer.or_name,
+               customer.primaryemail, customer.secondaryemail)
+        + _phones(customer.primarycontact, customer.secondarycontact, customer.or_contact)
+        + _numbers(customer.customerid)
+    )
+    return customer.fullname, customer.customerid or "", terms
+
+
+def _quotation_document(quotation):
+    customer = quotation.customer
+    terms = (
+        _numbers(quotation.quotation_no, quotation.gst_number)
+        + _words(quotation.or_name, quotation.contact_by)
+        + _phones(quotation.contact_by_no, quotation.or_contact)
+    )
+    if customer is not None:
+        terms += _words(customer.fullname) + _numbers(customer.customerid)
+    return quotation.quotation_no or f"Quotation {quotation.pk}", customer.fullname if customer else "", terms
+
+
+def _invoice_document(invoice):
+    customer = invoice.customer
+    terms = (
+        _numbers(invoice.tax_invoice_no, invoice.buyers_order_no)
+        + _words(customer.fullname)
+        + _phones(customer.primarycontact)
+        + _numbers(customer.customerid)
+    )
+    return invoice.tax_invoice_no or f"Invoice {invoice.pk}", customer.fullname, terms
+
+
+DOCUMENTS = {
+    "lead": _lead_document,
+    "customer": _customer_document,
+    "quotation": _quotation_document,
+    "invoice": _invoice_document,
+}
+
+
+def _queryset(kind):
+    if kind in ("quotation", "invoice"):
+        return MODELS[kind].objects.select_related("customer")
+    return MODELS[kind].objects.all()
+
+
+def build_document(kind, obj, document_model=SearchDocument):
+    """The (unsaved) document of `obj`; migration 0011 passes its historical SearchDocument."""
+    title, subtitle, terms = DOCUMENTS[kind](obj)
+    return document_model(
+        kind=kind,
+        object_id=obj.pk,
+        title=title[:255],
+        subtitle=subtitle[:255],
+        content=" ".join(terms),
+        salesperson_id=obj.salesperson_id if kind == "lead" else None,
+    )
+
+
+# ------------------------
+# Indexing
+# ------------------------
+def index_objects(kind, objects):
+    """
+    Upsert the documents of `objects` (instances of MODELS[kind]) on the
+    unique (kind, object_id): INSERT ... ON DUPLICATE KEY UPDATE on MySQL,
+    which takes no conflict target; ON CONFLICT (kind, object_id) elsewhere.
+    """
+    unique_fields = None
+    if connection.features.supports_update_conflicts_with_target:
+        unique_fields = ["kind", "object_id"]
+    SearchDocument.objects.bulk_create(
+        [build_document(kind, obj) for obj in objects],
+        batch_size=BATCH_SIZE,
+        update_conflicts=True,
+        update_fields=["title", "subtitle", "content", "salesperson", "updated_at"],
+        unique_fields=unique_fields,
+    )
+
+
+def index(kind, pks):
+    """
+    Re-index rows `pks` of `kind`, dropping the documents of rows that no
+    longer exist. Customers also re-index their quotations and invoices,
+    whose documents carry the customer's name and id.
+    """
+    pks = set(pks)
+    objects = list(_queryset(kind).filter(pk__in=pks))
+    index_objects(kind, objects)
+    gone = pks - {obj.pk for obj in objects}
+    if gone:
+        SearchDocument.objects.filter(kind=kind, object_id__in=gone).delete()
+    if kind == "customer" and objects:
+        index_objects("quotation", _queryset("quotation").filter(customer_id__in=pks))
+        index_objects("invoice", _queryset("invoice").filter(customer_id__in=pks))
+
+
+def _index_batches(kind, queryset):
+    last, count = 0, 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last).order_by("pk")[:BATCH_SIZE])
+        if not batch:
+            return count
+        index_objects(kind, batch)
+        last = batch[-1].pk
+        count += len(batch)
+
+
+def index_missing(kind):
+    """Index the rows of `kind` that have no document yet (written by bulk_create)."""
+    documents = SearchDocument.objects.filter(kind=kind, object_id=OuterRef("pk"))
+    return _index_batches(kind, _queryset(kind).filter(~Exists(documents)))
+
+
+def rebuild(kinds=None):
+    """Re-index every row of `kinds` (default: all) and drop orphaned documents."""
+    for kind in kinds or MODELS:
+        count = _index_batches(kind, _queryset(kind))
+        SearchDocument.objects.filter(kind=kind).exclude(
+            object_id__in=MODELS[kind].objects.values("pk")
+        ).delete()
+        print(f"🔎 Search index: {count} {kind} documents")
+
+
+# ------------------------
+# Queries
+# ------------------------
+def normalize_query(query):
+    """Lower-cased query; a phone number typed with +91, spaces or dashes becomes its last 10 digits."""
+    query = " ".join((query or "").lower().split())
+    if PHONE_QUERY_RE.fullmatch(query):
+        return _digits(query)[-10:]
+    return query
+
+
+def matches(query, kinds=None):
+    """SearchDocuments matching `query`, annotated with a relevance `score`."""
+    query = normalize_query(query)
+    if not query:
+        return SearchDocument.objects.none()
+    documents = SearchDocument.objects.all()
+    if kinds:
+        documents = documents.filter(kind__in=kinds)
+    if connection.vendor == "mysql" and len(query) >= NGRAM_TOKEN_SIZE:
+        phrase = '"%s"' % query.replace('"', " ")
+        score = RawSQL(
+            f"MATCH({SearchDocument._meta.db_table}.content) AGAINST (%s IN BOOLEAN MODE)", [phrase],
+            output_field=FloatField(),
+        )
+        return documents.annotate(score=score).filter(score__gt=0)
+    score = Case(
+        When(title__istartswith=query, then=Value(2.0)), default=Value(1.0), output_field=FloatField()
+    )
+    return documents.filter(content__contains=query).annotate(score=score)
+
+
+def matching_ids(kind, query):
+    """Ids of `kind` rows matching `query`, as a subquery for `pk__in=`."""
+    return matches(query, [kind]).values("object_id")
+
+
+def global_search(query, scope="all", kinds=None, limit=GLOBAL_LIMIT):
+    """
+    The best `limit` hits for `query` across every kind, as JSON-ready dicts.
+    `scope` is list_filters.lead_scope(user): salespeople only find their own leads.
+    """
+    documents = matches(query, kinds)
+    if scope != "all":
+        mobile = scope.split(":", 1)[1]
+        documents = documents.filter(~Q(kind="lead") | Q(salesperson__mobile_no=mobile))
+    return [
+        {
+            "kind": doc.kind,
+            "id": doc.object_id,
+            "title": doc.title,
+            "subtitle": doc.subtitle,
+            "score": round(doc.score, 3),
+            "url": reverse(URL_NAMES[doc.kind], args=[doc.object_id]),
+        }
+        for doc in documents.order_by("-score", "-updated_at")[:limit]
+    ]
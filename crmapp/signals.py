@@ -1,6 +1,8 @@
 # signals.py
+import threading
+
 import requests
-from django.db.models.signals import post_save, m2m_changed
+from django.db.models.signals import post_init, post_save, post_delete, m2m_changed
 from django.dispatch import receiver, Signal
 from django.db import transaction
 from django.contrib.auth.models import User
@@ -13,8 +15,13 @@ TechnicianProfile = apps.get_model('crmapp', 'TechnicianProfile')
 service_management = apps.get_model('crmapp', 'service_management')
 WorkAllocation = apps.get_model('crmapp', 'WorkAllocation')
 MessageTemplates = apps.get_model('crmapp', 'MessageTemplates')
+lead_management = apps.get_model('crmapp', 'lead_management')
+main_followup = apps.get_model('crmapp', 'main_followup')
+quotation = apps.get_model('crmapp', 'quotation')
+invoice = apps.get_model('crmapp', 'invoice')
 
-from crmapp.tasks import send_email_task, send_whatsapp_task
+from crmapp.tasks import refresh_metric_rollups, send_email_task, send_whatsapp_task, update_search_index
+from crmapp import dashboard_metrics, exports, rollups, search
 
 
 # ------------------- User Profile Creation -------------------
@@ -131,3 +138,152 @@ def send_service_scheduled_email(sender, service_id, created, **kwargs):
             mobile = f"91{customer.primarycontact}"
             send_whatsapp_task.delay(mobile, whatsapp_body)
             print("📲 WhatsApp queued for:", mobile)
+
+
+# ------------------- Dashboard Metrics Invalidation -------------------
+DASHBOARD_SOURCES = [
+    lead_management,
+    main_followup,
+    apps.get_model('crmapp', 'Product'),
+    service_management,
+    quotation,
+    invoice,
+]
+
+
+def invalidate_dashboard_metrics(sender, **kwargs):
+    transaction.on_commit(dashboard_metrics.invalidate)
+
+
+for _model in DASHBOARD_SOURCES:
+    post_save.connect(invalidate_dashboard_metrics, sender=_model, dispatch_uid=f"dashboard_metrics_save_{_model.__name__}")
+    post_delete.connect(invalidate_dashboard_metrics, sender=_model, dispatch_uid=f"dashboard_metrics_delete_{_model.__name__}")
+
+
+# ------------------- Export Cache Invalidation -------------------
+def invalidate_exports(sender, **kwargs):
+    transaction.on_commit(exports.invalidate)
+
+
+for _model in exports.SOURCE_MODELS:
+    post_save.connect(invalidate_exports, sender=_model, dispatch_uid=f"exports_save_{_model.__name__}")
+    post_delete.connect(invalidate_exports, sender=_model, dispatch_uid=f"exports_delete_{_model.__name__}")
+
+
+# ------------------- Daily Metric Rollups -------------------
+# fields whose values decide which rollup rows a row counts towards
+ROLLUP_FIELDS = {
+    lead_management: ["enquirydate"],
+    main_followup: ["lead_id", "created_at"],
+    service_management: ["service_date"],
+    quotation: ["quotation_date"],
+    invoice: ["date"],
+}
+ROLLUP_DAYS = {
+    service_management: ("service", "service_date"),
+    quotation: ("quotation", "quotation_date"),
+    invoice: ("invoice", "date"),
+}
+_rollup_pending = threading.local()
+
+
+def _pending_rollups():
+    pending = getattr(_rollup_pending, "changes", None)
+    if pending is None:
+        pending = _rollup_pending.changes = {"days": {}, "followup_leads": set(), "leads": set()}
+    return pending
+
+
+def _flush_rollups():
+    pending = getattr(_rollup_pending, "changes", None)
+    if not pending:
+        return
+    _rollup_pending.changes = None
+    refresh_metric_rollups.delay(
+        {name: [rollups.day_key(day) for day in days] for name, days in pending["days"].items()},
+        sorted(pending["followup_leads"]),
+        sorted(pending["leads"]),
+    )
+
+
+def _note_rollup_rows(model, values, pending):
+    """Add the rollup rows one version of a row (`values`: field -> value) counts towards."""
+    days = pending["days"]
+    if model is lead_management:
+        days.setdefault("lead", set()).add(values["enquirydate"])
+        days.setdefault("followup_remark", set()).add(values["enquirydate"])
+    elif model is main_followup:
+        # followup_remark rows are keyed by the lead's enquirydate, looked up in the task
+        pending["followup_leads"].add(values["lead_id"])
+        days.setdefault("order_status", set()).add(rollups.as_date(values["created_at"]))
+    else:
+        name, field = ROLLUP_DAYS[model]
+        days.setdefault(name, set()).add(values[field])
+
+
+def _rollup_values(sender, instance):
+    return {field: getattr(instance, field) for field in ROLLUP_FIELDS[sender]}
+
+
+def remember_rollup_values(sender, instance, **kwargs):
+    """Keep the loaded values (no query; deferred fields are skipped) so a moved date refreshes its old day."""
+    instance._rollup_initial = {
+        field: instance.__dict__[field] for field in ROLLUP_FIELDS[sender] if field in instance.__dict__
+    }
+
+
+def queue_rollups_on_save(sender, instance, created=False, raw=False, **kwargs):
+    """Collect the rollup rows this save touched; crmapp.tasks.refresh_metric_rollups recomputes them after commit."""
+    if raw:
+        return
+    pending = _pending_rollups()
+    current = _rollup_values(sender, instance)
+    _note_rollup_rows(sender, current, pending)
+    initial = getattr(instance, "_rollup_initial", {})
+    if len(initial) == len(current) and initial != current:
+        _note_rollup_rows(sender, initial, pending)
+    if sender is lead_management and not created:
+        # its follow-ups' order_status rows carry the lead's branch and salesperson
+        pending["leads"].add(instance.pk)
+    instance._rollup_initial = current
+    transaction.on_commit(_flush_rollups)
+
+
+def queue_rollups_on_delete(sender, instance, **kwargs):
+    _note_rollup_rows(sender, _rollup_values(sender, instance), _pending_rollups())
+    transaction.on_commit(_flush_rollups)
+
+
+for _model in ROLLUP_FIELDS:
+    post_init.connect(remember_rollup_values, sender=_model, dispatch_uid=f"rollups_init_{_model.__name__}")
+    post_save.connect(queue_rollups_on_save, sender=_model, dispatch_uid=f"rollups_save_{_model.__name__}")
+    post_delete.connect(queue_rollups_on_delete, sender=_model, dispatch_uid=f"rollups_delete_{_model.__name__}")
+
+
+# ------------------- Search Index -------------------
+_search_pending = threading.local()
+SEARCH_KINDS = {model: kind for kind, model in search.MODELS.items()}
+
+
+def _flush_search_index():
+    pending = getattr(_search_pending, "pks", None)
+    if not pending:
+        return
+    _search_pending.pks = {}
+    for kind, pks in pending.items():
+        update_search_index.delay(kind, sorted(pks))
+
+
+def queue_search_index(sender, instance, raw=False, **kwargs):
+    """Queue saved / deleted rows for re-indexing after commit (a deleted row's document is dropped)."""
+    if raw:
+        return
+    if getattr(_search_pending, "pks", None) is None:
+        _search_pending.pks = {}
+    _search_pending.pks.setdefault(SEARCH_KINDS[sender], set()).add(instance.pk)
+    transaction.on_commit(_flush_search_index)
+
+
+for _model in SEARCH_KINDS:
+    post_save.connect(queue_search_index, sender=_model, dispatch_uid=f"search_index_save_{_model.__name__}")
+    post_delete.connect(queue_search_index, sender=_model, dispatch_uid=f"search_index_delete_{_model.__name__}")
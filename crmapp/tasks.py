@@ -3,6 +3,10 @@ from django.core.mail import send_mail, EmailMessage
 from django.conf import settings
 import os
 import requests
+from datetime import timedelta
+from django.utils import timezone
+
+from crmapp import dashboard_metrics, exports, importers, rollups, search
 # @shared_task
 # def send_email_task(subject, message, recipient):
 #     send_mail(
@@ -113,4 +117,97 @@ def send_whatsapp_task(mobile, msg, attachment_path=None, attachment_name=None):
 
 
 
-        
\ No newline at end of file
+        
+
+
+@shared_task
+def rebuild_metric_rollups(days=None):
+    """
+    Rebuild the dashboard's daily rollups: everything, or only the last
+    `days` days (signals keep them current between runs; this repairs
+    anything written by bulk operations that bypass signals).
+    """
+    start = timezone.localdate() - timedelta(days=days) if days else None
+    rollups.rebuild(start=start)
+    dashboard_metrics.invalidate()
+
+
+@shared_task
+def refresh_metric_rollups(days_by_metric, followup_lead_ids=(), lead_ids=()):
+    """Recompute the rollup days saves / deletes touched (queued by crmapp.signals after commit)."""
+    rollups.refresh_changes(days_by_metric, followup_lead_ids, lead_ids)
+    dashboard_metrics.invalidate()
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True)
+def run_import_job(job_id):
+    """
+    Process an ImportJob (crmapp.importers); resumes from its checkpoint when
+    re-run. bulk_create skips the post_save signals, so a finished job queues
+    its new rows for the search index and its days for the metric rollups,
+    and invalidates the cached dashboard metrics and exports.
+    """
+    finished = importers.run_job(job_id)
+    if finished is None:
+        return None
+    job, result = finished
+    index_missing_search_documents.delay(job.kind)
+    if result.days:
+        days = [rollups.day_key(day) for day in result.days]
+        refresh_metric_rollups.delay({"lead": days, "followup_remark": days})
+    dashboard_metrics.invalidate()
+    exports.invalidate()
+    return job.pk
+
+
+@shared_task
+def resume_stale_import_jobs():
+    """Re-queue import jobs whose worker died or whose task message was lost."""
+    for job in importers.stale_jobs():
+        importers.requeue_job(job)
+        run_import_job.delay(job.pk)
+        print(f"🔁 Import job {job.pk} re-queued at row {job.rows_processed}")
+
+
+@shared_task
+def run_export_job(job_id):
+    """Write an ExportJob's file (crmapp.exports) and e-mail the requester a download link."""
+    job = exports.run_job(job_id)
+    if job is None:
+        return None
+    if job.created_by and job.created_by.email:
+        send_email_task.delay(
+            f"Your {job.get_kind_display().lower()} export is ready",
+            f"Your export of {job.row_count} rows is ready to download:\n{exports.download_url(job)}",
+            job.created_by.email,
+        )
+    return job.pk
+
+
+@shared_task
+def purge_export_jobs():
+    """Delete export files older than exports.JOB_TTL."""
+    deleted = exports.purge_jobs()
+    print(f"🧹 {deleted} old export jobs removed")
+
+
+@shared_task
+def refresh_search_index():
+    """
+    Rebuild the search index (crmapp.search). Signals keep it current
+    between runs; this picks up bulk updates that bypass them.
+    """
+    search.rebuild()
+
+
+@shared_task
+def update_search_index(kind, pks):
+    """Re-index the rows crmapp.signals saw saved or deleted (crmapp.search.index)."""
+    search.index(kind, pks)
+
+
+@shared_task
+def index_missing_search_documents(kind):
+    """Index the rows of `kind` that have no search document yet (bulk imports)."""
+    count = search.index_missing(kind)
+    print(f"🔎 Search index: {count} new {kind} documents")
@@ -1,3 +1,86 @@
-from django.test import TestCase
+from datetime import date
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import TransactionTestCase
+from django.urls import reverse
+
+from crm.celery import app as celery_app
+
+from . import search
+from .models import Inventory_summary, Product, SalesPerson, customer_details, lead_management
+
+
+class SearchViewTests(TransactionTestCase):
+    """
+    Request tests for the views that search through crmapp.search. A
+    TransactionTestCase, because InnoDB only adds committed rows to the
+    FULLTEXT index.
+    """
+
+    def setUp(self):
+        always_eager = celery_app.conf.task_always_eager
+        celery_app.conf.task_always_eager = True    # run the index updates the signals queue
+        self.addCleanup(setattr, celery_app.conf, "task_always_eager", always_eager)
+
+        self.user = User.objects.create_user("admin", password="secret")
+        self.user.userprofile.role = "admin"
+        self.user.userprofile.save()
+        self.client.force_login(self.user)
+
+        salesperson = SalesPerson.objects.create(
+            full_name="Asha Patil", date_of_joining=date(2024, 1, 1), mobile_no="9000000001",
+            email="asha@example.com", date_of_birth=date(1990, 1, 1),
+        )
+        self.lead = lead_management.objects.create(
+            salesperson=salesperson, customername="Ravi Kumar", primarycontact=9876543210,
+            customeremail="ravi@example.com", customersegment="Residential",
+        )
+        lead_management.objects.create(
+            salesperson=salesperson, customername="Meena Shah", primarycontact=9123456780,
+            customersegment="Residential",
+        )
+        self.customer = customer_details.objects.create(
+            fullname="Sunrise Foods", primaryemail="accounts@sunrise.example", primarycontact=9988776655,
+            contactperson="Anil", designation="Manager", customerid="CUST1001",
+        )
+        customer_details.objects.create(
+            fullname="Blue Lagoon Hotel", primaryemail="desk@bluelagoon.example", primarycontact=9811122233,
+            contactperson="Rita", designation="Owner", customerid="CUST1002",
+        )
+        product = Product.objects.create(product_name="Termite Control", category="Pest Control")
+        # bulk_create: Inventory_summary.save() prices from a Product.price field that no longer exists
+        Inventory_summary.objects.bulk_create([
+            Inventory_summary(customer_id="CUST1001", customer_name="Sunrise Foods", product=product,
+                              quantity=2, total_price=1000),
+            Inventory_summary(customer_id="CUST1002", customer_name="Blue Lagoon Hotel", product=product,
+                              quantity=1, total_price=500),
+        ])
+        search.rebuild()
+
+    def test_display_followup_finds_lead_by_phone_fragment(self):
+        response = self.client.get(reverse("display_followup"), {"q": "98765"})
+        self.assertEqual(response.status_code, 200)
+        leads = [row["lead"] for row in response.context["followups"]]
+        self.assertEqual(leads, [self.lead])
+
+    def test_search_finds_customer_by_name(self):
+        response = self.client.get("/search", {"q": "sunrise"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(list(response.context["page_obj"]), [self.customer])
+
+    def test_search_inventory_matches_customer_id(self):
+        response = self.client.get("/search_inventory", {"q": "CUST1001"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([entry.customer_id for entry in response.context["results"]], ["CUST1001"])
+
+    def test_global_search_ranks_across_kinds(self):
+        response = self.client.get(reverse("global_search"), {"q": "+91 98765 43210"})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([(r["kind"], r["id"]) for r in results], [("lead", self.lead.pk)])
+
+    def test_global_search_index_follows_saves(self):
+        self.customer.fullname = "Sunset Foods"
+        self.customer.save()
+        results = self.client.get(reverse("global_search"), {"q": "sunset", "kinds": "customer"}).json()["results"]
+        self.assertEqual([r["id"] for r in results], [self.customer.pk])
@@ -56,6 +56,10 @@ urlpatterns = [
     path('logout', views.user_logout),
     path('display_customer', views.display_customer, name="display_customer"),
     path('import-customers/', views.import_customers, name='import_customers'),
+    path('import-jobs/<int:job_id>/', views.import_job_detail, name='import_job_detail'),
+    path('import-jobs/<int:job_id>/progress/', views.import_job_progress, name='import_job_progress'),
+    path('import-jobs/<int:job_id>/retry/', views.retry_import_job, name='retry_import_job'),
+    path('import-jobs/<int:job_id>/report/', views.download_import_report, name='download_import_report'),
     path('display_service_management', views.display_service_management, name="display_service_management"),
     path('display_allocation', views.display_allocation),
     path('display_quotation', views.display_quotation, name="display_quotation"),
@@ -88,6 +92,7 @@ urlpatterns = [
     path('delete_lead_management/<int:rid>' ,views.delete_lead_management),
     path('search',views.search), 
     path('search_inventory',views.search_inventory), 
+    path('search/global/', views.global_search_view, name='global_search'),
     path('inventory_service/', views.inventory_service, name='inventory_service'),
     path('inventory_summary/', views.inventory_summary, name='inventory_summary'),
     # path('inventory_summary/<int:customer_id>/', views.inventory_summary, name='inventory_summary'),    
@@ -174,6 +179,10 @@ urlpatterns = [
     path('display_tax_invoice/', views.display_tax_invoice, name="display_tax_invoice"),
     path('tax-invoice/pdf/<int:id>/', views.tax_invoice_pdf, name='tax_invoice_pdf'),
     path('export-invoice/', views.export_invoice_excel, name='export_invoice'),
+    path('exports/<str:kind>/', views.request_export, name='request_export'),
+    path('export-jobs/<int:job_id>/', views.export_job_detail, name='export_job_detail'),
+    path('export-jobs/<int:job_id>/status/', views.export_job_status, name='export_job_status'),
+    path('export-jobs/<int:job_id>/download/', views.download_export, name='download_export'),
     path('delete_invoice/<invoice_id>/', views.delete_invoice , name='delete_invoice'),
 
 
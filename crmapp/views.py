@@ -12,12 +12,15 @@ import openpyxl
 
 from django import contrib
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
 from django.utils.dateparse import parse_date
 from django.db.models import Q, Sum, Count, Max
 from django.db.models.functions import Lower
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import HttpResponse, JsonResponse, HttpResponseForbidden
+from django.urls import reverse
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, HttpResponseForbidden
 from django.contrib import messages
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
@@ -48,10 +51,16 @@ from .models import (
     firstfollowup,
     secondfollowup,
     thirdfollowup,
-    finalfollowup
+    finalfollowup,
+    ExportJob,
+    ImportJob
 )
 
+from . import exports, importers, list_filters
+from . import search as search_index
 from .decorators import role_required
+from .tasks import run_export_job, run_import_job
+from .dashboard_metrics import get_dashboard_metrics
 from schedule_meetings.models import Meeting
 
 
@@ -105,170 +114,40 @@ def landing_page(request):
 @login_required
 @role_required(['admin', 'sales'])
 def index(request):
-        # Fetch data for Service Management
-        service_data = service_management.objects.values('selected_services').annotate(total_charges=Sum('total_charges'))
-
-        # Fetch data for Quotations
-        quotation_data = quotation.objects.values('quotation_date').annotate(total_amount=Sum('total_amount'))
-
-        # Fetch data for Invoices
-        invoice_data = invoice.objects.values('company_name').annotate(total_amount=Sum('total_amount'))
-
-        # Fetch data for Lead Management
-        lead_data1 = lead_management.objects.values('typeoflead').annotate(count=Count('id'))
-
-        # Lead type chart data (filtered by enquirydate range)
-        start_date = request.GET.get('start_date')
-        end_date = request.GET.get('end_date')
-        if start_date and end_date:
-            filtered_leads = lead_management.objects.filter(enquirydate__range=[start_date, end_date])
-        else:
-            filtered_leads = lead_management.objects.all()
+        # All chart numbers come from one cached snapshot per date-range combination
+        metrics = get_dashboard_metrics(request.GET)
 
         lead_data = {
-            "labels": ["Hot", "Warm", "Cold", "NotInterested", "LossOfOrder"],
+            "labels": metrics["lead_labels"],
             "datasets": [{
-                "data": [
-                    filtered_leads.filter(typeoflead='Hot').count(),
-                    filtered_leads.filter(typeoflead='Warm').count(),
-                    filtered_leads.filter(typeoflead='Cold').count(),
-                    filtered_leads.filter(typeoflead='NotInterested').count(),
-                    filtered_leads.filter(typeoflead='LossofOrder').count()
-                ],
+                "data": metrics["lead_counts"],
                 "backgroundColor": ['#FF6384', '#36A2EB', '#FFCE56', '#4BC0C0', '#9966FF'],
             }]
         }
-        lead_data_json = json.dumps(lead_data)
-
-    
-
-        # Follow-up remark chart data (from main_followup model)
-        start_date_followup = request.GET.get('start_date_followup')
-        end_date_followup = request.GET.get('end_date_followup')
-
-        # Filter main_followup records by enquirydate if date range is provided
-         # Adjust import according to your app structure
-
-        followup_queryset = main_followup.objects.all()
-        if start_date_followup and end_date_followup:
-            try:
-                start_dt_followup = datetime.strptime(start_date_followup, "%Y-%m-%d")
-                end_dt_followup = datetime.strptime(end_date_followup, "%Y-%m-%d")
-                # Assuming main_followup has a date field like enquirydate or followup_date to filter by
-                followup_queryset = followup_queryset.filter(enquirydate__range=[start_dt_followup, end_dt_followup])
-            except ValueError:
-                pass  # Ignore if date parsing fails
-
-        # Count by followup_remark choices
-        followup_counts = followup_queryset.values('followup_remark').annotate(count=Count('id'))
-        # Prepare labels and counts based on your choices order
-        followup_labels = [
-            'Call not received',
-            'Give next Follow up date',
-            'Call Out of Coverage Area',
-        ]
-        # Create data list aligned with labels order
-        followup_data_list = []
-        for label in followup_labels:
-            entry = next((item for item in followup_counts if item['followup_remark'] == label), None)
-            followup_data_list.append(entry['count'] if entry else 0)
-
-        # Bar chart data for products by category
-        pest_control_count = Product.objects.filter(category='Pest Control').count()
-        fumigation_count = Product.objects.filter(category='Fumigation').count()
-        product_sell_count = Product.objects.filter(category='Product Sell').count()
 
         bar_chart_data = {
-            "labels": ['Pest Control', 'Fumigation', 'Product Sell'],
+            "labels": metrics["product_labels"],
             "datasets": [{
                 "label": "Number of Products per Category",
-                "data": [pest_control_count, fumigation_count, product_sell_count],
+                "data": metrics["product_counts"],
                 "backgroundColor": ['#FF6384', '#36A2EB', '#FFCE56'],
             }]
         }
 
-        # Contract Type Distribution chart filtering
-        start_date_service = request.GET.get('start_date_service')
-        end_date_service = request.GET.get('end_date_service')
-
-        if start_date_service and end_date_service:
-            start_date_service_obj = datetime.strptime(start_date_service, "%Y-%m-%d")
-            end_date_service_obj = datetime.strptime(end_date_service, "%Y-%m-%d")
-            service_data = service_management.objects.filter(
-                Q(service_date__gte=start_date_service_obj) & Q(service_date__lte=end_date_service_obj)
-            ).values("contract_type").annotate(count=Count("id")).order_by("contract_type")
-        else:
-            service_data = service_management.objects.values("contract_type").annotate(count=Count("id")).order_by("contract_type")
-
-        labellist = [entry["contract_type"] for entry in service_data]
-        countlist = [entry["count"] for entry in service_data]
-
-        # Quotation and Invoice counts filtered by date and type
-        start_date_qo = request.GET.get('start_date_qo')
-        end_date_qo = request.GET.get('end_date_qo')
-        filter_type = request.GET.get('filter_type')
-
-        quotations_count = 0
-        orders_count = 0
-
-        if start_date_qo and end_date_qo:
-            start_date_obj = datetime.strptime(start_date_qo, "%Y-%m-%d")
-            end_date_obj = datetime.strptime(end_date_qo, "%Y-%m-%d")
-            if filter_type == 'quotation':
-                quotations_count = quotation.objects.filter(
-                    Q(quotation_date__gte=start_date_obj) & Q(quotation_date__lte=end_date_obj)
-                ).count()
-                orders_count = invoice.objects.count()
-            elif filter_type == 'invoice':
-                orders_count = invoice.objects.filter(
-                    Q(date__gte=start_date_obj) & Q(date__lte=end_date_obj)
-                ).count()
-                quotations_count = quotation.objects.count()
-        else:
-            quotations_count = quotation.objects.count()
-            orders_count = invoice.objects.count()
-
-        start_date = request.GET.get("start_date_order")
-        end_date = request.GET.get("end_date_order")
-        followups = main_followup.objects.all()
-        # print("followups",followups)
-
-        if start_date and end_date:
-            try:
-                start = datetime.strptime(start_date, "%Y-%m-%d").date()
-                end = datetime.strptime(end_date, "%Y-%m-%d")+ timedelta(days=1) 
-                followups = followups.filter(created_at__range=(start, end))
-                # print("followup_filter", followups)
-            except ValueError:
-                pass  
-
-        # Create labels and data
-        order_status_labels = ['Close Win', 'Close Loss', 'Not Closed']
-        queryset = followups.values('order_status').annotate(count=Count('id'))
-
-        order_status_data = []
-        for label in order_status_labels:
-            match = next((item for item in queryset if item['order_status'] == label), None)
-            order_status_data.append(match['count'] if match else 0)
-
-
         context = {
-            'lead_data': lead_data_json,
-            'service_data': service_data,
-            'quotation_data': quotation_data,
-            'invoice_data': invoice_data,
-            'labellist': json.dumps(labellist),
-            'countlist': json.dumps(countlist),
+            'lead_data': json.dumps(lead_data),
+            'labellist': json.dumps(metrics["contract_labels"]),
+            'countlist': json.dumps(metrics["contract_counts"]),
             "quotationlist": json.dumps(["Quotations", "Orders"]),
-            "order": json.dumps([quotations_count, orders_count]),
+            "order": json.dumps([metrics["quotations_count"], metrics["orders_count"]]),
             'bar_chart_data': json.dumps(bar_chart_data),
 
 
-            "order_status_labels": order_status_labels,
-            "order_status_data": order_status_data,
+            "order_status_labels": metrics["order_status_labels"],
+            "order_status_data": metrics["order_status_counts"],
             # Follow-up chart context
-            'follow_up_labels': json.dumps(followup_labels),
-            'follow_up_data': json.dumps(followup_data_list),
+            'follow_up_labels': json.dumps(metrics["followup_labels"]),
+            'follow_up_data': json.dumps(metrics["followup_counts"]),
         }
 
         return render(request, 'index.html', context)
@@ -603,25 +482,7 @@ def sales_person_list(request):
 @login_required
 @role_required(['admin'])
 def export_sales_person_csv(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="sales_persons.csv"'
-
-    writer = csv.writer(response)
-    
-    # Header row
-    writer.writerow(['Full Name', 'Date of Joining', 'Mobile No', 'Email', 'Date of Birth'])
-
-    # Data rows
-    for sp in SalesPerson.objects.all():
-        writer.writerow([
-            sp.full_name,
-            sp.date_of_joining.strftime('%Y-%m-%d'),
-            sp.mobile_no,
-            sp.email,
-            sp.date_of_birth.strftime('%Y-%m-%d'),
-        ])
-
-    return response
+    return exports.export_response(request, exports.SALES_PERSONS, exports.sales_persons())
 
 
 # Edit Sales Person
@@ -774,23 +635,8 @@ def customer_details_create(request):
 
 @login_required
 def export_customer_excel(request):
-
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="customer_list.csv"'
-
-    writer = csv.writer(response)
-
-    # Get all model field names
-    model_fields = [field.name for field in customer_details._meta.fields]
-
-    # Write header row
-    writer.writerow([field.replace('_', ' ').title() for field in model_fields])
-
-    # Write data rows
-    for obj in customer_details.objects.all().values_list(*model_fields):
-        writer.writerow(obj)
-
-    return response
+    # Same search / filters / sorting as display_customer
+    return exports.export_response(request, exports.CUSTOMERS, list_filters.filter_customers(request.GET))
 
 
 @login_required
@@ -820,22 +666,7 @@ def product_list(request):
 
 @login_required
 def export_product_list_csv(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="product_list.csv"'
-
-    writer = csv.writer(response)
-    
-    # Header row
-    writer.writerow(['Name', 'Category'])
-
-    # Data rows
-    for p in Product.objects.all():
-        writer.writerow([
-            p.product_name,
-            p.category
-        ])
-
-    return response
+    return exports.export_response(request, exports.PRODUCTS, exports.products(request.GET.get('category')))
 
 @login_required
 def delete_product(request, product_id):
@@ -1881,7 +1712,7 @@ from .models import main_followup, lead_management
 from django.utils import timezone
 from datetime import date
 from django.core.paginator import Paginator
-from itertools import chain
+from . import followup_worklist
 
 @login_required
 @role_required(['admin','sales'])
@@ -1890,31 +1721,16 @@ def today_work(request):
 
     salesperson_filter = request.GET.get('salesperson')
 
-    # Filter today's follow-ups
-    if request.user.userprofile.role =='admin':
-        lead_folloup = lead_management.objects.filter(firstfollowupdate = today)
-        followups = main_followup.objects.filter(next_followup_date=today).select_related('lead')
-    elif request.user.userprofile.role == 'sales': 
-        lead_folloup = lead_management.objects.filter(firstfollowupdate = today ,
-                                                    salesperson__mobile_no = request.user.username )
-        followups = main_followup.objects.filter(next_followup_date=today, 
-                                                 lead__salesperson__mobile_no=request.user.username ).select_related('lead')
-    # lead_folloup = lead_management.objects.filter(firstfollowupdate = today)
-    # followups = main_followup.objects.filter(next_followup_date=today).select_related('lead')
-
+    # Leads whose latest follow-up (or first follow-up date, if none yet) is today
+    leads = lead_management.objects.select_related('salesperson')
+    if request.user.userprofile.role == 'sales':
+        leads = leads.filter(salesperson__mobile_no=request.user.username)
     if salesperson_filter:
-        followups = followups.filter(lead__salesperson=salesperson_filter)
-        lead_folloup = lead_folloup.filter(salesperson = salesperson_filter)
+        leads = leads.filter(salesperson=salesperson_filter)
+    worklist = followup_worklist.ordered(followup_worklist.due_on(leads, today), 'customername')
 
-    # Combine followups and lead_folloup
-    combined = list(chain(
-        followups,  # main_followup objects (with .lead field)
-        [lead for lead in lead_folloup if not main_followup.objects.filter(lead=lead).exists()]  # avoid duplication
-    ))
-    
-    count = len(combined)
     # Pagination
-    paginator = Paginator(combined, 10)  # Show 10 records per page
+    paginator = Paginator(worklist, 10)  # Show 10 records per page
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
 
@@ -1930,13 +1746,12 @@ def today_work(request):
         'salespersons': salespersons,
         'selected_salesperson': salesperson_filter,
         'start_index': start_index,
-        'count': count,
+        'count': paginator.count,
     })
 
 
 
 
-from itertools import chain
 from datetime import date
 from django.core.paginator import Paginator
 from django.shortcuts import render
@@ -1962,86 +1777,39 @@ def pending_followups(request):
     order = request.GET.get('order', 'asc')
     segment_filter = request.GET.get('segments')
 
-    order_prefix = '-' if order == 'desc' else ''
-
     # Base queryset filtered by role
-    if request.user.userprofile.role == 'admin':
-        lead_folloup = lead_management.objects.filter(firstfollowupdate__lt=today)
-    else:  # Sales role
-        lead_folloup = lead_management.objects.filter(
-            firstfollowupdate__lt=today,
-            salesperson__mobile_no=request.user.username
-        )
-    followups = main_followup.objects.filter(next_followup_date__lt=today).select_related('lead')
+    leads = lead_management.objects.select_related('salesperson')
+    if request.user.userprofile.role != 'admin':  # Sales role
+        leads = leads.filter(salesperson__mobile_no=request.user.username)
+
     # Apply additional filters
+    if search_query:
+        leads = leads.filter(
+            Q(primarycontact__icontains=search_query) |
+            Q(customername__icontains=search_query) |
+            Q(typeoflead__icontains=search_query)
+        )
     if typeoflead_filter:
-        lead_folloup = lead_folloup.filter(typeoflead=typeoflead_filter)
-        followups = followups.filter(lead__typeoflead=typeoflead_filter) 
+        leads = leads.filter(typeoflead=typeoflead_filter)
     if source_filter:
-        lead_folloup = lead_folloup.filter(sourceoflead=source_filter)
+        leads = leads.filter(sourceoflead=source_filter)
     if branch_filter:
-        lead_folloup = lead_folloup.filter(branch=branch_filter)
-        followups = followups.filter(lead__branch=branch_filter)
+        leads = leads.filter(branch=branch_filter)
     if segment_filter:
-        lead_folloup = lead_folloup.filter(customersegment=segment_filter)
-        followups = followups.filter(lead__customersegment=segment_filter)
-    if enquiry_from and enquiry_to:
-        lead_folloup = lead_folloup.filter(enquirydate__range=[enquiry_from, enquiry_to])
-    if followup_from and followup_to:
-        lead_folloup = lead_folloup.filter(firstfollowupdate__range=[followup_from, followup_to])
-
-    # Overdue leads with followup
-    # followups = main_followup.objects.filter(next_followup_date__lt=today).select_related('lead')
-    if request.user.userprofile.role != 'admin':
-        followups = followups.filter(lead__salesperson__mobile_no=request.user.username)
+        leads = leads.filter(customersegment=segment_filter)
     if salesperson_filter:
-        lead_folloup = lead_folloup.filter(salesperson__full_name=salesperson_filter)
-        followups = followups.filter(lead__salesperson__full_name=salesperson_filter)
-
-    # Combine leads: followups + leads without any followup
-    combined_leads = list(chain(
-        followups,
-        [lead for lead in lead_folloup if not main_followup.objects.filter(lead=lead).exists()]
-    ))
-
-    # Apply search and filters manually
-    filtered = []
-    count_data = 0
-    for item in combined_leads:
-        lead = item.lead if hasattr(item, 'lead') else item
-
-        if search_query and not (
-            search_query.lower() in str(lead.primarycontact).lower() or
-            search_query.lower() in str(lead.customername).lower() or
-            search_query.lower() in str(lead.typeoflead).lower()
-        ):
-            continue
-        if typeoflead_filter and lead.typeoflead != typeoflead_filter:
-            continue
-        if source_filter and lead.sourceoflead != source_filter:
-            continue
-        if branch_filter and lead.branch != branch_filter:
-            continue
-        if enquiry_from and enquiry_to and not (enquiry_from <= str(lead.enquirydate) <= enquiry_to):
-            continue
-        if followup_from and followup_to and not (followup_from <= str(lead.firstfollowupdate) <= followup_to):
-            continue
-        if segment_filter and lead.customersegment != segment_filter:
-            continue
-
-        filtered.append(item)
-
-        count_data = len(filtered)
-
-    # Sort
-    def get_sort_value(obj):
-        lead = obj.lead if hasattr(obj, 'lead') else obj
-        return getattr(lead, sort_by, '')
+        leads = leads.filter(salesperson__full_name=salesperson_filter)
+    if enquiry_from and enquiry_to:
+        leads = leads.filter(enquirydate__range=[enquiry_from, enquiry_to])
 
-    combined_leads.sort(key=get_sort_value, reverse=(order == 'desc'))
+    # Overdue: latest follow-up's next date (or first follow-up date, if none yet) before today
+    worklist = followup_worklist.overdue(leads, today)
+    if followup_from and followup_to:
+        worklist = worklist.filter(followup_date__range=[followup_from, followup_to])
+    worklist = followup_worklist.ordered(worklist, sort_by, descending=(order == 'desc'))
 
     # Pagination
-    paginator = Paginator(combined_leads, 10)
+    paginator = Paginator(worklist, 10)
     page_number = request.GET.get('page')
     page_obj = paginator.get_page(page_number)
     start_index = (page_obj.number - 1) * paginator.per_page
@@ -2085,10 +1853,7 @@ def display_followup(request):
     
     leads = lead_management.objects.all()
     if search_query:
-        leads = leads.filter(
-            Q(customername__icontains=search_query) |  # Search by customer name
-            Q(customeremail__icontains=search_query)  # Optionally, search by email
-        )
+        leads = leads.filter(pk__in=search_index.matching_ids("lead", search_query))
     
     followups = []
     for lead in leads:
@@ -2117,27 +1882,9 @@ def display_customer(request):
     sort_by = request.GET.get('sort_by', 'customerid')
     customer_type = request.GET.get('customer_type')
 
-    # Base queryset
-    m = customer_details.objects.all()
-
-    # Apply search filters
-    if query:
-        m = m.filter(
-            Q(customerid__icontains=query) |
-            Q(primarycontact__icontains=query) |
-            Q(fullname__icontains=query)
-        )
-
-    # Apply customer type filter
-    if customer_type:
-        m = m.filter(customer_type=customer_type)
-
+    # Search, customer type filter and sorting (shared with export_customer_excel)
+    m = list_filters.filter_customers(request.GET)
     filter_count = m.count()
-    # Apply sorting
-    if sort_by == 'firstname':
-        m = m.order_by('-firstname' if sort_order == 'desc' else 'firstname')
-    else:
-        m = m.order_by('-customerid' if sort_order == 'desc' else 'customerid')
 
     # Pagination
     paginator = Paginator(m, 10)
@@ -2162,55 +1909,61 @@ def import_customers(request):
     if request.method == 'POST':
         form = CustomerImportForm(request.POST, request.FILES)
         if form.is_valid():
-            file = request.FILES['file']
-            file_type = file.name.split('.')[-1]
-
-            if file_type == 'csv':
-                handle_customer_csv(file)
-                messages.success(request, "Customer data imported successfully.")
-            else:
-                messages.error(request, 'Only CSV files are supported.')
-                return redirect('import_customers')
-
-            return redirect('display_customer')  # Update as per your success page
+            return _start_import_job(request, ImportJob.KIND_CUSTOMER, 'import_customers')
     else:
         form = CustomerImportForm()
 
     return render(request, 'import_customer.html', {'form': form})
 
 
-def handle_customer_csv(file):
-    decoded_file = file.read().decode('utf-8').splitlines()
-    reader = csv.reader(decoded_file)
-    next(reader)  # Skip header
+def _start_import_job(request, kind, form_url):
+    """Queue the uploaded file as an ImportJob and send the user to its progress page."""
+    try:
+        job = importers.create_job(kind, request.FILES['file'], request.user)
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect(form_url)
+    transaction.on_commit(lambda: run_import_job.delay(job.pk))
+    return redirect('import_job_detail', job_id=job.pk)
 
-    for row in reader:
-        try:
-            if len(row) < 16:
-                print(f"⚠️ Skipped incomplete row: {row}")
-                continue
 
-            customer_details.objects.create(
-                fullname=row[1].strip(),
-                primaryemail=row[2].strip(),
-                secondaryemail=row[3].strip() if row[3].strip().lower() != 'null' else None,
-                primarycontact=int(row[4].strip()),
-                secondarycontact=int(row[5].strip()) if row[5].strip().lower() != 'null' else None,
-                contactperson=row[6].strip(),
-                customersegment=row[7].strip(),
-                shifttopartyaddress=row[8].strip(),
-                shifttopartycity=row[9].strip(),
-                shifttopartystate=row[10].strip(),
-                shifttopartypostal=row[11].strip(),
-                soldtopartyaddress=row[12].strip(),
-                soldtopartycity=row[13].strip(),
-                soldtopartystate=row[14].strip(),
-                soldtopartypostal=row[15].strip(),
-                customerid=row[16].strip() if row[16].strip() else None,
-            )
+def _import_job_for(request, job_id):
+    job = get_object_or_404(ImportJob, pk=job_id)
+    if not importers.can_access(job, request.user):
+        raise Http404
+    return job
 
-        except Exception as e:
-            print(f"❌ Error importing row {row}: {e}")
+
+@login_required
+def import_job_detail(request, job_id):
+    job = _import_job_for(request, job_id)
+    return render(request, 'import_job.html', {'job': job, 'progress': importers.job_progress(job)})
+
+
+@login_required
+def import_job_progress(request, job_id):
+    job = _import_job_for(request, job_id)
+    return JsonResponse(importers.job_progress(job))
+
+
+@login_required
+def retry_import_job(request, job_id):
+    job = _import_job_for(request, job_id)
+    if request.method == 'POST' and job.status == ImportJob.FAILED:
+        importers.requeue_job(job)
+        transaction.on_commit(lambda: run_import_job.delay(job.pk))
+    return redirect('import_job_detail', job_id=job.pk)
+
+
+@login_required
+def download_import_report(request, job_id):
+    """Error report (CSV) of an import job, for its owner or an admin."""
+    job = _import_job_for(request, job_id)
+    if not job.rows_failed or not default_storage.exists(job.report_name):
+        raise Http404
+    return FileResponse(
+        default_storage.open(job.report_name, "rb"), as_attachment=True, filename=f"import_errors_{job.pk}.csv"
+    )
 
 
 from crmapp.models import Reschedule
@@ -2559,57 +2312,25 @@ from .models import lead_management, SalesPerson, main_followup
 
 
 def display_lead_management(request):
-    # 1. Start with all leads
-    if request.user.userprofile.role =='admin':
-        filtered_leads = lead_management.objects.all()
-    elif request.user.userprofile.role == 'sales':
-        salesperson = SalesPerson.objects.get(mobile_no =request.user.username)
-        filtered_leads = lead_management.objects.filter(salesperson=salesperson)
-    # 2. Get filters from request
+    # 1. Get filters from request
     search_query = request.GET.get('search','').strip()
     typeoflead_filter = request.GET.get('typeoflead')
     source_filter = request.GET.get('sourceoflead')
     salesperson_filter = request.GET.get('salesperson')
     branch_filter = request.GET.get('branch')
-    enquiry_from = request.GET.get('enquiry_from')
-    enquiry_to = request.GET.get('enquiry_to')
-    followup_from = request.GET.get('followup_from')
-    followup_to = request.GET.get('followup_to')
     sort_by = request.GET.get('sort', 'customername')
     order = request.GET.get('order', 'asc')
     segment_filter = request.GET.get('segments')
     customer_type = request.GET.get('customer_type')
 
-    # 3. Apply search filter
-    if search_query:
-        filtered_leads = filtered_leads.filter(
-            Q(primarycontact__icontains=search_query) |
-            Q(typeoflead__icontains=search_query) |
-            Q(customername__icontains=search_query)
-        )
+    # 2. Leads visible to the user, with search and filters applied (shared with export_leads_excel)
+    filtered_leads = list_filters.filter_leads(request.GET, request.user)
 
-    # 4. Apply other filters
-    if typeoflead_filter:
-        filtered_leads = filtered_leads.filter(typeoflead=typeoflead_filter)
-    if source_filter:
-        filtered_leads = filtered_leads.filter(sourceoflead=source_filter)
-    if salesperson_filter:
-        filtered_leads = filtered_leads.filter(salesperson__full_name=salesperson_filter)
-    if branch_filter:
-        filtered_leads = filtered_leads.filter(branch=branch_filter)
-    if enquiry_from and enquiry_to:
-        filtered_leads = filtered_leads.filter(enquirydate__range=[enquiry_from, enquiry_to])
-    if followup_from and followup_to:
-        filtered_leads = filtered_leads.filter(firstfollowupdate__range=[followup_from, followup_to])
-    if segment_filter:
-        filtered_leads = filtered_leads.filter(customersegment=segment_filter)
-    if customer_type:
-        filtered_leads = filtered_leads.filter(customer_type=customer_type)
     # 5. Count for display
     branch_count = filtered_leads.count()
 
-    # 6. Apply sorting
-    leads = filtered_leads.order_by('-id')
+    # 6. Sorting (newest first) is applied by filter_leads
+    leads = filtered_leads
     # 7. Apply pagination
     paginator = Paginator(leads, 10)
     page_number = request.GET.get('page')
@@ -2700,24 +2421,60 @@ from django.http import HttpResponse
 import xlwt
 from .models import lead_management
 
+@login_required
 def export_leads_excel(request):
+    # Same role scoping and filters as display_lead_management
+    return exports.export_response(request, exports.LEADS, list_filters.filter_leads(request.GET, request.user))
 
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="leads_full.csv"'
 
-    writer = csv.writer(response)
+@login_required
+def request_export(request, kind):
+    """Background export of a list page (leads / customers / invoices) with its current filters."""
+    if kind not in exports.JOBS:
+        raise Http404
+    job, created = exports.request_job(kind, request)
+    if created:
+        transaction.on_commit(lambda: run_export_job.delay(job.pk))
+    if job.status == ExportJob.DONE:
+        return redirect('download_export', job_id=job.pk)  # unchanged data: cached file
+    return redirect('export_job_detail', job_id=job.pk)
+
+
+def _export_job_for(request, job_id):
+    exports.fail_stale_jobs(ExportJob.objects.filter(pk=job_id))  # so the status page stops polling
+    job = get_object_or_404(ExportJob, pk=job_id)
+    if not exports.can_access(job, request.user):
+        raise Http404
+    return job
+
+
+def _export_job_status(job):
+    return {
+        'id': job.pk,
+        'status': job.status,
+        'rows': job.row_count,
+        'error': job.error,
+        'download_url': reverse('download_export', args=[job.pk]) if job.status == ExportJob.DONE else None,
+    }
 
-    # Get all model field names
-    model_fields = [field.name for field in lead_management._meta.fields]
 
-    # Write header row
-    writer.writerow([field.replace('_', ' ').title() for field in model_fields])
+@login_required
+def export_job_detail(request, job_id):
+    job = _export_job_for(request, job_id)
+    return render(request, 'export_job.html', {'job': job, 'job_status': _export_job_status(job)})
 
-    # Write data rows
-    for obj in lead_management.objects.all().values_list(*model_fields):
-        writer.writerow(obj)
 
-    return response
+@login_required
+def export_job_status(request, job_id):
+    return JsonResponse(_export_job_status(_export_job_for(request, job_id)))
+
+
+@login_required
+def download_export(request, job_id):
+    job = _export_job_for(request, job_id)
+    if job.status != ExportJob.DONE or not job.file:
+        return redirect('export_job_detail', job_id=job.pk)
+    return FileResponse(job.file.open('rb'), as_attachment=True, filename=job.file.name.rsplit('/', 1)[-1])
 
 
 
@@ -3482,9 +3239,11 @@ def edit_lead_management(request, rid):
 def search_inventory(request):
     query = request.GET.get('q', '')
     if query:
-        results = Inventory_summary.objects.filter(
-            Q(customerid__icontains=query) | Q(customername__icontains=query)
-        )
+        # Inventory rows carry the customer's id; match the customer through the search index
+        customer_ids = customer_details.objects.filter(
+            pk__in=search_index.matching_ids("customer", query)
+        ).values('customerid')
+        results = Inventory_summary.objects.filter(customer_id__in=customer_ids).select_related('product')
     else:
         results = Inventory_summary.objects.all()
     
@@ -3506,14 +3265,11 @@ def search(request):
     results = customer_details.objects.all()  # Start with all records
 
     if search_query:
-        results = results.filter(
-            Q(firstname__icontains=search_query) |
-            Q(lastname__icontains=search_query) |
-            Q(customerid__icontains=search_query)
-        )
+        results = results.filter(pk__in=search_index.matching_ids("customer", search_query))
     
-    # Apply sorting
-    results = results.order_by(f"{'-' if sort_order == 'desc' else ''}{sort_field}")
+    # Apply sorting ('firstname' is the customer's fullname)
+    order_field = 'fullname' if sort_field == 'firstname' else sort_field
+    results = results.order_by(f"{'-' if sort_order == 'desc' else ''}{order_field}")
 
     # Pagination
     paginator = Paginator(results, 10)  # Show 10 results per page
@@ -3532,6 +3288,15 @@ def search(request):
     
     return render(request, 'search.html', context)
 
+
+@login_required
+def global_search_view(request):
+    """Ranked leads, customers, quotations and tax invoices matching ?q= (crmapp.search)."""
+    query = request.GET.get('q', '').strip()
+    kinds = [k for k in request.GET.get('kinds', '').split(',') if k in search_index.MODELS]
+    results = search_index.global_search(query, scope=list_filters.lead_scope(request.user), kinds=kinds)
+    return JsonResponse({'query': query, 'results': results})
+
 # In crmapp/views.py
 from django.shortcuts import render
 from .forms import InventoryServiceForm , CustomerImportForm
@@ -4711,85 +4476,12 @@ def import_leads(request):
     if request.method == 'POST':
         form = LeadImportForm(request.POST, request.FILES)
         if form.is_valid():
-            file = request.FILES['file']
-            file_type = file.name.split('.')[-1]
-            if file_type == 'csv':
-                handle_csv(file)
-            elif file_type == 'xlsx':
-                handle_xlsx(file)
-            else:
-                messages.error(request, 'Unsupported file format. Please upload a CSV or XLSX file.')
-                return redirect('import_leads')
-            
-            return redirect('display_lead_management')  
+            return _start_import_job(request, ImportJob.KIND_LEAD, 'import_leads')
     else:
         form = LeadImportForm()
     
     return render(request, 'import_leads.html', {'form': form})
 
-import csv
-from datetime import datetime
-
-def handle_csv(file):
-    decoded_file = file.read().decode('utf-8').splitlines()
-    reader = csv.reader(decoded_file)
-    next(reader)  
-
-    for row in reader:
-        try:
-            # Handle empty or malformed rows
-            if len(row):
-                print(f"Skipped incomplete row: {row}")
-                continue
-            lead_management.objects.create(
-                sourceoflead=row[1].strip(),
-                salesperson=row[2].strip(),
-                customername=row[3].strip(),
-                customersegment=row[4].strip(),
-                enquirydate=datetime.strptime(row[5], "%Y-%m-%d").date(),
-                contactedby=row[6].strip(),
-                maincategory=row[7].strip(),
-                subcategory=row[8].strip(),
-                primarycontact=row[9].strip(),
-                secondarycontact=row[10] if row[10].strip().lower() != 'null' else None,
-                customeremail=row[11].strip(),
-                customeraddress=row[12].strip(),
-                location=row[13].strip(),
-                city=row[14].strip(),
-                typeoflead=row[15].strip(),
-                firstfollowupdate=datetime.strptime(row[16], "%Y-%m-%d").date(),
-                stage=int(row[17].strip()),
-                branch=row[18].strip(),
-                state=row[19].strip(),
-            )
-        except Exception as e:
-            print(f"❌ Error importing row {row}: {e}")
-
-
-def handle_xlsx(file):
-    wb = openpyxl.load_workbook(file)
-    sheet = wb.active
-
-    for i, row in enumerate(sheet.iter_rows(min_row=2, values_only=True), start=1):
-        lead_management.objects.create(
-            sourceoflead=row[0],
-            salesperson=row[1],
-            primarycontact=row[2],
-            customeraddress=row[3],
-            customeremail=row[4],
-            enquirydate=row[5],
-            typeoflead=row[6],
-            city=row[7],
-            contactedby=row[8],
-            customername =row[9],
-            customersegment=row[10],
-            location=row[11],
-            maincategory=row[12],
-            secondarycontact=row[13],
-            subcategory=row[14],
-            firstfollowupdate=row[15],
-            stage=row[16],
-        )
 # try1
 
 
@@ -5326,29 +5018,9 @@ def display_tax_invoice(request):
     query = request.GET.get('search', '')
     sort_by = request.GET.get('sort_by', '')
     sort_order = request.GET.get('order', 'asc')
-    
-    
-    if query:
-        m = TaxInvoice.objects.filter(
-            Q(customer__customerid__icontains=query) |
-            Q(tax_invoice_no__icontains=query)
-        )
-    else:
-        m = TaxInvoice.objects.all().prefetch_related('items')
 
-    
-    if sort_by == 'name':
-        sort_field = 'customer__fullname'
-    elif sort_by == 'invoice_no':
-        sort_field = 'tax_invoice_no'
-    else:
-        sort_field = 'id'  # default sorting if no valid sort_by is provided
-
-    # Apply ordering based on direction
-    if sort_order == 'desc':
-        m = m.order_by(f'-{sort_field}')
-    else:
-        m = m.order_by(sort_field)
+    # Search and sorting (shared with export_invoice_excel)
+    m = list_filters.filter_tax_invoices(request.GET).prefetch_related('items')
 
     paginator = Paginator(m, 10)  
     page_number = request.GET.get('page')
@@ -5578,40 +5250,9 @@ from django.views.decorators.csrf import csrf_exempt
 from django.core.exceptions import ValidationError
 
 def export_invoice_excel(request):
-    response = HttpResponse(content_type='text/csv')
-    response['Content-Disposition'] = 'attachment; filename="invoice_list.csv"'
-
-    writer = csv.writer(response)
-
-    # Header row
-    writer.writerow([
-        'Invoice No', 'Quotation No', 'Customer Name', 'Bank Name', 'Created At', 'Grand Total',
-        'Product Name', 'HSN Code', 'Quantity', 'Unit', 'Price', 'GST %', 'GST Amount', 'Total'
-    ])
-
-    # Fetch invoices and write rows with their items
-    invoices = TaxInvoice.objects.select_related('quotation', 'customer', 'bank').prefetch_related('items')
-
-    for invoice in invoices:
-        for item in invoice.items.all():
-            writer.writerow([
-                invoice.tax_invoice_no,
-                invoice.quotation.quotation_no if invoice.quotation else '',
-                invoice.customer.fullname if invoice.customer else '',
-                invoice.bank.bank_name if invoice.bank else '',
-                invoice.created_at.strftime('%Y-%m-%d %H:%M'),
-                invoice.grand_total,
-                item.product_name,
-                item.hsn_code,
-                item.quantity,
-                item.unit,
-                item.price,
-                item.gst_percent,
-                item.gst_amount,
-                item.total
-            ])
-
-    return response
+    # One row per invoice item, for the invoices display_tax_invoice lists
+    invoices = list_filters.filter_tax_invoices(request.GET)
+    return exports.export_response(request, exports.INVOICES, exports.invoice_items(invoices))
 
 
 #  Payments Record Section
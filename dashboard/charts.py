@@ -0,0 +1,105 @@
+# dashboard/charts.py
+"""
+Chart data for dashboard.views.
+
+lead_chart_data() counts leads per type in one conditional-aggregation
+query and caches the series until a lead changes (it shares the
+generation counter of crmapp.dashboard_metrics, which crmapp.signals bumps
+on every lead save / delete). The page renders the series with Chart.js.
+
+render_pie_png() is the server-side fallback for clients that need an
+image. It draws with the object-oriented Agg API (no pyplot global state,
+nothing left open) and is memoised by a hash of the data, in-process and in
+the Django cache, so each distinct chart is drawn once.
+"""
+import hashlib
+import json
+from collections import OrderedDict
+from io import BytesIO
+from threading import Lock
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from crmapp import dashboard_metrics
+from crmapp.models import lead_management
+
+
+CACHE_TTL = 60 * 60
+PNG_MEMO_SIZE = 32
+
+LEAD_TYPES = [
+    ("Hot Leads", "Hot"),
+    ("Warm Leads", "Warm"),
+    ("Cold Leads", "Cold"),
+    ("Not Interested", "NotInterested"),
+    ("Loss of Order", "LossOfOrder"),
+]
+LEAD_COLORS = ['#FF6384', '#36A2EB', '#FFCE56', '#4BC0C0', '#9966FF']
+
+
+def lead_chart_data():
+    """{"total", "labels", "data", "colors"} for the lead pie chart (cached)."""
+    key = f"dashboard:lead_chart:{dashboard_metrics.generation()}"
+    data = cache.get(key)
+    if data is None:
+        counts = lead_management.objects.aggregate(
+            total=Count("id"),
+            **{f"n{i}": Count("id", filter=Q(typeoflead=value)) for i, (_, value) in enumerate(LEAD_TYPES)},
+        )
+        data = {
+            "total": counts["total"],
+            "labels": [label for label, _ in LEAD_TYPES],
+            "data": [counts[f"n{i}"] for i in range(len(LEAD_TYPES))],
+            "colors": LEAD_COLORS,
+        }
+        cache.set(key, data, CACHE_TTL)
+    return data
+
+
+def chart_hash(chart):
+    return hashlib.sha1(json.dumps(chart, sort_keys=True).encode()).hexdigest()
+
+
+# ------------------------
+# Server-side PNG (fallback)
+# ------------------------
+_png_memo = OrderedDict()
+_png_lock = Lock()
+
+
+def _draw_pie(chart):
+    fig = Figure(figsize=(6.4, 4.8))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    values = chart["data"]
+    if sum(values):
+        ax.pie(values, labels=chart["labels"], autopct='%1.1f%%', startangle=90, colors=chart["colors"])
+    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
+    buffer = BytesIO()
+    fig.savefig(buffer, format='png')
+    return buffer.getvalue()
+
+
+def render_pie_png(chart):
+    """PNG bytes for `chart` (as returned by lead_chart_data), drawn once per distinct data."""
+    digest = chart_hash(chart)
+    with _png_lock:
+        png = _png_memo.get(digest)
+        if png is not None:
+            _png_memo.move_to_end(digest)
+            return png
+
+    key = f"dashboard:pie_png:{digest}"
+    png = cache.get(key)
+    if png is None:
+        png = _draw_pie(chart)
+        cache.set(key, png, CACHE_TTL)
+
+    with _png_lock:
+        _png_memo[digest] = png
+        while len(_png_memo) > PNG_MEMO_SIZE:
+            _png_memo.popitem(last=False)
+    return png
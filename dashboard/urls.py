@@ -5,6 +5,7 @@ from . import views
 
 urlpatterns = [
     path('view/', views.dashboard_view, name='dashboard'),
+    path('lead-chart.png', views.lead_chart_png, name='dashboard-lead-chart'),
     # path('index/', views.calendar_view, name='calendar_view'),
     path('meeting-data/', views.meeting_data, name='meeting-data'),  # API endpoint for event data
     # path('user_login', views.dashboard_view, name='user_login'),  # New path for the dashboard view
@@ -40,52 +40,42 @@
 
 # dashboard/views.py
 import datetime
-import matplotlib.pyplot as plt
-from io import BytesIO
-import base64
+import json
+from django.http import HttpResponse, HttpResponseNotModified
 from django.shortcuts import render
-from crmapp.models import lead_management
+from .charts import chart_hash, lead_chart_data, render_pie_png
 
 def dashboard_view(request):
-    # Fetch lead counts by type
-    total_leads = lead_management.objects.count()
-    hot_leads = lead_management.objects.filter(typeoflead='Hot').count()
-    warm_leads = lead_management.objects.filter(typeoflead='Warm').count()
-    cold_leads = lead_management.objects.filter(typeoflead='Cold').count()
-    not_interested = lead_management.objects.filter(typeoflead='NotInterested').count()
-    loss_of_order = lead_management.objects.filter(typeoflead='LossOfOrder').count()
-
-    # Prepare data for the pie chart
-    lead_data = [hot_leads, warm_leads, cold_leads, not_interested, loss_of_order]
-    labels = ["Hot Leads", "Warm Leads", "Cold Leads", "Not Interested", "Loss of Order"]
-
-    # Create the pie chart using matplotlib
-    fig, ax = plt.subplots()
-    ax.pie(lead_data, labels=labels, autopct='%1.1f%%', startangle=90, colors=['#FF6384', '#36A2EB', '#FFCE56', '#4BC0C0', '#9966FF'])
-    ax.axis('equal')  # Equal aspect ratio ensures that pie is drawn as a circle.
-
-    # Save the figure to a BytesIO object to convert it into an image for the web
-    buffer = BytesIO()
-    plt.savefig(buffer, format='png')
-    buffer.seek(0)
-    
-    # Convert the image to base64
-    image_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
+    # Lead counts by type: one cached aggregate, drawn client-side with Chart.js
+    chart = lead_chart_data()
+    hot_leads, warm_leads, cold_leads, not_interested, loss_of_order = chart["data"]
 
     # Prepare context
     context = {
-        'total_leads': total_leads,
+        'total_leads': chart["total"],
         'hot_leads': hot_leads,
         'warm_leads': warm_leads,
         'cold_leads': cold_leads,
         'not_interested': not_interested,
         'loss_of_order': loss_of_order,
-        'chart': image_base64  # Send the chart as a base64 string to the template
+        'lead_chart': json.dumps(chart),
     }
 
     return render(request, 'dashboard/dashboard.html', context)
 
 
+def lead_chart_png(request):
+    # Server-side image of the same chart, for clients without JavaScript
+    chart = lead_chart_data()
+    etag = f'"{chart_hash(chart)}"'
+    if request.headers.get("If-None-Match") == etag:
+        return HttpResponseNotModified()
+    response = HttpResponse(render_pie_png(chart), content_type="image/png")
+    response["ETag"] = etag
+    response["Cache-Control"] = "private, max-age=300"
+    return response
+
+
 # for displaying calender 
 
 # from django.shortcuts import render
@@ -1,13 +1,17 @@
-import pickle
+import json
+import os
 
-with open("recommender_model.pkl", "rb") as f:
-    model_data = pickle.load(f)
+from recommender import artifacts
 
-print("\n=== Model Data Type ===")
-print(type(model_data))
+MODELS_DIR = "trained_models"
 
-print("\n=== Model Contents ===")
-if isinstance(model_data, dict):
-    print("Keys:", model_data.keys())
-else:
-    print(model_data)
+for name in ("simple_cf_pivot", "simple_cf_user_similarity"):
+    artifact = artifacts.load_arrays(MODELS_DIR, name)
+    print(f"\n=== {name} ===")
+    if artifact is None:
+        print("not saved yet:", os.path.join(MODELS_DIR, name))
+        continue
+
+    print("Version:", artifact.version)
+    print("Arrays:", {key: (a.dtype.str, a.shape) for key, a in artifact.arrays.items()})
+    print("Manifest:", json.dumps(artifact.manifest, indent=2)[:2000])
@@ -1,13 +1,25 @@
 # pest_recommender_train.py
+import argparse
 import pandas as pd
 import numpy as np
 import os
+from scipy import sparse
 from sklearn.metrics.pairwise import cosine_similarity
 
+from recommender import artifacts
+from recommender.sparse_similarity import topk_cosine_similarity
+
+# --top-k keeps only each user's K nearest neighbours (sparse CSR) instead of the dense N×N matrix
+parser = argparse.ArgumentParser()
+parser.add_argument("--top-k", type=int, default=None)
+parser.add_argument("--min-similarity", type=float, default=0.0)
+args = parser.parse_args()
+
 # Paths
-input_path = os.path.join(os.getcwd(), "trained_models", "recsys_interactions_cleaned.csv")
-matrix_path = os.path.join(os.getcwd(), "trained_models", "user_item_matrix.csv")
-model_path = os.path.join(os.getcwd(), "trained_models", "user_similarity_matrix.csv")
+models_dir = os.path.join(os.getcwd(), "trained_models")
+input_path = os.path.join(models_dir, "recsys_interactions_cleaned.csv")
+matrix_name = "user_item_matrix"
+model_name = "user_similarity_matrix"
 
 print("📂 Loading cleaned dataset from:", input_path)
 df = pd.read_csv(input_path)
@@ -18,17 +30,27 @@ print("\n✅ User–Item Matrix (sample):")
 print(pivot_df.head())
 
 # Step 2️⃣ — Calculate cosine similarity between users
-similarity_matrix = cosine_similarity(pivot_df)
-similarity_df = pd.DataFrame(similarity_matrix, index=pivot_df.index, columns=pivot_df.index)
+if args.top_k:
+    # users are the columns of the transposed (item × user) matrix
+    ratings = sparse.csr_matrix(pivot_df.to_numpy(dtype=np.float64))
+    similarity_csr, stats = topk_cosine_similarity(ratings.T, k=args.top_k, min_similarity=args.min_similarity)
+    print("\n✅ Sparse User Similarity (top-K):")
+    print(stats)
+else:
+    similarity_matrix = cosine_similarity(pivot_df)
+    similarity_df = pd.DataFrame(similarity_matrix, index=pivot_df.index, columns=pivot_df.index)
 
-print("\n✅ User Similarity Matrix (sample):")
-print(similarity_df.head())
+    print("\n✅ User Similarity Matrix (sample):")
+    print(similarity_df.head())
 
-# Step 3️⃣ — Save outputs
-pivot_df.to_csv(matrix_path)
-similarity_df.to_csv(model_path)
+# Step 3️⃣ — Save outputs (memory-mapped artifacts, see recommender/artifacts.py)
+matrix_version = artifacts.save_frame(models_dir, matrix_name, pivot_df.astype(np.float64))
+if args.top_k:
+    model_version = artifacts.save_csr(models_dir, model_name, similarity_csr, pivot_df.index.to_numpy(), meta=stats)
+else:
+    model_version = artifacts.save_frame(models_dir, model_name, similarity_df)
 
 print(f"\n💾 Saved matrices:")
-print(f"User–Item Matrix → {matrix_path}")
-print(f"User Similarity Matrix → {model_path}")
+print(f"User–Item Matrix → {os.path.join(models_dir, matrix_name)} (v{matrix_version})")
+print(f"User Similarity Matrix → {os.path.join(models_dir, model_name)} (v{model_version})")
 print("\n✅ Training completed successfully!")
@@ -0,0 +1,83 @@
+# recommender/ann_index.py
+"""
+Approximate nearest-neighbour index over TF-IDF rows (cosine similarity).
+
+Random-projection LSH: every table hashes a row to the sign pattern of
+`n_bits` random hyperplanes, so rows with a small angle between them share a
+bucket with high probability. A query collects the rows from its bucket in
+every table (plus buckets one bit away), then ranks only those candidates
+with an exact sparse dot product. Catalogues below `exact_threshold` skip
+hashing and scan exactly; that is faster than LSH at that size anyway.
+
+The index is a plain picklable object and is stored inside the content model
+payload, so model_registry loads it once per process with the model.
+"""
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+
+class ContentANNIndex:
+    def __init__(self, matrix, n_tables=8, n_bits=12, exact_threshold=2000, seed=42):
+        self.matrix = normalize(sparse.csr_matrix(matrix, dtype=np.float32))
+        self.n_items, n_features = self.matrix.shape
+        self.exact = self.n_items < exact_threshold
+        self.n_bits = n_bits
+        self.planes = []
+        self.tables = []
+
+        if self.exact:
+            return
+
+        rng = np.random.default_rng(seed)
+        weights = 1 << np.arange(n_bits, dtype=np.int64)
+        for _ in range(n_tables):
+            planes = rng.standard_normal((n_features, n_bits)).astype(np.float32)
+            codes = (np.asarray(self.matrix @ planes) > 0).astype(np.int64) @ weights
+            order = np.argsort(codes, kind="stable")
+            uniq, starts = np.unique(codes[order], return_index=True)
+            bounds = np.append(starts, len(order))
+            buckets = {int(c): order[bounds[i]:bounds[i + 1]] for i, c in enumerate(uniq)}
+            self.planes.append(planes)
+            self.tables.append(buckets)
+
+    # ------------------------
+    # Query
+    # ------------------------
+    def _candidates(self, row):
+        weights = 1 << np.arange(self.n_bits, dtype=np.int64)
+        found = []
+        for planes, buckets in zip(self.planes, self.tables):
+            code = int((np.asarray(row @ planes).ravel() > 0).astype(np.int64) @ weights)
+            # probe the exact bucket and every bucket one bit-flip away
+            for probe in [code] + [code ^ (1 << b) for b in range(self.n_bits)]:
+                hit = buckets.get(probe)
+                if hit is not None:
+                    found.append(hit)
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(found))
+
+    def query(self, idx, top_k=10):
+        """Return [(row_index, similarity), ...] for the rows most similar to row `idx`, excluding it."""
+        row = self.matrix[idx]
+        candidates = None if self.exact else self._candidates(row)
+
+        if candidates is None or len(candidates) <= top_k:
+            candidates = np.arange(self.n_items)
+            sims = np.asarray((self.matrix @ row.T).todense()).ravel()
+        else:
+            sims = np.asarray((self.matrix[candidates] @ row.T).todense()).ravel()
+        keep = candidates != idx
+        candidates, sims = candidates[keep], sims[keep]
+
+        k = min(top_k, len(candidates))
+        if k == 0:
+            return []
+        top = np.argpartition(-sims, k - 1)[:k]
+        top = top[np.argsort(-sims[top], kind="stable")]
+        return [(int(candidates[i]), float(sims[i])) for i in top]
+
+
+def build_content_index(matrix, **kwargs):
+    return ContentANNIndex(matrix, **kwargs)
@@ -3,7 +3,9 @@ from django.http import JsonResponse, HttpResponseBadRequest
 from django.views.decorators.csrf import csrf_exempt
 from django.db.models import Count
 from recommender.models import Item
-from crmapp.models import customer_details, TaxInvoice, TaxInvoiceItem
+from recommender.product_catalog import product_catalog
+from recommender.copurchase_index import load_copurchase_index
+from crmapp.models import customer_details, TaxInvoiceItem
 import json
 import requests
 
@@ -77,32 +79,15 @@ def get_recommendations(request):
 # Returns {"recommendations": ["Product A", "Product B", ...]}
 # -------------------------
 def user_recommendations(request, customer_id):
-    invoices = TaxInvoice.objects.filter(customer_id=customer_id)
-    if not invoices.exists():
+    purchased_names = _purchased_product_names(customer_id)
+    if not purchased_names:
         return JsonResponse({"recommendations": []})
 
-    # products this customer purchased
-    purchased_product_ids = TaxInvoiceItem.objects.filter(invoice__in=invoices).values_list("product_id", flat=True)
-
     # Find other invoice items co-purchased by other customers (excluding customer's products)
-    co_purchased = (TaxInvoiceItem.objects
-                    .exclude(product_id__in=purchased_product_ids)
-                    .values("product_id")
-                    .annotate(cnt=Count("product_id"))
-                    .order_by("-cnt")[:8])
-
-    # Map product_id -> product title using Item model (best effort)
-    product_titles = []
-    for entry in co_purchased:
-        pid = entry["product_id"]
-        item = Item.objects.filter(id=pid).first()
-        if item:
-            product_titles.append(item.title)
-        else:
-            # fallback to product_id string if no Item row
-            product_titles.append(f"Product-{pid}")
+    co_purchased = _top_invoice_products(exclude_names=purchased_names, limit=8)
 
-    return JsonResponse({"recommendations": product_titles})
+    # Map product name -> catalogue title (no per-row queries)
+    return JsonResponse({"recommendations": [_display_title(name) for name in co_purchased]})
 
 
 # -------------------------
@@ -123,28 +108,52 @@ def upsell_recommendations_api(request, product_id):
 # Cross-sell suggestions (by customer)
 # -------------------------
 def cross_sell_recommendations_api(request, customer_id):
-    invoices = TaxInvoice.objects.filter(customer_id=customer_id)
-    if not invoices.exists():
+    index = load_copurchase_index()
+    if index is not None:
+        # products most often bought together with this customer's basket
+        basket = index.customer_products.get(int(customer_id), {})
+        if not basket:
+            return JsonResponse({'cross_sell_suggestions': []})
+        pids = [pid for pid, _, _ in index.recommend(basket, top_n=6)]
+        pids += index.popular(6 - len(pids), exclude=set(basket) | set(pids))
+        return JsonResponse({"cross_sell_suggestions": product_catalog.titles(pids)})
+
+    # index not built yet: fall back to global purchase counts
+    purchased_names = _purchased_product_names(customer_id)
+    if not purchased_names:
         return JsonResponse({'cross_sell_suggestions': []})
 
-    purchased_product_ids = TaxInvoiceItem.objects.filter(invoice__in=invoices).values_list("product_id", flat=True)
+    co_purchased = _top_invoice_products(exclude_names=purchased_names, limit=6)
+    return JsonResponse({"cross_sell_suggestions": [_display_title(name) for name in co_purchased]})
 
-    co_purchased = (TaxInvoiceItem.objects
-                    .exclude(product_id__in=purchased_product_ids)
-                    .values("product_id")
-                    .annotate(cnt=Count("product_id"))
-                    .order_by("-cnt")[:6])
 
-    titles = []
-    for entry in co_purchased:
-        pid = entry["product_id"]
-        item = Item.objects.filter(id=pid).first()
-        if item:
-            titles.append(item.title)
-        else:
-            titles.append(f"Product-{pid}")
+# -------------------------
+# Invoice helpers
+# -------------------------
+def _purchased_product_names(customer_id):
+    """Distinct product names on the customer's tax invoices (one query)."""
+    return set(
+        TaxInvoiceItem.objects
+        .filter(tax_invoice__customer_id=customer_id)
+        .values_list("product_name", flat=True)
+        .distinct()
+    )
+
+
+def _top_invoice_products(exclude_names, limit):
+    """Most frequently invoiced product names, skipping `exclude_names`."""
+    rows = (TaxInvoiceItem.objects
+            .exclude(product_name__in=exclude_names)
+            .values("product_name")
+            .annotate(cnt=Count("id"))
+            .order_by("-cnt")[:limit])
+    return [row["product_name"] for row in rows]
+
 
-    return JsonResponse({"cross_sell_suggestions": titles})
+def _display_title(product_name):
+    """Catalogue title for an invoice line's product name, falling back to the name itself."""
+    pid = product_catalog.product_id_for_name(product_name)
+    return product_catalog.title(pid) if pid is not None else product_name
 
 
 # -------------------------
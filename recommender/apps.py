@@ -0,0 +1,11 @@
+# recommender/apps.py
+from django.apps import AppConfig
+
+
+class RecommenderConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'recommender'
+
+    def ready(self):
+        # Keeps the in-process rating store and product catalogue in sync with writes
+        import recommender.signals  # noqa: F401
@@ -0,0 +1,310 @@
+# recommender/artifacts.py
+"""
+Versioned, memory-mapped storage for trained matrices (similarity models,
+user-item matrices, top-N tables).
+
+An artifact named `name` under `directory` looks like
+
+    directory/name/CURRENT            -> "3"
+    directory/name/v3/manifest.json   -> shapes, dtypes, id labels, metadata
+    directory/name/v3/values.npy      -> the matrix
+    directory/name/v3/index.npy       -> row ids    (numeric ids only;
+    directory/name/v3/columns.npy     -> column ids  text ids live in the manifest)
+
+Sparse matrices (`save_csr`) store data.npy / indices.npy / indptr.npy and
+one id list instead, and load back as a LabelledCSR over the mapped arrays.
+
+Arrays are opened with `np.load(mmap_mode="r")`, so every gunicorn worker
+maps the same page-cache pages and nothing is parsed on first use. A save
+writes a new version directory and then swaps CURRENT atomically; readers
+keep whatever version they mapped until they next call `load_*`, which
+re-reads CURRENT (one tiny file) and remaps only if it moved.
+
+This module has no Django dependency so standalone trainers in the repo
+root (pest_recommender_train.py, train_model.py) can use it too.
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+FORMAT_VERSION = 1
+KEEP_VERSIONS = 2
+
+_lock = threading.Lock()
+_loaded = {}    # (artifact dir, kind) -> (version, obj)
+_legacy = {}    # csv path -> (mtime, DataFrame)
+
+
+class Artifact:
+    """A loaded artifact version: read-only arrays plus its manifest."""
+
+    def __init__(self, path, manifest, arrays):
+        self.path = path
+        self.manifest = manifest
+        self.arrays = arrays
+
+    @property
+    def version(self):
+        return self.manifest["version"]
+
+    @property
+    def meta(self):
+        return self.manifest.get("meta", {})
+
+    def __getitem__(self, key):
+        return self.arrays[key]
+
+
+class LabelledCSR:
+    """Square CSR matrix whose rows and columns are both labelled by `index`."""
+
+    def __init__(self, matrix, index, meta=None):
+        self.matrix = matrix
+        self.index = index
+        self.meta = meta or {}
+
+    @property
+    def shape(self):
+        return self.matrix.shape
+
+
+# ------------------------
+# Saving
+# ------------------------
+def _labels_entry(labels, key, tmp_dir):
+    """Store numeric ids as .npy, anything else inline in the manifest."""
+    labels = np.asarray(labels)
+    if labels.dtype.kind in "iuf":
+        file_name = f"{key}.npy"
+        np.save(os.path.join(tmp_dir, file_name), labels)
+        return {"file": file_name}
+    return {"values": [str(v) for v in labels.tolist()]}
+
+
+def save_arrays(directory, name, arrays, labels=None, meta=None, kind="arrays"):
+    """
+    Write `arrays` ({key: ndarray}) as a new version of artifact `name`.
+    `labels` ({key: sequence}) holds id lists such as row / column ids.
+    Returns the new version number.
+    """
+    root = os.path.join(directory, name)
+    os.makedirs(root, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=root)
+
+    try:
+        manifest = {
+            "format": FORMAT_VERSION,
+            "name": name,
+            "kind": kind,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "arrays": {},
+            "labels": {},
+            "meta": meta or {},
+        }
+        for key, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            if array.dtype == object:
+                raise TypeError(f"Array '{key}' has dtype object; convert it to a numeric dtype first.")
+            file_name = f"{key}.npy"
+            np.save(os.path.join(tmp_dir, file_name), array)
+            manifest["arrays"][key] = {"file": file_name, "dtype": array.dtype.str, "shape": list(array.shape)}
+        for key, values in (labels or {}).items():
+            manifest["labels"][key] = _labels_entry(values, key, tmp_dir)
+
+        with _lock:
+            version = _latest_version(root) + 1
+            manifest["version"] = version
+            with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(tmp_dir, os.path.join(root, f"v{version}"))
+            _write_current(root, version)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    _prune(root, version)
+    return version
+
+
+def save_frame(directory, name, frame, meta=None):
+    """Save a 2-D DataFrame (values + index + columns) as artifact `name`."""
+    values = frame.to_numpy()
+    if values.dtype == object:
+        values = frame.apply(pd.to_numeric).to_numpy(dtype=np.float64)
+    meta = dict(meta or {}, index_name=frame.index.name, columns_name=frame.columns.name)
+    return save_arrays(
+        directory, name,
+        arrays={"values": values},
+        labels={"index": frame.index.to_numpy(), "columns": frame.columns.to_numpy()},
+        meta=meta,
+        kind="frame",
+    )
+
+
+def save_csr(directory, name, matrix, index, meta=None):
+    """Save a square sparse matrix labelled by `index` (row ids == column ids) as artifact `name`."""
+    matrix = sparse.csr_matrix(matrix)
+    matrix.sort_indices()
+    return save_arrays(
+        directory, name,
+        arrays={"data": matrix.data, "indices": matrix.indices, "indptr": matrix.indptr},
+        labels={"index": np.asarray(index)},
+        meta=dict(meta or {}, shape=list(matrix.shape)),
+        kind="csr",
+    )
+
+
+def _latest_version(root):
+    versions = [int(d[1:]) for d in os.listdir(root) if d.startswith("v") and d[1:].isdigit()]
+    return max(versions, default=0)
+
+
+def _write_current(root, version):
+    tmp_path = os.path.join(root, f"CURRENT.tmp-{os.getpid()}-{threading.get_ident()}")
+    with open(tmp_path, "w") as f:
+        f.write(str(version))
+    os.replace(tmp_path, os.path.join(root, "CURRENT"))
+
+
+def _prune(root, current):
+    """Drop all but the newest KEEP_VERSIONS versions (mapped pages stay valid until unmapped)."""
+    for d in os.listdir(root):
+        if d.startswith("v") and d[1:].isdigit() and int(d[1:]) <= current - KEEP_VERSIONS:
+            shutil.rmtree(os.path.join(root, d), ignore_errors=True)
+
+
+# ------------------------
+# Loading
+# ------------------------
+def current_version(directory, name):
+    """Version CURRENT points at, or None if the artifact was never saved."""
+    try:
+        with open(os.path.join(directory, name, "CURRENT")) as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+
+def exists(directory, name):
+    return current_version(directory, name) is not None
+
+
+def _read_version(root, version):
+    path = os.path.join(root, f"v{version}")
+    with open(os.path.join(path, "manifest.json")) as f:
+        manifest = json.load(f)
+
+    arrays = {
+        key: np.load(os.path.join(path, entry["file"]), mmap_mode="r")
+        for key, entry in manifest["arrays"].items()
+    }
+    for key, entry in manifest["labels"].items():
+        if "file" in entry:
+            arrays[key] = np.load(os.path.join(path, entry["file"]))
+        else:
+            arrays[key] = np.asarray(entry["values"], dtype=object)
+    return Artifact(path, manifest, arrays)
+
+
+def _load_cached(directory, name, kind, build):
+    root = os.path.join(directory, name)
+    version = current_version(directory, name)
+    if version is None:
+        return None
+
+    key = (root, kind)
+    entry = _loaded.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+
+    with _lock:
+        entry = _loaded.get(key)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        obj = build(_read_version(root, version))
+        _loaded[key] = (version, obj)
+        return obj
+
+
+def load_arrays(directory, name):
+    """Current Artifact for `name` (arrays memory-mapped), or None if missing."""
+    return _load_cached(directory, name, "arrays", lambda artifact: artifact)
+
+
+def _to_csr(artifact):
+    shape = tuple(artifact.meta["shape"])
+    matrix = sparse.csr_matrix(
+        (artifact["data"], artifact["indices"], artifact["indptr"]), shape=shape, copy=False
+    )
+    return LabelledCSR(matrix, artifact["index"], artifact.meta)
+
+
+def load_csr(directory, name):
+    """Current version of a sparse artifact as a LabelledCSR over the mapped arrays, or None."""
+    return _load_cached(directory, name, "csr", _to_csr)
+
+
+def load(directory, name, legacy_csv=None):
+    """
+    Load artifact `name` in the form its kind implies (DataFrame, LabelledCSR
+    or Artifact), falling back to `legacy_csv` like `load_frame`.
+    """
+    artifact = load_arrays(directory, name)
+    if artifact is None:
+        return _load_legacy_csv(legacy_csv) if legacy_csv else None
+    kind = artifact.manifest.get("kind", "frame")
+    if kind == "csr":
+        return load_csr(directory, name)
+    if kind == "frame":
+        return load_frame(directory, name)
+    return artifact
+
+
+def _to_frame(artifact):
+    meta = artifact.meta
+    index = pd.Index(artifact["index"], name=meta.get("index_name"))
+    columns = pd.Index(artifact["columns"], name=meta.get("columns_name"))
+    return pd.DataFrame(artifact["values"], index=index, columns=columns, copy=False)
+
+
+def load_frame(directory, name, legacy_csv=None):
+    """
+    Current version of a frame artifact as a DataFrame over the mapped array.
+    Until the artifact has been written, falls back to `legacy_csv` (parsed
+    once per process and file mtime). Returns None if neither exists.
+    """
+    frame = _load_cached(directory, name, "frame", _to_frame)
+    if frame is None and legacy_csv:
+        return _load_legacy_csv(legacy_csv)
+    return frame
+
+
+def _load_legacy_csv(path):
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    entry = _legacy.get(path)
+    if entry is None or entry[0] != mtime:
+        entry = _legacy[path] = (mtime, pd.read_csv(path, index_col=0))
+    return entry[1]
+
+
+def invalidate(directory=None, name=None):
+    """Forget mapped artifacts (all, or one) so the next load remaps them."""
+    with _lock:
+        if directory is None:
+            _loaded.clear()
+            _legacy.clear()
+        else:
+            root = os.path.join(directory, name)
+            for key in [k for k in _loaded if k[0] == root]:
+                del _loaded[key]
@@ -0,0 +1,317 @@
+# recommender/benchmark.py
+"""
+Offline, reproducible benchmark for the recommender engines.
+
+`make_dataset` generates a synthetic rating + interaction dataset from a
+fixed seed at a named scale (1k / 100k / 1m ratings): users and items fall
+into latent taste clusters, item popularity is Zipf-distributed, and item
+texts carry their cluster's vocabulary so content models have signal too.
+For every user with enough ratings one well-rated item is held out.
+
+Each strategy is fitted on the training split with the same building
+blocks the live engine uses (sparse_similarity, UserBasedCF, TruncatedSVD,
+ContentANNIndex, ImplicitALS) and queried for a sample of held-out users.
+Reported per strategy: precision@k / recall@k / hit rate, train time, p50 /
+p99 query latency, throughput, peak traced memory while training and the
+process's max RSS so far.
+
+Nothing touches the database; run it through
+`python manage.py benchmark_recommenders`.
+"""
+import resource
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.decomposition import TruncatedSVD
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from recommender.ann_index import build_content_index
+from recommender.artifacts import LabelledCSR
+from recommender.implicit_als import ImplicitALS
+from recommender.sparse_similarity import topk_cosine_similarity
+from recommender.user_based_cf import UserBasedCF
+
+
+SCALES = {
+    "1k": {"n_ratings": 1_000, "n_users": 100, "n_items": 50},
+    "100k": {"n_ratings": 100_000, "n_users": 5_000, "n_items": 1_000},
+    "1m": {"n_ratings": 1_000_000, "n_users": 50_000, "n_items": 5_000},
+}
+
+# UserBasedCF keeps a dense users × items matrix; skip it above this many cells
+USER_CF_MAX_CELLS = 50_000_000
+
+
+# ------------------------
+# Synthetic data
+# ------------------------
+class Dataset:
+    def __init__(self, train, test, interactions, item_texts, scale, seed):
+        self.train = train                  # csr users × items, ratings 1..5
+        self.test = test                    # {user_index: held-out item index}
+        self.interactions = interactions    # csr users × items, summed event weights
+        self.item_texts = item_texts
+        self.scale = scale
+        self.seed = seed
+
+    @property
+    def shape(self):
+        return self.train.shape
+
+
+def make_dataset(scale="100k", seed=42, n_clusters=20, in_cluster=0.8, min_user_ratings=5):
+    """Deterministic synthetic dataset for `scale` (a SCALES key)."""
+    cfg = SCALES[scale]
+    rng = np.random.default_rng(seed)
+    n_users, n_items, n_ratings = cfg["n_users"], cfg["n_items"], cfg["n_ratings"]
+
+    user_cluster = rng.integers(n_clusters, size=n_users)
+    item_cluster = rng.integers(n_clusters, size=n_items)
+    popularity = 1.0 / np.arange(1, n_items + 1) ** 0.8
+    popularity = popularity[rng.permutation(n_items)]
+    global_p = popularity / popularity.sum()
+    cluster_items = [np.flatnonzero(item_cluster == c) for c in range(n_clusters)]
+
+    # ratings per user: skewed, at least min_user_ratings
+    per_user = rng.lognormal(mean=0.0, sigma=0.8, size=n_users)
+    per_user = np.maximum(min_user_ratings, per_user / per_user.sum() * n_ratings).astype(int)
+    per_user = np.minimum(per_user, n_items // 2)
+
+    rows, cols, vals = [], [], []
+    for u, count in enumerate(per_user):
+        own = cluster_items[user_cluster[u]]
+        n_own = min(len(own), int(count * in_cluster))
+        if n_own:
+            p = popularity[own] / popularity[own].sum()
+            picked_own = rng.choice(own, size=n_own, replace=False, p=p)
+        else:
+            picked_own = np.empty(0, dtype=np.int64)
+        picked_other = rng.choice(n_items, size=count - n_own, replace=False, p=global_p)
+        items = np.unique(np.concatenate([picked_own, picked_other]))
+        liked = item_cluster[items] == user_cluster[u]
+        ratings = np.clip(np.rint(np.where(liked, 4.2, 2.6) + rng.normal(0, 0.8, len(items))), 1, 5)
+        rows.append(np.full(len(items), u))
+        cols.append(items)
+        vals.append(ratings)
+
+    rows, cols, vals = np.concatenate(rows), np.concatenate(cols), np.concatenate(vals)
+
+    # hold out one item rated >= 4 per user
+    test = {}
+    order = rng.permutation(len(rows))
+    keep = np.ones(len(rows), dtype=bool)
+    for i in order:
+        u = rows[i]
+        if u not in test and vals[i] >= 4:
+            test[int(u)] = int(cols[i])
+            keep[i] = False
+    train = sparse.csr_matrix((vals[keep], (rows[keep], cols[keep])), shape=(n_users, n_items))
+
+    # implicit events: every rating implies a view; good ratings add clicks / purchases
+    weights = 1.0 + np.where(vals >= 4, 2.0, 0.0) + np.where((vals >= 5) & (rng.random(len(vals)) < 0.5), 8.0, 0.0)
+    interactions = sparse.csr_matrix((weights[keep], (rows[keep], cols[keep])), shape=(n_users, n_items))
+
+    vocab = [[f"c{c}w{j}" for j in range(12)] for c in range(n_clusters)]
+    item_texts = [
+        " ".join(rng.choice(vocab[item_cluster[i]], size=6).tolist() + rng.choice(vocab[rng.integers(n_clusters)], size=2).tolist())
+        for i in range(n_items)
+    ]
+    return Dataset(train, test, interactions, item_texts, scale, seed)
+
+
+# ------------------------
+# Strategies
+# ------------------------
+def _top_unrated(scores, rated, n):
+    scores = np.asarray(scores, dtype=np.float64).ravel().copy()
+    scores[rated] = -np.inf
+    k = min(n, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return top[np.isfinite(scores[top])]
+
+
+class Strategy:
+    name = ""
+
+    def fit(self, data):
+        raise NotImplementedError
+
+    def recommend(self, data, user, n):
+        raise NotImplementedError
+
+    @staticmethod
+    def rated(data, user):
+        return data.train.indices[data.train.indptr[user]:data.train.indptr[user + 1]]
+
+
+class Popularity(Strategy):
+    name = "popularity"
+
+    def fit(self, data):
+        counts = np.diff(data.train.tocsc().indptr)
+        self.scores = counts.astype(np.float64)
+
+    def recommend(self, data, user, n):
+        return _top_unrated(self.scores, self.rated(data, user), n)
+
+
+class ItemCF(Strategy):
+    name = "item_cf"
+
+    def __init__(self, k=50):
+        self.k = k
+
+    def fit(self, data):
+        self.sim, _ = topk_cosine_similarity(data.train, k=self.k)
+
+    def recommend(self, data, user, n):
+        scores = (data.train[user] @ self.sim.T).toarray()
+        return _top_unrated(scores, self.rated(data, user), n)
+
+
+class UserCF(Strategy):
+    name = "user_cf"
+
+    def __init__(self, k=50):
+        self.k = k
+
+    def fit(self, data):
+        n_users, n_items = data.shape
+        if n_users * n_items > USER_CF_MAX_CELLS:
+            raise MemoryError(f"dense {n_users}x{n_items} rating matrix exceeds USER_CF_MAX_CELLS")
+        ids = np.arange(n_users)
+        user_item = pd.DataFrame(data.train.toarray(), index=ids, columns=np.arange(n_items))
+        sim, _ = topk_cosine_similarity(data.train.T, k=self.k)
+        self.model = UserBasedCF(user_item, LabelledCSR(sim, ids))
+
+    def recommend(self, data, user, n):
+        return np.asarray([item for item, _ in self.model.recommend(user, top_n=n)], dtype=np.int64)
+
+
+class SVD(Strategy):
+    name = "svd"
+
+    def __init__(self, n_components=50):
+        self.n_components = n_components
+
+    def fit(self, data):
+        svd = TruncatedSVD(n_components=min(self.n_components, min(data.shape) - 1), algorithm="randomized",
+                           random_state=data.seed)
+        self.user_factors = svd.fit_transform(data.train).astype(np.float32)
+        self.item_factors = svd.components_.T.astype(np.float32)
+
+    def recommend(self, data, user, n):
+        return _top_unrated(self.item_factors @ self.user_factors[user], self.rated(data, user), n)
+
+
+class Content(Strategy):
+    """Neighbours (TF-IDF + ANN index) of the user's best-rated items."""
+    name = "content"
+
+    def __init__(self, seeds=3):
+        self.seeds = seeds
+
+    def fit(self, data):
+        matrix = TfidfVectorizer().fit_transform(data.item_texts)
+        self.index = build_content_index(matrix)
+
+    def recommend(self, data, user, n):
+        lo, hi = data.train.indptr[user], data.train.indptr[user + 1]
+        items, ratings = data.train.indices[lo:hi], data.train.data[lo:hi]
+        rated = set(items.tolist())
+        scores = {}
+        for seed in items[np.argsort(-ratings, kind="stable")[:self.seeds]]:
+            for item, sim in self.index.query(int(seed), n + len(rated)):
+                if item not in rated:
+                    scores[item] = max(scores.get(item, 0.0), sim)
+        return np.asarray(sorted(scores, key=lambda i: -scores[i])[:n], dtype=np.int64)
+
+
+class ImplicitALSStrategy(Strategy):
+    name = "implicit_als"
+
+    def __init__(self, factors=32, iterations=8):
+        self.factors = factors
+        self.iterations = iterations
+
+    def fit(self, data):
+        model = ImplicitALS(factors=self.factors, iterations=self.iterations, seed=data.seed).fit(data.interactions)
+        self.user_factors, self.item_factors = model.user_factors, model.item_factors
+
+    def recommend(self, data, user, n):
+        return _top_unrated(self.item_factors @ self.user_factors[user], self.rated(data, user), n)
+
+
+STRATEGIES = {cls.name: cls for cls in (Popularity, ItemCF, UserCF, SVD, Content, ImplicitALSStrategy)}
+
+
+# ------------------------
+# Runner
+# ------------------------
+def _max_rss_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def run_strategy(strategy, data, k=10, max_queries=1000, seed=0):
+    """Fit one strategy and evaluate it; returns a result dict."""
+    result = {"strategy": strategy.name, "scale": data.scale}
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    try:
+        strategy.fit(data)
+    except MemoryError as e:
+        tracemalloc.stop()
+        result["skipped"] = str(e)
+        return result
+    result["train_seconds"] = round(time.perf_counter() - started, 3)
+    result["train_peak_traced_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+    tracemalloc.stop()
+
+    users = np.array(sorted(data.test))
+    if len(users) > max_queries:
+        users = np.random.default_rng(seed).choice(users, size=max_queries, replace=False)
+
+    latencies, hits = [], 0
+    run_started = time.perf_counter()
+    for user in users:
+        t0 = time.perf_counter()
+        recs = strategy.recommend(data, int(user), k)
+        latencies.append(time.perf_counter() - t0)
+        hits += int(data.test[int(user)] in set(np.asarray(recs).tolist()))
+    elapsed = time.perf_counter() - run_started
+
+    latencies = np.asarray(latencies) * 1000
+    n = len(users)
+    result.update({
+        "queries": n,
+        f"precision@{k}": round(hits / (n * k), 4) if n else None,
+        f"recall@{k}": round(hits / n, 4) if n else None,     # one held-out item per user
+        "hit_rate": round(hits / n, 4) if n else None,
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3) if n else None,
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3) if n else None,
+        "throughput_qps": round(n / elapsed, 1) if elapsed else None,
+        "max_rss_mb": _max_rss_mb(),
+    })
+    return result
+
+
+def run_benchmark(scales=("1k",), strategies=None, k=10, max_queries=1000, seed=42):
+    """Run every strategy on every scale; returns a list of result dicts."""
+    results = []
+    for scale in scales:
+        started = time.perf_counter()
+        data = make_dataset(scale, seed=seed)
+        generate_seconds = round(time.perf_counter() - started, 3)
+        for name in strategies or STRATEGIES:
+            result = run_strategy(STRATEGIES[name](), data, k=k, max_queries=max_queries, seed=seed)
+            result["dataset"] = {
+                "users": data.shape[0], "items": data.shape[1],
+                "ratings": int(data.train.nnz), "generate_seconds": generate_seconds,
+            }
+            results.append(result)
+    return results
@@ -0,0 +1,243 @@
+# recommender/copurchase_index.py
+"""
+Item-to-item co-purchase index over TaxInvoice baskets.
+
+Every tax invoice is one basket: the set of product ids on its items
+(TaxInvoiceItem only stores product_name, resolved through the product
+catalogue; lines that match no product are skipped). For each pair of
+products bought together the index keeps
+
+    confidence(a -> b) = baskets(a, b) / baskets(a)
+    lift(a -> b)       = confidence(a -> b) / (baskets(b) / n_baskets)
+
+and a precomputed neighbour list per product (best `top_k` by confidence,
+then lift). A cross-sell lookup is then one dict read per product in the
+customer's basket.
+
+The index is built offline by `build_copurchase_index` and published
+through model_registry. Invoice saves are debounced: after commit,
+recommender.signals records the invoice ids as PendingInvoiceBasket rows
+(`queue_invoice_baskets`) and only the first save in FOLD_DELAY_SECONDS
+schedules recommender.tasks.update_copurchase_baskets, so saving a
+10-line invoice costs one index rewrite, not ten. The task
+(`fold_pending_baskets`, also swept by celery beat for lost messages)
+hands every pending invoice to `update_invoice_baskets`: under a row lock
+on the SavedModel, it copies the latest published index, swaps those
+invoices' baskets in, refreshes the neighbour lists of the products they
+touched only and publishes the copy once. Request threads keep reading the
+old object untouched, and concurrent workers apply their batches one after
+another instead of overwriting each other. Lift of untouched lists drifts
+slightly as n_baskets grows until the next full build.
+"""
+import copy
+import itertools
+import os
+from collections import Counter, defaultdict
+
+from django.core.cache import cache
+from django.db import transaction
+
+from crmapp.models import TaxInvoiceItem
+from recommender import model_registry
+from recommender.models import PendingInvoiceBasket, SavedModel
+from recommender.product_catalog import product_catalog
+from recommender.utils import MODEL_DIR
+
+
+MODEL_NAME = "copurchase_index"
+MODEL_PATH = os.path.join(MODEL_DIR, "copurchase_index.joblib")
+DEFAULT_TOP_K = 20
+CHUNK_SIZE = 10000
+FOLD_DELAY_SECONDS = 30
+FOLD_SCHEDULED_CACHE_KEY = "recommender:copurchase_index:fold_scheduled"
+
+
+class CoPurchaseIndex:
+    def __init__(self, top_k=DEFAULT_TOP_K, min_pair_count=1):
+        self.top_k = top_k
+        self.min_pair_count = min_pair_count
+        self.n_baskets = 0
+        self.item_counts = Counter()                # product_id -> baskets containing it
+        self.pair_counts = defaultdict(Counter)     # product_id -> {other_id: baskets with both}
+        self.baskets = {}                           # invoice_id -> (customer_id, tuple of product ids)
+        self.customer_products = defaultdict(Counter)  # customer_id -> {product_id: invoices}
+        self.neighbours = {}                        # product_id -> [(other_id, confidence, lift), ...]
+
+    # ------------------------
+    # Updates
+    # ------------------------
+    def set_basket(self, invoice_id, customer_id, product_ids):
+        """Insert or replace one invoice's basket; empty `product_ids` removes it."""
+        touched = set()
+        old = self.baskets.pop(invoice_id, None)
+        if old is not None:
+            touched.update(self._apply(old[0], old[1], -1))
+        basket = tuple(sorted(set(product_ids)))
+        if basket:
+            self.baskets[invoice_id] = (customer_id, basket)
+            touched.update(self._apply(customer_id, basket, +1))
+        self._refresh_neighbours(touched)
+
+    def _apply(self, customer_id, basket, sign):
+        self.n_baskets += sign
+        for pid in basket:
+            self.item_counts[pid] += sign
+            if self.item_counts[pid] <= 0:
+                del self.item_counts[pid]
+            if customer_id is not None:
+                products = self.customer_products[customer_id]
+                products[pid] += sign
+                if products[pid] <= 0:
+                    del products[pid]
+                if not products:
+                    del self.customer_products[customer_id]
+        for a, b in itertools.combinations(basket, 2):
+            for x, y in ((a, b), (b, a)):
+                self.pair_counts[x][y] += sign
+                if self.pair_counts[x][y] <= 0:
+                    del self.pair_counts[x][y]
+        return basket
+
+    def _refresh_neighbours(self, product_ids):
+        # a pair change alters both ends' lists; the partners' lists also depend on item_counts
+        affected = set(product_ids)
+        for pid in product_ids:
+            affected.update(self.pair_counts.get(pid, ()))
+        for pid in affected:
+            self.neighbours[pid] = self._rank_neighbours(pid)
+            if not self.neighbours[pid]:
+                del self.neighbours[pid]
+
+    def _rank_neighbours(self, pid):
+        base = self.item_counts.get(pid, 0)
+        if not base or not self.n_baskets:
+            return []
+        scored = []
+        for other, together in self.pair_counts.get(pid, {}).items():
+            if together < self.min_pair_count:
+                continue
+            confidence = together / base
+            lift = confidence / (self.item_counts[other] / self.n_baskets)
+            scored.append((other, round(confidence, 4), round(lift, 4)))
+        scored.sort(key=lambda s: (-s[1], -s[2], s[0]))
+        return scored[:self.top_k]
+
+    # ------------------------
+    # Lookups
+    # ------------------------
+    def recommend(self, basket, top_n=5, exclude=()):
+        """
+        Products most often bought with `basket`: [(product_id, confidence, lift), ...].
+        Confidence is summed over basket items, lift is the best seen.
+        """
+        basket = set(basket)
+        skip = basket | set(exclude)
+        confidence, lift = Counter(), {}
+        for pid in basket:
+            for other, conf, lft in self.neighbours.get(pid, ()):
+                if other in skip:
+                    continue
+                confidence[other] += conf
+                lift[other] = max(lift.get(other, 0.0), lft)
+        ranked = sorted(confidence, key=lambda o: (-confidence[o], -lift[o], o))[:top_n]
+        return [(pid, round(confidence[pid], 4), lift[pid]) for pid in ranked]
+
+    def recommend_for_customer(self, customer_id, top_n=5, exclude=()):
+        return self.recommend(self.customer_products.get(customer_id, {}), top_n, exclude)
+
+    def popular(self, top_n=5, exclude=()):
+        skip = set(exclude)
+        return [pid for pid, _ in self.item_counts.most_common() if pid not in skip][:top_n]
+
+
+# ------------------------
+# Build / load
+# ------------------------
+def _invoice_baskets(invoice_ids=None):
+    """Yield (invoice_id, customer_id, product_ids) for invoices, streamed in id order."""
+    rows = TaxInvoiceItem.objects.values_list("tax_invoice_id", "tax_invoice__customer_id", "product_name")
+    if invoice_ids is not None:
+        rows = rows.filter(tax_invoice_id__in=invoice_ids)
+    rows = rows.order_by("tax_invoice_id").iterator(chunk_size=CHUNK_SIZE)
+    for invoice_id, lines in itertools.groupby(rows, key=lambda r: r[0]):
+        lines = list(lines)
+        pids = {product_catalog.product_id_for_name(name) for _, _, name in lines}
+        pids.discard(None)
+        yield invoice_id, lines[0][1], pids
+
+
+def build_copurchase_index(save=True, top_k=DEFAULT_TOP_K, min_pair_count=1):
+    """Build the index from every tax invoice and publish it."""
+    index = CoPurchaseIndex(top_k=top_k, min_pair_count=min_pair_count)
+    touched = set()
+    for invoice_id, customer_id, pids in _invoice_baskets():
+        if not pids:
+            continue
+        basket = tuple(sorted(pids))
+        index.baskets[invoice_id] = (customer_id, basket)
+        touched.update(index._apply(customer_id, basket, +1))
+    index._refresh_neighbours(touched)
+
+    if save:
+        model_registry.publish_model(MODEL_NAME, index, MODEL_PATH)
+    return index
+
+
+def load_copurchase_index():
+    """Current index (cached per process by model_registry), or None if never built."""
+    try:
+        return model_registry.get_model(MODEL_NAME)
+    except (SavedModel.DoesNotExist, OSError):
+        return None
+
+
+def update_invoice_baskets(invoice_ids):
+    """Re-read the given invoices and publish a copy of the index with their baskets folded in."""
+    invoice_ids = set(invoice_ids)
+    with transaction.atomic():
+        # serializes updates across processes; publish_model writes this same row
+        locked = list(SavedModel.objects.select_for_update().filter(name=MODEL_NAME).values_list("pk", flat=True))
+        if not locked:
+            return None
+        index = load_copurchase_index()
+        if index is None:
+            return None
+        index = copy.deepcopy(index)    # readers keep iterating the published object
+
+        found = {invoice_id: (customer_id, pids) for invoice_id, customer_id, pids in _invoice_baskets(invoice_ids)}
+        for invoice_id in invoice_ids:
+            # invoices with no items left (or deleted) drop out of the index
+            customer_id, pids = found.get(invoice_id, (None, ()))
+            index.set_basket(invoice_id, customer_id, pids)
+
+        model_registry.publish_model(MODEL_NAME, index, MODEL_PATH)
+    return index
+
+
+# ------------------------
+# Debounced updates
+# ------------------------
+def queue_invoice_baskets(invoice_ids):
+    """
+    Record invoices for the next fold. True if no fold is scheduled yet, i.e.
+    the caller should schedule update_copurchase_baskets in FOLD_DELAY_SECONDS.
+    """
+    PendingInvoiceBasket.objects.bulk_create(
+        [PendingInvoiceBasket(invoice_id=invoice_id) for invoice_id in invoice_ids]
+    )
+    # expires on its own should the scheduled task be lost; beat sweeps the rows
+    return cache.add(FOLD_SCHEDULED_CACHE_KEY, True, FOLD_DELAY_SECONDS * 10)
+
+
+def fold_pending_baskets():
+    """Fold every pending invoice into the index with one publish; returns the number of invoices."""
+    cache.delete(FOLD_SCHEDULED_CACHE_KEY)     # saves from here on schedule the next fold
+    pending = list(PendingInvoiceBasket.objects.values_list("pk", "invoice_id"))
+    if not pending:
+        return 0
+    invoice_ids = {invoice_id for _, invoice_id in pending}
+    # without an index the next full build reads these invoices anyway
+    update_invoice_baskets(invoice_ids)
+    # only the rows read above: invoices saved meanwhile wait for the next fold
+    PendingInvoiceBasket.objects.filter(pk__in=[pk for pk, _ in pending]).delete()
+    return len(invoice_ids)
@@ -0,0 +1,239 @@
+# recommender/dashboard_query.py
+"""
+Keyset-paginated query behind recommender.views.recommendation_dashboard.
+
+Rows are fetched one page at a time with `ORDER BY <sort>, pr.id LIMIT n`
+and a WHERE clause that starts after (or before) the cursor of the last
+row shown, so the cost of a page does not grow with its position. The
+(recommendation_type, confidence_score, id) and (confidence_score, id)
+indexes on pest_recommendations make the default type-filter / confidence
+sort an index range scan; name sorts still need a sort over the filtered
+rows but never leave the database.
+
+Filters only touch pest_recommendations columns:
+
+- the type filter compares the canonical type (PestRecommendation.save
+  stores it normalised) for equality instead of LIKE '%x%';
+- search resolves matching customer / product ids first — through the
+  ngram FULLTEXT indexes on MySQL (migration 0007), LIKE elsewhere or for
+  1-character terms — and then filters on the indexed id columns.
+
+Counting is exact up to COUNT_CAP rows and reported as "COUNT_CAP+" above,
+cached for COUNT_CACHE_SECONDS per filter.
+
+NULL ordering follows MySQL (NULLs first ascending, last descending).
+"""
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db import DatabaseError, connection
+
+from recommender.models import PestRecommendation
+
+
+PAGE_SIZE = 10
+COUNT_CAP = 10000
+COUNT_CACHE_SECONDS = 60
+SEARCH_MATCH_LIMIT = 1000
+NGRAM_TOKEN_SIZE = 2
+
+SORT_COLUMNS = {
+    "customer_name": "c.fullname",
+    "base_product": "bp.product_name",
+    "recommended_product": "rp.product_name",
+    "recommendation_type": "pr.recommendation_type",
+    "confidence_score": "pr.confidence_score",
+}
+
+SELECT_SQL = """
+    SELECT
+        pr.id,
+        {sort_expr} AS sort_value,
+        c.fullname AS customer_name,
+        c.primarycontact AS phone_number,
+        bp.product_name AS base_product,
+        bp.category AS base_product_category,
+        rp.product_name AS recommended_product,
+        rp.category AS recommended_product_category,
+        pr.recommendation_type,
+        pr.confidence_score
+    FROM pest_recommendations pr
+    LEFT JOIN crmapp_customer_details c ON pr.customer_id = c.id
+    LEFT JOIN crmapp_product bp ON pr.base_product_id = bp.product_id
+    LEFT JOIN crmapp_product rp ON pr.recommended_product_id = rp.product_id
+"""
+
+
+# ------------------------
+# Cursors
+# ------------------------
+def encode_cursor(sort_value, row_id):
+    value = None if sort_value is None else str(sort_value)
+    raw = json.dumps([value, row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """(sort_value, id) from a cursor token, or None if it is malformed."""
+    if not token:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        value, row_id = json.loads(raw)
+        return value, int(row_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def _after(expr, cursor, descending):
+    """WHERE fragment for rows strictly after `cursor` in (expr, pr.id) order."""
+    value, row_id = cursor
+    if descending:
+        if value is None:
+            return f"({expr} IS NULL AND pr.id < %s)", [row_id]
+        return f"({expr} < %s OR ({expr} = %s AND pr.id < %s) OR {expr} IS NULL)", [value, value, row_id]
+    if value is None:
+        return f"(({expr} IS NULL AND pr.id > %s) OR {expr} IS NOT NULL)", [row_id]
+    return f"({expr} > %s OR ({expr} = %s AND pr.id > %s))", [value, value, row_id]
+
+
+# ------------------------
+# Filters
+# ------------------------
+def _matching_ids(table, id_column, name_column, search):
+    """Ids of rows in `table` whose name matches `search` (at most SEARCH_MATCH_LIMIT)."""
+    with connection.cursor() as cursor:
+        if connection.vendor == "mysql" and len(search) >= NGRAM_TOKEN_SIZE:
+            phrase = '"%s"' % search.replace('"', " ")
+            try:
+                cursor.execute(
+                    f"SELECT {id_column} FROM {table} "
+                    f"WHERE MATCH({name_column}) AGAINST (%s IN BOOLEAN MODE) LIMIT %s",
+                    [phrase, SEARCH_MATCH_LIMIT],
+                )
+                return [r[0] for r in cursor.fetchall()]
+            except DatabaseError:
+                pass    # FULLTEXT index not created yet
+        cursor.execute(
+            f"SELECT {id_column} FROM {table} WHERE {name_column} LIKE %s LIMIT %s",
+            [f"%{search}%", SEARCH_MATCH_LIMIT],
+        )
+        return [r[0] for r in cursor.fetchall()]
+
+
+def _in_clause(column, ids):
+    return f"{column} IN ({', '.join(['%s'] * len(ids))})", list(ids)
+
+
+def build_filters(filter_type="", search=""):
+    """(where fragments, params) over pest_recommendations columns only."""
+    where, params = [], []
+
+    if filter_type:
+        canonical = PestRecommendation.normalize_recommendation_type(filter_type)
+        where.append("pr.recommendation_type = %s")
+        params.append(canonical or filter_type.lower())
+
+    if search:
+        customer_ids = _matching_ids("crmapp_customer_details", "id", "fullname", search)
+        product_ids = _matching_ids("crmapp_product", "product_id", "product_name", search)
+        alternatives = []
+        if customer_ids:
+            sql, p = _in_clause("pr.customer_id", customer_ids)
+            alternatives.append(sql)
+            params.extend(p)
+        for column in ("pr.base_product_id", "pr.recommended_product_id"):
+            if product_ids:
+                sql, p = _in_clause(column, product_ids)
+                alternatives.append(sql)
+                params.extend(p)
+        where.append("(" + " OR ".join(alternatives) + ")" if alternatives else "1=0")
+
+    return where, params
+
+
+# ------------------------
+# Page + count
+# ------------------------
+def _row_dict(row):
+    return {
+        "customer_name": row[2],
+        "phone_number": str(row[3]) if row[3] else None,
+        "base_product": row[4],
+        "base_product_category": row[5],
+        "recommended_product": row[6],
+        "recommended_product_category": row[7],
+        "recommendation_type": row[8],
+        "confidence_score": float(row[9]) if row[9] is not None else None,
+    }
+
+
+def fetch_page(filter_type="", search="", sort="confidence_score", order="desc",
+               after=None, before=None, page_size=PAGE_SIZE, filters=None):
+    """
+    One page of dashboard rows. Returns a dict with `rows`, `has_next`,
+    `has_previous`, `next_cursor`, `prev_cursor`. `filters` takes a
+    precomputed build_filters() result.
+    """
+    expr = SORT_COLUMNS.get(sort, SORT_COLUMNS["confidence_score"])
+    descending = order == "desc"
+    where, params = filters or build_filters(filter_type, search)
+    where, params = list(where), list(params)
+
+    after_cursor, before_cursor = decode_cursor(after), decode_cursor(before)
+    backwards = before_cursor is not None and after_cursor is None
+    walk_descending = descending != backwards
+    cursor_value = before_cursor if backwards else after_cursor
+    if cursor_value is not None:
+        sql, p = _after(expr, cursor_value, walk_descending)
+        where.append(sql)
+        params.extend(p)
+
+    direction = "DESC" if walk_descending else "ASC"
+    sql = SELECT_SQL.format(sort_expr=expr)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += f" ORDER BY {expr} {direction}, pr.id {direction} LIMIT %s"
+    params.append(page_size + 1)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor.fetchall()
+
+    more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backwards:
+        rows.reverse()
+        has_previous, has_next = more, True
+    else:
+        has_previous, has_next = cursor_value is not None, more
+
+    return {
+        "rows": [_row_dict(r) for r in rows],
+        "has_next": has_next and bool(rows),
+        "has_previous": has_previous and bool(rows),
+        "next_cursor": encode_cursor(rows[-1][1], rows[-1][0]) if rows else None,
+        "prev_cursor": encode_cursor(rows[0][1], rows[0][0]) if rows else None,
+    }
+
+
+def count_rows(filter_type="", search="", filters=None):
+    """(count, capped) for the filter; exact up to COUNT_CAP, cached briefly."""
+    key = "recommender:dashboard_count:" + hashlib.md5(f"{filter_type}\0{search}".encode()).hexdigest()
+    cached = cache.get(key)
+    if cached is not None:
+        return tuple(cached)
+
+    where, params = filters or build_filters(filter_type, search)
+    sql = "SELECT 1 FROM pest_recommendations pr"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM ({sql} LIMIT %s) capped", params + [COUNT_CAP + 1])
+        count = cursor.fetchone()[0]
+
+    result = (min(count, COUNT_CAP), count > COUNT_CAP)
+    cache.set(key, result, COUNT_CACHE_SECONDS)
+    return result
@@ -2,25 +2,31 @@ import numpy as np
 import pandas as pd
 import pickle
 from recommender.models import Rating, Item, SavedModel, PestRecommendation
+from recommender import artifacts, model_registry
+from recommender.rating_store import get_user_item_snapshot
+from recommender.recommendation_writer import RecommendationWriter
+from recommender.recommender_engine import generate_recommendations_bulk
 from crmapp.models import customer_details, Product
 
-def generate_recommendations_for_user(customer_id, top_n=5, return_scores=False):
-    ratings_qs = Rating.objects.all().values("customer_id", "product_id", "rating")
-    df = pd.DataFrame(list(ratings_qs))
+def generate_recommendations_for_user(customer_id, top_n=5, return_scores=False, writer=None):
+    """
+    Score one customer and record the results as PestRecommendation rows.
+    Pass a shared RecommendationWriter to batch the writes across customers;
+    without one, this call's rows are upserted in a single statement.
+    """
+    if writer is None:
+        with RecommendationWriter() as writer:
+            return generate_recommendations_for_user(customer_id, top_n, return_scores, writer)
+
+    snapshot = get_user_item_snapshot()
 
     # Fallback: no ratings
-    if df.empty:
+    if snapshot.empty:
         popular_items = Item.objects.all()[:top_n]
         rec_list = []
         for i in popular_items:
             if i.product:
-                PestRecommendation.objects.create(
-                    customer_id=customer_id,
-                    base_product_id=None,
-                    recommended_product_id=i.product.product_id,
-                    recommendation_type="collaborative",
-                    confidence_score=0
-                )
+                writer.add(customer_id, i.product.product_id, "collaborative", 0)
             if return_scores:
                 rec_list.append({
                     "product_id": i.product.product_id if i.product else None,
@@ -30,21 +36,13 @@ def generate_recommendations_for_user(customer_id, top_n=5, return_scores=False)
                 })
         return rec_list if return_scores else popular_items
 
-    pivot_table = df.pivot_table(index="customer_id", columns="product_id", values="rating").fillna(0)
-
-    if customer_id not in pivot_table.index:
-        top_products = df.groupby("product_id")["rating"].mean().sort_values(ascending=False).head(top_n).index.tolist()
+    if not snapshot.has_customer(customer_id):
+        top_products = snapshot.top_rated_products(top_n)
         items = Item.objects.filter(product_id__in=top_products)
         rec_list = []
         for i in items:
             if i.product:
-                PestRecommendation.objects.create(
-                    customer_id=customer_id,
-                    base_product_id=None,
-                    recommended_product_id=i.product.product_id,
-                    recommendation_type="collaborative",
-                    confidence_score=0
-                )
+                writer.add(customer_id, i.product.product_id, "collaborative", 0)
             if return_scores:
                 rec_list.append({
                     "product_id": i.product.product_id if i.product else None,
@@ -56,25 +54,17 @@ def generate_recommendations_for_user(customer_id, top_n=5, return_scores=False)
 
     # Load similarity matrix
     try:
-        saved_model = SavedModel.objects.filter(name="recommender_similarity").latest("created_at")
-        with open(saved_model.file_path, "rb") as f:
-            similarity_matrix = pickle.load(f)
+        similarity_matrix = model_registry.get_model("recommender_similarity")
     except Exception:
         similarity_matrix = None
 
     if similarity_matrix is None:
-        top_products = df.groupby("product_id")["rating"].mean().sort_values(ascending=False).head(top_n).index.tolist()
+        top_products = snapshot.top_rated_products(top_n)
         items = Item.objects.filter(product_id__in=top_products)
         rec_list = []
         for i in items:
             if i.product:
-                PestRecommendation.objects.create(
-                    customer_id=customer_id,
-                    base_product_id=None,
-                    recommended_product_id=i.product.product_id,
-                    recommendation_type="collaborative",
-                    confidence_score=0
-                )
+                writer.add(customer_id, i.product.product_id, "collaborative", 0)
             if return_scores:
                 rec_list.append({
                     "product_id": i.product.product_id if i.product else None,
@@ -84,12 +74,18 @@ def generate_recommendations_for_user(customer_id, top_n=5, return_scores=False)
                 })
         return rec_list if return_scores else items
 
-    # Predict scores
-    user_vector = pivot_table.loc[customer_id].values.reshape(1, -1)
-    scores = np.dot(similarity_matrix, user_vector.T).flatten()
+    # Predict scores (dense DataFrame or sparse top-K model, rows/cols labelled by product id)
+    if isinstance(similarity_matrix, (pd.DataFrame, artifacts.LabelledCSR)):
+        all_items = np.asarray(similarity_matrix.index, dtype=np.int64)
+        sim_mat = similarity_matrix.matrix if isinstance(similarity_matrix, artifacts.LabelledCSR) else similarity_matrix.values
+        user_vector = snapshot.user_vector(customer_id, all_items).reshape(1, -1)
+    else:
+        all_items = snapshot.product_ids
+        sim_mat = similarity_matrix
+        user_vector = snapshot.user_vector(customer_id).reshape(1, -1)
+    scores = np.asarray(sim_mat @ user_vector.T).flatten()
 
-    rated_items = pivot_table.loc[customer_id][pivot_table.loc[customer_id] > 0].index
-    all_items = pivot_table.columns
+    rated_items = snapshot.rated_products(customer_id)
     unrated_items = [i for i in all_items if i not in rated_items]
 
     predictions = pd.DataFrame({"product_id": all_items, "predicted_score": scores})
@@ -102,13 +98,7 @@ def generate_recommendations_for_user(customer_id, top_n=5, return_scores=False)
         score = 0
         if i.product:
             score = predictions.loc[predictions["product_id"] == i.product.product_id, "predicted_score"].values[0]
-            PestRecommendation.objects.create(
-                customer_id=customer_id,
-                base_product_id=None,
-                recommended_product_id=i.product.product_id,
-                recommendation_type="collaborative",
-                confidence_score=score
-            )
+            writer.add(customer_id, i.product.product_id, "collaborative", score)
         if return_scores:
             rec_list.append({
                 "product_id": i.product.product_id if i.product else None,
@@ -118,3 +108,22 @@ def generate_recommendations_for_user(customer_id, top_n=5, return_scores=False)
             })
 
     return rec_list if return_scores else items_qs
+
+
+def generate_recommendations_for_customers(customer_ids=None, top_n=5, batch_size=1000):
+    """
+    Score many customers (default: every customer) with the bulk item-item
+    scorer and upsert their PestRecommendation rows through one writer.
+    Returns the number of rows written.
+    """
+    if customer_ids is None:
+        customer_ids = customer_details.objects.values_list("id", flat=True)
+    customer_ids = list(customer_ids)
+
+    with RecommendationWriter() as writer:
+        for start in range(0, len(customer_ids), batch_size):
+            batch = customer_ids[start:start + batch_size]
+            for cid, ranked in generate_recommendations_bulk(batch, top_n=top_n).items():
+                for pid, score in ranked:
+                    writer.add(cid, pid, "collaborative", score or 0)
+    return writer.written
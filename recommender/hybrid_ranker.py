@@ -0,0 +1,332 @@
+# recommender/hybrid_ranker.py
+"""
+Two-stage hybrid ranker.
+
+Stage 1 — candidate generation. Every source in SOURCE_BUDGETS runs in
+parallel on a shared thread pool and returns at most its budget of
+(product_id, raw score) pairs:
+
+    item_cf     item-item similarity over the customer's ratings
+    content     TF-IDF neighbours of the customer's best-rated products
+    copurchase  products bought together with the customer's invoices
+    rules       PestRecommendation rows for the customer / their products
+
+A source that has not answered within SOURCE_TIMEOUT seconds is dropped for
+this request (its result is discarded when it arrives). Sources do bounded
+work — item_cf is one similarity × rating-vector product for the customer,
+content looks up at most CONTENT_SEEDS × CONTENT_NEIGHBOURS neighbours
+through the process-wide product_catalog — and a source with
+MAX_IN_FLIGHT runs still going (slow database, timed-out requests) is
+skipped rather than queued, so stragglers cannot fill the shared pool.
+Worker threads keep their database connections between requests and only
+drop them after a database error.
+
+Stage 2 — scoring. Candidates are stacked into a (candidates × sources)
+matrix of per-source max-normalised scores; the final score is that matrix
+times SOURCE_WEIGHTS plus AGREEMENT_BONUS per extra source that proposed the
+item. Products the customer already rated or bought are excluded.
+
+A DEBUG_SAMPLE_RATE share of requests (or any request with debug=True)
+writes a HybridRankingDebug row with per-stage timings, candidate counts and
+the per-source contributions of the returned items.
+"""
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+from django.conf import settings
+from django.db import DatabaseError, connections
+from django.db.models import Q
+
+from recommender import artifacts
+from recommender.copurchase_index import load_copurchase_index
+from recommender.models import HybridRankingDebug, PestRecommendation
+from recommender.product_catalog import product_catalog
+from recommender.rating_store import get_user_item_snapshot
+from recommender.recommender_engine import load_trained_model
+from recommender.utils import load_content_model
+
+
+SOURCE_BUDGETS = {
+    "item_cf": 50,
+    "content": 30,
+    "copurchase": 30,
+    "rules": 20,
+}
+SOURCE_WEIGHTS = {
+    "item_cf": 0.4,
+    "content": 0.2,
+    "copurchase": 0.3,
+    "rules": 0.1,
+}
+AGREEMENT_BONUS = 0.05
+CONTENT_SEEDS = 3
+CONTENT_NEIGHBOURS = 100        # per seed item
+MAX_IN_FLIGHT = 2               # per source; 4 sources x 2 = the pool's 8 workers
+
+SOURCE_TIMEOUT = getattr(settings, "HYBRID_SOURCE_TIMEOUT", 0.5)
+DEBUG_SAMPLE_RATE = getattr(settings, "HYBRID_DEBUG_SAMPLE_RATE", 0.05)
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hybrid")
+_in_flight = {name: 0 for name in SOURCE_BUDGETS}
+_in_flight_lock = threading.Lock()
+_similarity = None      # (model, matrix, product ids, {product_id: position}) of the loaded model
+
+
+class _Context:
+    """What every source needs to know about the customer, loaded once per request."""
+
+    def __init__(self, customer_id):
+        self.customer_id = customer_id
+        self.snapshot = get_user_item_snapshot()
+        pids, ratings = self.snapshot.user_row(customer_id)
+        order = np.argsort(-ratings, kind="stable")
+        self.rated = [int(p) for p in pids[order]]           # best rated first
+        self.ratings = ratings[order]
+        self.copurchase = load_copurchase_index()
+        self.purchased = set(self.copurchase.customer_products.get(customer_id, ())) if self.copurchase else set()
+        self.known = set(self.rated) | self.purchased
+
+
+# ------------------------
+# Stage 1: candidate sources
+# ------------------------
+def _item_similarity():
+    """(matrix, product ids, {product_id: position}) of the trained item-item model, or None."""
+    global _similarity
+    model = load_trained_model()
+    if model is None:
+        return None
+    cached = _similarity
+    if cached is None or cached[0] is not model:
+        ids = np.asarray(list(map(int, model.index)), dtype=np.int64)
+        matrix = model.matrix if isinstance(model, artifacts.LabelledCSR) else model.values
+        cached = _similarity = (model, matrix, ids, {pid: i for i, pid in enumerate(ids.tolist())})
+    return cached[1:]
+
+
+def _item_cf(ctx, budget):
+    # no trained model: the per-request fallback would be a full cosine
+    # similarity of the catalogue, so leave the slot to the other sources
+    similarity = _item_similarity() if ctx.rated else None
+    if similarity is None:
+        return []
+
+    matrix, ids, positions = similarity
+    rated = [(positions[pid], r) for pid, r in zip(ctx.rated, ctx.ratings) if pid in positions]
+    if not rated:
+        return []
+    cols, values = zip(*rated)
+    user_vector = np.zeros(len(ids))
+    user_vector[list(cols)] = values
+
+    # score_j = sum_i sim[j, i] * rating_i, as in generate_recommendations_bulk
+    scores = np.asarray(matrix @ user_vector, dtype=np.float64).ravel()
+    scores[list(cols)] = -np.inf
+    k = min(budget + len(ctx.known), len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind="stable")]
+    return [(int(ids[i]), float(scores[i])) for i in top if scores[i] > 0]
+
+
+def _content(ctx, budget):
+    data = load_content_model()
+    seeds = ctx.rated[:CONTENT_SEEDS]
+    if not data or not seeds or data.get("index") is None:
+        return []
+
+    ids, positions, index = data["ids"], data["positions"], data["index"]
+    scores = {}
+    per_seed = min(budget + len(ctx.known), CONTENT_NEIGHBOURS)
+    for item_id in product_catalog.item_ids(seeds):
+        idx = positions.get(item_id)
+        if idx is None:
+            continue
+        for i, sim in index.query(idx, per_seed):
+            pid = product_catalog.product_id_for_item(ids[i])
+            if pid is not None and pid not in ctx.known:
+                scores[pid] = max(scores.get(pid, 0.0), sim)
+    return sorted(scores.items(), key=lambda kv: -kv[1])[:budget]
+
+
+def _copurchase(ctx, budget):
+    if ctx.copurchase is None or not ctx.purchased:
+        return []
+    return [(pid, conf) for pid, conf, _ in ctx.copurchase.recommend(ctx.purchased, budget, exclude=ctx.known)]
+
+
+def _rules(ctx, budget):
+    basket = ctx.purchased | set(ctx.rated)
+    rows = PestRecommendation.objects.filter(
+        Q(customer_id=ctx.customer_id) | Q(base_product_id__in=basket),
+        recommended_product__isnull=False,
+    )
+    scores = {}
+    for pid, confidence in rows.order_by("-confidence_score").values_list(
+        "recommended_product_id", "confidence_score"
+    )[:budget * 4]:
+        if pid in ctx.known:
+            continue
+        scores[pid] = max(scores.get(pid, 0.0), float(confidence or 1.0))
+        if len(scores) >= budget:
+            break
+    return list(scores.items())
+
+
+SOURCES = {
+    "item_cf": _item_cf,
+    "content": _content,
+    "copurchase": _copurchase,
+    "rules": _rules,
+}
+
+
+def _run_source(name, ctx, budget):
+    started = time.perf_counter()
+    try:
+        return SOURCES[name](ctx, budget), None, time.perf_counter() - started
+    except Exception as e:
+        if isinstance(e, DatabaseError):
+            # this worker's connections; reopened by its next query
+            connections.close_all()
+        return [], str(e), time.perf_counter() - started
+    finally:
+        with _in_flight_lock:
+            _in_flight[name] -= 1
+
+
+def _submit(name, ctx, budget):
+    """Queue source `name`, or return None while MAX_IN_FLIGHT runs of it are unfinished."""
+    with _in_flight_lock:
+        if _in_flight.get(name, 0) >= MAX_IN_FLIGHT:
+            return None
+        _in_flight[name] = _in_flight.get(name, 0) + 1
+    return _executor.submit(_run_source, name, ctx, budget)
+
+
+def generate_candidates(ctx, budgets=None, timeout=SOURCE_TIMEOUT):
+    """{source: [(product_id, raw score), ...]} plus per-source trace entries."""
+    budgets = budgets or SOURCE_BUDGETS
+    candidates, trace = {}, {}
+    futures = {}
+    for name, budget in budgets.items():
+        if budget <= 0:
+            continue
+        future = _submit(name, ctx, budget)
+        if future is None:
+            trace[name] = {"status": "busy", "count": 0}
+        else:
+            futures[future] = name
+    done, _ = wait(futures, timeout=timeout)
+
+    for future, name in futures.items():
+        if future not in done:
+            if future.cancel():
+                with _in_flight_lock:
+                    _in_flight[name] -= 1
+            trace[name] = {"status": "timeout", "count": 0}
+            continue
+        pairs, error, elapsed = future.result()
+        pairs = [
+            (int(pid), float(score)) for pid, score in pairs
+            if score is not None and int(pid) not in ctx.known
+        ][:budgets[name]]
+        candidates[name] = pairs
+        trace[name] = {
+            "status": "error" if error else "ok",
+            "count": len(pairs),
+            "ms": round(elapsed * 1000, 2),
+        }
+        if error:
+            trace[name]["error"] = error
+    return candidates, trace
+
+
+# ------------------------
+# Stage 2: scoring
+# ------------------------
+def score_candidates(candidates, weights=None):
+    """
+    Fuse per-source scores. Returns (product_ids, final scores, per-source
+    normalised score matrix, source names), best first.
+    """
+    weights = weights or SOURCE_WEIGHTS
+    names = [name for name in candidates if candidates[name]]
+    product_ids = np.unique(np.fromiter(
+        (pid for name in names for pid, _ in candidates[name]), dtype=np.int64
+    ))
+    if len(product_ids) == 0:
+        return product_ids, np.empty(0), np.empty((0, 0)), names
+
+    matrix = np.zeros((len(product_ids), len(names)))
+    for j, name in enumerate(names):
+        pids = np.fromiter((pid for pid, _ in candidates[name]), dtype=np.int64)
+        raw = np.fromiter((score for _, score in candidates[name]), dtype=np.float64)
+        raw = np.clip(raw, 0.0, None)
+        peak = raw.max()
+        matrix[np.searchsorted(product_ids, pids), j] = raw / peak if peak > 0 else 1.0
+
+    w = np.array([weights.get(name, 0.0) for name in names])
+    proposed = (matrix > 0).sum(axis=1)
+    final = matrix @ w + AGREEMENT_BONUS * np.maximum(proposed - 1, 0)
+
+    order = np.lexsort((product_ids, -final))
+    return product_ids[order], final[order], matrix[order], names
+
+
+# ------------------------
+# Public entry point
+# ------------------------
+def rank_for_customer(customer_id, top_n=10, debug=None):
+    """
+    [{"product_id", "score", "sources"}, ...] best first for `customer_id`.
+    debug=None samples the debug trace at DEBUG_SAMPLE_RATE; True / False force it.
+    """
+    started = time.perf_counter()
+    customer_id = int(customer_id)
+    ctx = _Context(customer_id)
+    context_ms = (time.perf_counter() - started) * 1000
+
+    candidates, trace = generate_candidates(ctx)
+    candidates_ms = (time.perf_counter() - started) * 1000 - context_ms
+
+    scoring_started = time.perf_counter()
+    product_ids, final, matrix, names = score_candidates(candidates)
+    scoring_ms = (time.perf_counter() - scoring_started) * 1000
+
+    results = [
+        {
+            "product_id": int(pid),
+            "score": round(float(score), 4),
+            "sources": [names[j] for j in np.flatnonzero(row)],
+        }
+        for pid, score, row in zip(product_ids[:top_n], final[:top_n], matrix[:top_n])
+    ]
+
+    if debug is None:
+        debug = random.random() < DEBUG_SAMPLE_RATE
+    if debug:
+        HybridRankingDebug.objects.create(
+            customer_id=customer_id,
+            num_candidates=int(len(product_ids)),
+            debug_log={
+                "budgets": SOURCE_BUDGETS,
+                "weights": SOURCE_WEIGHTS,
+                "sources": trace,
+                "timings_ms": {
+                    "context": round(context_ms, 2),
+                    "candidates": round(candidates_ms, 2),
+                    "scoring": round(scoring_ms, 2),
+                    "total": round((time.perf_counter() - started) * 1000, 2),
+                },
+                "top": [
+                    dict(r, contributions={
+                        names[j]: round(float(v), 4) for j, v in enumerate(row) if v > 0
+                    })
+                    for r, row in zip(results, matrix[:top_n])
+                ],
+            },
+        )
+    return results
@@ -0,0 +1,57 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recommender.benchmark import SCALES, STRATEGIES, run_benchmark
+
+
+def _cell(value, width):
+    """Right-aligned table cell; '-' for metrics a run could not measure (None)."""
+    return f"{'-' if value is None else value:>{width}}"
+
+
+class Command(BaseCommand):
+    help = "Benchmark the recommender strategies on synthetic data (quality, latency, throughput, memory)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--scale", action="append", choices=sorted(SCALES),
+                            help="Dataset scale; repeat for several (default: 1k and 100k)")
+        parser.add_argument("--strategy", action="append", choices=sorted(STRATEGIES),
+                            help="Strategy to run; repeat for several (default: all)")
+        parser.add_argument("--top-k", type=int, default=10)
+        parser.add_argument("--queries", type=int, default=1000, help="Max users queried per strategy")
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--output", help="Write the results as JSON to this path")
+
+    def handle(self, *args, **options):
+        if options["top_k"] < 1:
+            raise CommandError("--top-k must be at least 1")
+
+        k = options["top_k"]
+        results = run_benchmark(
+            scales=options["scale"] or ["1k", "100k"],
+            strategies=options["strategy"],
+            k=k,
+            max_queries=options["queries"],
+            seed=options["seed"],
+        )
+
+        # before the table, so a formatting problem never loses a finished run
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                json.dump(results, f, indent=2)
+
+        header = f"{'scale':>6} {'strategy':<14} {'P@k':>7} {'R@k':>7} {'train s':>9} {'p50 ms':>8} {'p99 ms':>8} {'qps':>9} {'rss MB':>8}"
+        self.stdout.write(header)
+        for r in results:
+            if "skipped" in r:
+                self.stdout.write(self.style.WARNING(f"{r['scale']:>6} {r['strategy']:<14} skipped: {r['skipped']}"))
+                continue
+            self.stdout.write(
+                f"{r['scale']:>6} {r['strategy']:<14} {_cell(r.get(f'precision@{k}'), 7)} {_cell(r.get(f'recall@{k}'), 7)} "
+                f"{_cell(r.get('train_seconds'), 9)} {_cell(r.get('p50_ms'), 8)} {_cell(r.get('p99_ms'), 8)} "
+                f"{_cell(r.get('throughput_qps'), 9)} {_cell(r.get('max_rss_mb'), 8)}"
+            )
+
+        if options["output"]:
+            self.stdout.write(self.style.SUCCESS(f"✅ Results written to {options['output']}"))
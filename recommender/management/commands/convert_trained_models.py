@@ -0,0 +1,40 @@
+import os
+
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from recommender import artifacts, model_registry
+from recommender.models import SavedModel
+from recommender.recommender_engine import (
+    TRAINED_MODELS_DIR,
+    USER_ITEM_MATRIX,
+    ITEM_SIM_MODEL,
+    USER_TOP5,
+    USER_SIMILARITY_MATRIX,
+)
+
+
+class Command(BaseCommand):
+    help = "Convert legacy CSV / pickle matrices in trained_models/ to memory-mapped artifacts"
+
+    def handle(self, *args, **options):
+        for name in (USER_ITEM_MATRIX, ITEM_SIM_MODEL, USER_TOP5, USER_SIMILARITY_MATRIX):
+            csv_path = os.path.join(TRAINED_MODELS_DIR, f"{name}.csv")
+            if not os.path.exists(csv_path):
+                self.stdout.write(self.style.WARNING(f"⚠️ {csv_path} not found, skipped."))
+                continue
+            version = artifacts.save_frame(TRAINED_MODELS_DIR, name, pd.read_csv(csv_path, index_col=0))
+            self.stdout.write(self.style.SUCCESS(f"✅ {name} → v{version}"))
+
+        # SavedModel entries that still point at a pickled DataFrame
+        for saved in SavedModel.objects.all():
+            if os.path.isdir(saved.file_path) or not os.path.exists(saved.file_path):
+                continue
+            try:
+                obj = model_registry.get_model(saved.name)
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f"⚠️ {saved.name}: {e}"))
+                continue
+            if isinstance(obj, pd.DataFrame):
+                path = model_registry.publish_frame(saved.name, obj, TRAINED_MODELS_DIR)
+                self.stdout.write(self.style.SUCCESS(f"✅ {saved.name} → {path}"))
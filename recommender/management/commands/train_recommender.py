@@ -1,9 +1,9 @@
 from django.core.management.base import BaseCommand
-from recommender.models import Rating, SavedModel
+from recommender.models import Rating
+from recommender import model_registry
+from recommender.recommender_engine import TRAINED_MODELS_DIR
 import pandas as pd
 from sklearn.metrics.pairwise import cosine_similarity
-import pickle
-import os
 
 class Command(BaseCommand):
     help = "Train the recommender system using existing ratings"
@@ -22,18 +22,8 @@ class Command(BaseCommand):
         # Compute cosine similarity between items
         similarity_matrix = cosine_similarity(pivot_table.T)
 
-        # Save model to file
-        model_dir = "trained_models"
-        os.makedirs(model_dir, exist_ok=True)
-        model_path = os.path.join(model_dir, "recommender_similarity.pkl")
-
-        with open(model_path, "wb") as f:
-            pickle.dump(similarity_matrix, f)
-
-        # Update or create SavedModel record
-        SavedModel.objects.update_or_create(
-            name="recommender_similarity",
-            defaults={"file_path": model_path}
-        )
+        # Save as a memory-mapped artifact and point SavedModel at it
+        similarity_df = pd.DataFrame(similarity_matrix, index=pivot_table.columns, columns=pivot_table.columns)
+        model_registry.publish_frame("recommender_similarity", similarity_df, TRAINED_MODELS_DIR)
 
         self.stdout.write(self.style.SUCCESS("✅ Recommender model trained and saved successfully!"))
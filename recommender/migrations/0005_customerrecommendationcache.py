@@ -0,0 +1,29 @@
+# Generated by Django 5.2.3 on 2026-10-17 16:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crmapp', '0006_sentmessagelog'),
+        ('recommender', '0004_hybridrankingdebug'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerRecommendationCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('strategy', models.CharField(choices=[('personalized', 'Personalized (item-item CF)'), ('user_based', 'User-based CF'), ('collaborative', 'Similar customers'), ('crosssell', 'Cross-sell')], max_length=20)),
+                ('recommendations', models.JSONField(default=list)),
+                ('computed_at', models.DateTimeField(db_index=True)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendation_cache', to='crmapp.customer_details')),
+            ],
+            options={
+                'db_table': 'customer_recommendation_cache',
+                'unique_together': {('customer', 'strategy')},
+            },
+        ),
+    ]
@@ -0,0 +1,47 @@
+from django.db import migrations, models
+
+
+def backfill_dedup_key(apps, schema_editor):
+    """Key existing rows; of duplicate combinations keep only the newest row."""
+    PestRecommendation = apps.get_model('recommender', 'PestRecommendation')
+    seen = set()
+    duplicates = []
+    to_update = []
+    rows = (
+        PestRecommendation.objects
+        .order_by('-created_at', '-id')
+        .values_list('id', 'customer_id', 'base_product_id', 'recommended_product_id', 'recommendation_type')
+        .iterator(chunk_size=5000)
+    )
+    for pk, customer_id, base_id, recommended_id, rec_type in rows:
+        key = ":".join("-" if p is None else str(p) for p in (customer_id, base_id, recommended_id, rec_type))
+        if key in seen:
+            duplicates.append(pk)
+        else:
+            seen.add(key)
+            to_update.append(PestRecommendation(id=pk, dedup_key=key))
+
+    for start in range(0, len(duplicates), 5000):
+        PestRecommendation.objects.filter(id__in=duplicates[start:start + 5000]).delete()
+    PestRecommendation.objects.bulk_update(to_update, ['dedup_key'], batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommender', '0005_customerrecommendationcache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pestrecommendation',
+            name='dedup_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True),
+        ),
+        migrations.RunPython(backfill_dedup_key, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='pestrecommendation',
+            name='dedup_key',
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
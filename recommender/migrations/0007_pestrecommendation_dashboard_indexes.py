@@ -0,0 +1,42 @@
+from django.db import migrations, models
+
+
+FULLTEXT_INDEXES = [
+    ('crmapp_customer_details', 'fullname', 'customer_fullname_ft'),
+    ('crmapp_product', 'product_name', 'product_name_ft'),
+]
+
+
+def create_fulltext_indexes(apps, schema_editor):
+    """ngram FULLTEXT indexes for dashboard search (MySQL only; other backends use LIKE)."""
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    for table, column, name in FULLTEXT_INDEXES:
+        schema_editor.execute(f"CREATE FULLTEXT INDEX {name} ON {table} ({column}) WITH PARSER ngram")
+
+
+def drop_fulltext_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    for table, _, name in FULLTEXT_INDEXES:
+        schema_editor.execute(f"DROP INDEX {name} ON {table}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('crmapp', '0006_sentmessagelog'),
+        ('recommender', '0006_pestrecommendation_dedup_key'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pestrecommendation',
+            index=models.Index(fields=['recommendation_type', 'confidence_score', 'id'], name='pest_rec_type_conf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pestrecommendation',
+            index=models.Index(fields=['confidence_score', 'id'], name='pest_rec_conf_idx'),
+        ),
+        migrations.RunPython(create_fulltext_indexes, drop_fulltext_indexes),
+    ]
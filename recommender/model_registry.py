@@ -0,0 +1,199 @@
+# recommender/model_registry.py
+"""
+Process-wide registry for trained model artifacts referenced by SavedModel.
+
+Each artifact is read and unpickled once per process and kept in memory,
+keyed by (name, file mtime, checksum). When a trainer publishes a new
+version through `publish_model`, the file is replaced atomically on disk and
+the in-memory entry is swapped in one assignment, so readers always see
+either the old or the new model, never a half-written one. Other processes
+(gunicorn workers, celery) notice the new file on their next lookup via
+its mtime and reload it.
+
+Matrix models are published with `publish_frame` (DataFrames),
+`publish_csr` (sparse) or `publish_arrays` (factor sets) instead: the SavedModel path then points at a
+versioned, memory-mapped artifact directory managed by recommender.artifacts,
+which does its own versioning.
+"""
+import hashlib
+import io
+import os
+import pickle
+import threading
+import time
+
+import joblib
+
+from recommender import artifacts
+from recommender.models import SavedModel
+
+
+# How long a resolved SavedModel.file_path is trusted before the DB is asked again
+PATH_RECHECK_SECONDS = 30
+
+_lock = threading.Lock()
+_entries = {}   # name -> {"path", "mtime", "size", "checksum", "obj"}
+_paths = {}     # name -> (file_path or None, resolved_at)
+
+
+# ------------------------
+# (De)serialization
+# ------------------------
+def _is_joblib(path):
+    return str(path).endswith(".joblib")
+
+
+def _deserialize(path, raw):
+    if _is_joblib(path):
+        return joblib.load(io.BytesIO(raw))
+    return pickle.loads(raw)
+
+
+def _serialize(path, obj):
+    if _is_joblib(path):
+        buf = io.BytesIO()
+        joblib.dump(obj, buf)
+        return buf.getvalue()
+    return pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+# ------------------------
+# Lookup
+# ------------------------
+def _resolve_path(name):
+    """Return the file_path of the SavedModel row for `name` (or None), cached briefly."""
+    now = time.monotonic()
+    cached = _paths.get(name)
+    if cached is not None and now - cached[1] < PATH_RECHECK_SECONDS:
+        return cached[0]
+
+    try:
+        path = SavedModel.objects.filter(name=name).latest("created_at").file_path
+    except SavedModel.DoesNotExist:
+        path = None
+    _paths[name] = (path, now)
+    return path
+
+
+def get_model(name):
+    """
+    Return the deserialized artifact for SavedModel `name`.
+    Raises SavedModel.DoesNotExist if no row exists, OSError if the file is missing.
+    """
+    path = _resolve_path(name)
+    if path is None:
+        raise SavedModel.DoesNotExist(f"No SavedModel named '{name}'")
+
+    if os.path.isdir(path):
+        obj = artifacts.load(os.path.dirname(path), os.path.basename(path))
+        if obj is None:
+            raise FileNotFoundError(f"No artifact version under {path}")
+        return obj
+
+    stat = os.stat(path)
+    entry = _entries.get(name)
+    if (entry is not None and entry["path"] == path
+            and entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size):
+        return entry["obj"]
+
+    with _lock:
+        # another thread may have reloaded while we waited
+        entry = _entries.get(name)
+        if (entry is not None and entry["path"] == path
+                and entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size):
+            return entry["obj"]
+
+        with open(path, "rb") as f:
+            raw = f.read()
+        checksum = hashlib.sha256(raw).hexdigest()
+
+        if entry is not None and entry["path"] == path and entry["checksum"] == checksum:
+            # file touched but content unchanged: keep the loaded object
+            obj = entry["obj"]
+        else:
+            obj = _deserialize(path, raw)
+
+        _entries[name] = {
+            "path": path,
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "checksum": checksum,
+            "obj": obj,
+        }
+        return obj
+
+
+def model_checksum(name):
+    """Checksum of the currently loaded version of `name`, or None if not loaded."""
+    entry = _entries.get(name)
+    return entry["checksum"] if entry else None
+
+
+# ------------------------
+# Publish
+# ------------------------
+def publish_model(name, obj, path):
+    """
+    Write `obj` to `path` atomically, point SavedModel `name` at it and make
+    it the live version in this process. Returns the file path.
+    """
+    raw = _serialize(path, obj)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(tmp_path, "wb") as f:
+        f.write(raw)
+    os.replace(tmp_path, path)
+
+    SavedModel.objects.update_or_create(name=name, defaults={"file_path": path})
+
+    stat = os.stat(path)
+    with _lock:
+        _entries[name] = {
+            "path": path,
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "checksum": hashlib.sha256(raw).hexdigest(),
+            "obj": obj,
+        }
+        _paths[name] = (path, time.monotonic())
+    return path
+
+
+def publish_frame(name, frame, directory):
+    """
+    Save DataFrame `frame` as a new version of artifact `name` under
+    `directory` and point SavedModel `name` at it. Returns the artifact path.
+    """
+    artifacts.save_frame(directory, name, frame)
+    return _point_at_artifact(name, os.path.join(directory, name))
+
+
+def publish_csr(name, matrix, index, directory, meta=None):
+    """Like `publish_frame` for a square sparse matrix labelled by `index`."""
+    artifacts.save_csr(directory, name, matrix, index, meta=meta)
+    return _point_at_artifact(name, os.path.join(directory, name))
+
+
+def publish_arrays(name, arrays, directory, labels=None, meta=None):
+    """Like `publish_frame` for a set of named arrays (e.g. model factors)."""
+    artifacts.save_arrays(directory, name, arrays, labels=labels, meta=meta)
+    return _point_at_artifact(name, os.path.join(directory, name))
+
+
+def _point_at_artifact(name, path):
+    SavedModel.objects.update_or_create(name=name, defaults={"file_path": path})
+    with _lock:
+        _entries.pop(name, None)
+        _paths[name] = (path, time.monotonic())
+    return path
+
+
+def invalidate(name=None):
+    """Drop one (or every) cached artifact so the next lookup reloads from disk."""
+    with _lock:
+        if name is None:
+            _entries.clear()
+            _paths.clear()
+        else:
+            _entries.pop(name, None)
+            _paths.pop(name, None)
@@ -35,6 +35,8 @@ class Rating(models.Model):
     id = models.BigAutoField(primary_key=True)
     rating = models.FloatField()
     timestamp = models.DateTimeField(auto_now_add=True)
+    # bumped on every save, so re-rated products count as new activity (recommendation_cache)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     product = models.ForeignKey(
         Product,
@@ -173,9 +175,16 @@ class PestRecommendation(models.Model):
     )
     confidence_score = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # "customer:base:recommended:type" — one row per combination (see make_dedup_key)
+    dedup_key = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
 
     class Meta:
         db_table = 'pest_recommendations'
+        indexes = [
+            # keyset pagination in recommendation_dashboard (see dashboard_query)
+            models.Index(fields=['recommendation_type', 'confidence_score', 'id'], name='pest_rec_type_conf_idx'),
+            models.Index(fields=['confidence_score', 'id'], name='pest_rec_conf_idx'),
+        ]
 
     def __str__(self):
         return f"{self.get_recommendation_type_display() if self.recommendation_type else 'Unknown'} for {self.customer.fullname if self.customer else 'Unknown'}"
@@ -204,6 +213,12 @@ class PestRecommendation(models.Model):
             return 'collaborative'
         return None
 
+    @staticmethod
+    def make_dedup_key(customer_id, base_product_id, recommended_product_id, recommendation_type):
+        """Unique key for a (customer, base, recommended, type) combination; NULLs become '-'."""
+        parts = (customer_id, base_product_id, recommended_product_id, recommendation_type)
+        return ":".join("-" if p is None else str(p) for p in parts)
+
     def save(self, *args, **kwargs):
         # Normalize recommendation_type to canonical key before save
         norm = PestRecommendation.normalize_recommendation_type(self.recommendation_type)
@@ -212,6 +227,9 @@ class PestRecommendation(models.Model):
         else:
             # keep None / blank if unknown
             self.recommendation_type = None
+        self.dedup_key = PestRecommendation.make_dedup_key(
+            self.customer_id, self.base_product_id, self.recommended_product_id, self.recommendation_type
+        )
         super().save(*args, **kwargs)
 
 
@@ -247,3 +265,46 @@ class HybridRankingDebug(models.Model):
 
     def __str__(self):
         return f"Hybrid Debug - {self.customer_id} ({self.generated_at})"
+
+
+# =========================================================
+# MATERIALIZED PER-CUSTOMER RECOMMENDATIONS
+# =========================================================
+class CustomerRecommendationCache(models.Model):
+    STRATEGY_CHOICES = [
+        ('personalized', 'Personalized (item-item CF)'),
+        ('user_based', 'User-based CF'),
+        ('collaborative', 'Similar customers'),
+        ('crosssell', 'Cross-sell'),
+    ]
+
+    customer = models.ForeignKey(
+        customer_details,
+        on_delete=models.CASCADE,
+        related_name='recommendation_cache'
+    )
+    strategy = models.CharField(max_length=20, choices=STRATEGY_CHOICES)
+    recommendations = models.JSONField(default=list)
+    computed_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        db_table = 'customer_recommendation_cache'
+        unique_together = ('customer', 'strategy')
+
+    def __str__(self):
+        return f"{self.strategy} for {self.customer_id} ({self.computed_at})"
+
+
+# =========================================================
+# INVOICES WAITING FOR THE CO-PURCHASE INDEX
+# =========================================================
+class PendingInvoiceBasket(models.Model):
+    """An invoice saved / deleted since the co-purchase index last folded changes in."""
+    invoice_id = models.BigIntegerField()
+    queued_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'recommender_pending_invoice_basket'
+
+    def __str__(self):
+        return f"Invoice {self.invoice_id} ({self.queued_at})"
@@ -0,0 +1,129 @@
+# recommender/product_catalog.py
+"""
+Process-wide product catalogue: product_id -> {"title", "category"}.
+
+Built once per process from two queries (Product, Item) and reused by every
+endpoint that needs to turn product ids into display titles, so resolving a
+list of recommendations costs no queries. The title comes from the product's
+Item row when there is one, else from Product.product_name.
+
+TaxInvoiceItem rows only carry a product_name, so the catalogue also keeps a
+case-insensitive name -> product_id map for resolving invoice lines, and
+the Item id <-> product_id maps the content-based recommenders need to turn
+TF-IDF neighbours (Items) into products.
+
+Product / Item saves and deletes (recommender.signals) bump a generation
+counter in the Django cache; every process rebuilds on its next read.
+Writes that bypass signals (bulk_create, update(), another app's
+database access) are picked up at the latest after MAX_AGE_SECONDS.
+"""
+import threading
+import time
+
+from django.core.cache import cache
+
+from crmapp.models import Product
+from recommender.models import Item
+
+
+GENERATION_CACHE_KEY = "recommender:product_catalog:generation"
+MAX_AGE_SECONDS = 15 * 60
+
+
+def _normalize_name(name):
+    return " ".join(str(name).split()).lower() if name else ""
+
+
+class ProductCatalog:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = None        # product_id -> {"title", "category"}
+        self._by_name = None        # normalized name -> product_id
+        self._by_item = None        # item id -> product_id
+        self._item_ids = None       # product_id -> [item id, ...]
+        self._generation = None
+        self._built_at = 0.0
+
+    # ------------------------
+    # Reads
+    # ------------------------
+    def entries(self):
+        entries = self._entries
+        if entries is not None and not self._is_stale():
+            return entries
+        with self._lock:
+            if self._entries is None or self._is_stale():
+                self._rebuild()
+            return self._entries
+
+    def _is_stale(self):
+        if time.monotonic() - self._built_at > MAX_AGE_SECONDS:
+            return True
+        return cache.get(GENERATION_CACHE_KEY) != self._generation
+
+    def get(self, product_id):
+        return self.entries().get(product_id)
+
+    def title(self, product_id):
+        entry = self.get(product_id)
+        return entry["title"] if entry else f"Product-{product_id}"
+
+    def titles(self, product_ids):
+        return [self.title(pid) for pid in product_ids]
+
+    def product_id_for_name(self, name):
+        self.entries()
+        return self._by_name.get(_normalize_name(name))
+
+    def product_id_for_item(self, item_id):
+        self.entries()
+        return self._by_item.get(item_id)
+
+    def item_ids(self, product_ids):
+        self.entries()
+        return [item_id for pid in product_ids for item_id in self._item_ids.get(pid, ())]
+
+    # ------------------------
+    # Invalidation (called from recommender.signals)
+    # ------------------------
+    def invalidate(self):
+        with self._lock:
+            self._entries = None
+            _bump_generation()
+
+    # ------------------------
+    # Internals
+    # ------------------------
+    def _rebuild(self):
+        generation = cache.get(GENERATION_CACHE_KEY)
+        entries, by_name, by_item, item_ids = {}, {}, {}, {}
+
+        for pid, name, category in Product.objects.values_list("product_id", "product_name", "category"):
+            entries[pid] = {"title": name, "category": category}
+            by_name.setdefault(_normalize_name(name), pid)
+
+        items = Item.objects.filter(product__isnull=False).values_list("id", "product_id", "title", "category")
+        for item_id, pid, title, category in items:
+            by_item[item_id] = pid
+            item_ids.setdefault(pid, []).append(item_id)
+            base = entries.get(pid, {})
+            entries[pid] = {"title": title or base.get("title"), "category": category or base.get("category")}
+            by_name.setdefault(_normalize_name(title), pid)
+
+        self._by_name = by_name
+        self._by_item = by_item
+        self._item_ids = item_ids
+        self._entries = entries
+        self._generation = generation
+        self._built_at = time.monotonic()
+
+
+def _bump_generation():
+    try:
+        return cache.incr(GENERATION_CACHE_KEY)
+    except ValueError:
+        cache.set(GENERATION_CACHE_KEY, 1, None)
+        return 1
+
+
+product_catalog = ProductCatalog()
@@ -0,0 +1,227 @@
+# recommender/rating_store.py
+"""
+Long-lived sparse customer × product rating matrix.
+
+Replaces the per-request `Rating.objects.all()` → DataFrame → pivot_table
+pattern. The matrix is built once per process by streaming Rating rows, then
+kept current by the post_save / post_delete handlers in recommender.signals,
+which recompute only the touched (customer, product) cell. Cells hold the
+mean rating, same as `pivot_table(aggfunc="mean")`, and rows / columns are
+sorted by id so the layout matches the old pivot.
+
+Writes made in other processes bump a generation counter in the Django cache;
+a reader that sees a newer generation rebuilds. Writes that bypass signals
+(bulk_create, raw SQL) are picked up at the latest after MAX_AGE_SECONDS.
+"""
+import itertools
+import threading
+import time
+
+import numpy as np
+from scipy import sparse
+from django.core.cache import cache
+
+from recommender.models import Rating
+
+
+GENERATION_CACHE_KEY = "recommender:rating_store:generation"
+MAX_AGE_SECONDS = 15 * 60
+CHUNK_SIZE = 10000
+
+
+class UserItemSnapshot:
+    """Immutable view of the rating matrix; safe to share between threads."""
+
+    def __init__(self, matrix, customer_ids, product_ids):
+        self.matrix = matrix                       # csr_matrix (n_customers, n_products)
+        self.customer_ids = customer_ids           # np.int64 array, sorted
+        self.product_ids = product_ids             # np.int64 array, sorted
+        self.customer_index = {int(c): i for i, c in enumerate(customer_ids)}
+        self.product_index = {int(p): i for i, p in enumerate(product_ids)}
+
+    @property
+    def empty(self):
+        return self.matrix.nnz == 0
+
+    def has_customer(self, customer_id):
+        return customer_id in self.customer_index
+
+    def user_row(self, customer_id):
+        """(product_ids, ratings) rated by the customer; empty arrays if unknown."""
+        row = self.customer_index.get(customer_id)
+        if row is None:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        start, end = self.matrix.indptr[row], self.matrix.indptr[row + 1]
+        return self.product_ids[self.matrix.indices[start:end]], self.matrix.data[start:end]
+
+    def user_vector(self, customer_id, product_ids=None):
+        """Dense rating vector for the customer, aligned to `product_ids` (default: all columns)."""
+        rated_pids, ratings = self.user_row(customer_id)
+        if product_ids is None:
+            vec = np.zeros(len(self.product_ids))
+            row = self.customer_index.get(customer_id)
+            if row is not None:
+                start, end = self.matrix.indptr[row], self.matrix.indptr[row + 1]
+                vec[self.matrix.indices[start:end]] = self.matrix.data[start:end]
+            return vec
+
+        position = {int(pid): i for i, pid in enumerate(product_ids)}
+        vec = np.zeros(len(position))
+        for pid, rating in zip(rated_pids, ratings):
+            i = position.get(int(pid))
+            if i is not None:
+                vec[i] = rating
+        return vec
+
+    def rated_products(self, customer_id):
+        pids, ratings = self.user_row(customer_id)
+        return [int(p) for p in pids[ratings > 0]]
+
+    def top_rated_products(self, top_n=5):
+        """Product ids ordered by mean rating, like groupby('product_id').mean()."""
+        if self.empty:
+            return []
+        sums = np.asarray(self.matrix.sum(axis=0)).ravel()
+        counts = np.diff(self.matrix.tocsc().indptr)
+        means = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+        order = np.argsort(-means, kind="stable")[:top_n]
+        return [int(self.product_ids[i]) for i in order]
+
+
+def _build_snapshot(customer_ids, product_ids, ratings):
+    """Aggregate raw (customer, product, rating) triples into a snapshot (mean per cell)."""
+    if len(ratings) == 0:
+        return UserItemSnapshot(
+            sparse.csr_matrix((0, 0)), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        )
+
+    cust_keys, rows = np.unique(customer_ids, return_inverse=True)
+    prod_keys, cols = np.unique(product_ids, return_inverse=True)
+    shape = (len(cust_keys), len(prod_keys))
+
+    sums = sparse.csr_matrix((ratings, (rows, cols)), shape=shape)
+    counts = sparse.csr_matrix((np.ones(len(ratings)), (rows, cols)), shape=shape)
+    sums.sum_duplicates()
+    counts.sum_duplicates()
+    sums.data = sums.data / counts.data
+
+    return UserItemSnapshot(sums, cust_keys.astype(np.int64), prod_keys.astype(np.int64))
+
+
+class UserItemStore:
+    """Process-wide holder of the current UserItemSnapshot plus pending cell updates."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._snapshot = None
+        self._pending = {}          # (customer_id, product_id) -> mean rating, or None if gone
+        self._generation = None
+        self._built_at = 0.0
+
+    # ------------------------
+    # Reads
+    # ------------------------
+    def snapshot(self):
+        snap = self._snapshot
+        if snap is not None and not self._pending and not self._is_stale():
+            return snap
+
+        with self._lock:
+            if self._snapshot is None or self._is_stale():
+                self._rebuild()
+            elif self._pending:
+                self._compact()
+            return self._snapshot
+
+    def _is_stale(self):
+        if time.monotonic() - self._built_at > MAX_AGE_SECONDS:
+            return True
+        return cache.get(GENERATION_CACHE_KEY) != self._generation
+
+    # ------------------------
+    # Writes (called from recommender.signals)
+    # ------------------------
+    def update_cell(self, customer_id, product_id, value):
+        """Set the mean rating of one cell; value=None removes it."""
+        if customer_id is None or product_id is None:
+            return
+        with self._lock:
+            self._pending[(int(customer_id), int(product_id))] = value
+            generation = _bump_generation()
+            # only our own bump: a gap means another process wrote since we
+            # last rebuilt, and adopting its generation would hide that write
+            if generation == (self._generation or 0) + 1:
+                self._generation = generation
+
+    def reset(self):
+        with self._lock:
+            self._snapshot = None
+            self._pending = {}
+
+    # ------------------------
+    # Internals
+    # ------------------------
+    def _rebuild(self):
+        generation = cache.get(GENERATION_CACHE_KEY)
+        rows = (
+            Rating.objects
+            .filter(customer__isnull=False, product__isnull=False)
+            .values_list("customer_id", "product_id", "rating")
+            .iterator(chunk_size=CHUNK_SIZE)
+        )
+        flat = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.float64)
+        triples = flat.reshape(-1, 3)
+
+        self._snapshot = _build_snapshot(
+            triples[:, 0].astype(np.int64), triples[:, 1].astype(np.int64), triples[:, 2]
+        )
+        self._pending = {}
+        self._generation = generation
+        self._built_at = time.monotonic()
+
+    def _compact(self):
+        snap = self._snapshot
+        coo = snap.matrix.tocoo()
+        cust = snap.customer_ids[coo.row]
+        prod = snap.product_ids[coo.col]
+        vals = coo.data
+
+        # drop every existing cell that has a pending replacement
+        keep = np.ones(len(vals), dtype=bool)
+        csr = snap.matrix
+        for (cid, pid) in self._pending:
+            row, col = snap.customer_index.get(cid), snap.product_index.get(pid)
+            if row is None or col is None:
+                continue
+            start, end = csr.indptr[row], csr.indptr[row + 1]
+            hit = np.flatnonzero(csr.indices[start:end] == col)
+            if hit.size:
+                keep[start + hit[0]] = False
+
+        added = [(c, p, v) for (c, p), v in self._pending.items() if v is not None]
+        if added:
+            add_c, add_p, add_v = (np.array(x) for x in zip(*added))
+            cust = np.concatenate([cust[keep], add_c.astype(np.int64)])
+            prod = np.concatenate([prod[keep], add_p.astype(np.int64)])
+            vals = np.concatenate([vals[keep], add_v.astype(np.float64)])
+        else:
+            cust, prod, vals = cust[keep], prod[keep], vals[keep]
+
+        self._snapshot = _build_snapshot(cust, prod, vals)
+        self._pending = {}
+
+
+def _bump_generation():
+    try:
+        return cache.incr(GENERATION_CACHE_KEY)
+    except ValueError:
+        cache.set(GENERATION_CACHE_KEY, 1, None)
+        return 1
+
+
+rating_store = UserItemStore()
+
+
+def get_user_item_snapshot():
+    """Current rating matrix; cheap to call from any request."""
+    return rating_store.snapshot()
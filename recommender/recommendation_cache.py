@@ -0,0 +1,182 @@
+# recommender/recommendation_cache.py
+"""
+Materialized per-customer recommendations (CustomerRecommendationCache).
+
+`materialize_recommendations` (run nightly by celery) fills the table in
+bulk, recomputing only customers whose ratings, invoices or interactions
+changed since the previous run, customers without a row, and rows older
+than CACHE_TTL. Endpoints read their list with `get_cached_recommendations`
+(one lookup on the (customer, strategy) unique index) and fall back to live
+computation + `store_recommendations` when the row is missing or expired.
+"""
+from datetime import timedelta
+
+from django.db.models import Max
+from django.utils import timezone
+
+from crmapp.models import customer_details, TaxInvoice
+from recommender.models import CustomerRecommendationCache, Rating, Interaction, Item
+from recommender.recommender_engine import (
+    generate_recommendations_bulk,
+    get_fabricated_recommendations,
+    load_fabricated_models,
+    get_user_based_recommendations,
+    get_collaborative_recommendations,
+    get_crosssell_recommendations,
+)
+
+
+CACHE_TTL = timedelta(hours=24)
+DEFAULT_TOP_N = 5
+WRITE_BATCH_SIZE = 1000
+
+
+# ------------------------
+# Serving
+# ------------------------
+def get_cached_recommendations(customer_id, strategy, top_n=None):
+    """Return the materialized list for (customer, strategy), or None if missing/expired."""
+    recs = (
+        CustomerRecommendationCache.objects
+        .filter(customer_id=customer_id, strategy=strategy, computed_at__gte=timezone.now() - CACHE_TTL)
+        .values_list("recommendations", flat=True)
+        .first()
+    )
+    if recs is None:
+        return None
+    return recs[:top_n] if top_n else recs
+
+
+def store_recommendations(customer_id, strategy, recommendations):
+    CustomerRecommendationCache.objects.update_or_create(
+        customer_id=customer_id,
+        strategy=strategy,
+        defaults={"recommendations": recommendations, "computed_at": timezone.now()},
+    )
+
+
+def _bulk_store(strategy, results):
+    now = timezone.now()
+    rows = [
+        CustomerRecommendationCache(customer_id=cid, strategy=strategy, recommendations=recs, computed_at=now)
+        for cid, recs in results.items()
+    ]
+    CustomerRecommendationCache.objects.bulk_create(
+        rows,
+        batch_size=WRITE_BATCH_SIZE,
+        update_conflicts=True,    # ON DUPLICATE KEY UPDATE on the (customer, strategy) unique index
+        update_fields=["recommendations", "computed_at"],
+    )
+
+
+# ------------------------
+# Per-strategy bulk computation
+# ------------------------
+def _compute_personalized(customer_ids, top_n):
+    _, _, rec_df = load_fabricated_models()
+    scored = generate_recommendations_bulk(customer_ids, top_n=top_n)
+
+    ranked = {}
+    for cid in customer_ids:
+        fabricated = get_fabricated_recommendations(cid, top_n, rec_df=rec_df) if rec_df is not None else []
+        if fabricated:
+            ranked[cid] = ([int(x) for x in fabricated[:top_n] if str(x).isdigit()], {})
+        else:
+            pairs = scored.get(cid, [])
+            ranked[cid] = ([pid for pid, _ in pairs], dict(pairs))
+
+    all_pids = {pid for pids, _ in ranked.values() for pid in pids}
+    items = {i.product_id: i for i in Item.objects.filter(product_id__in=all_pids)}
+    return {
+        cid: [
+            {
+                "product_id": pid,
+                "title": items[pid].title,
+                "category": items[pid].category,
+                "tags": items[pid].tags,
+                "confidence_score": scores.get(pid),
+            }
+            for pid in pids if pid in items
+        ]
+        for cid, (pids, scores) in ranked.items()
+    }
+
+
+def _compute_user_based(customer_ids, top_n):
+    return {cid: get_user_based_recommendations(cid, top_n) for cid in customer_ids}
+
+
+def _compute_collaborative(customer_ids, top_n):
+    return {cid: get_collaborative_recommendations(cid, top_n) for cid in customer_ids}
+
+
+def _compute_crosssell(customer_ids, top_n):
+    return {
+        cid: [
+            {"product_id": i.product_id, "title": i.title, "category": i.category}
+            for i in get_crosssell_recommendations(cid, top_n)
+        ]
+        for cid in customer_ids
+    }
+
+
+STRATEGIES = {
+    "personalized": _compute_personalized,
+    "user_based": _compute_user_based,
+    "collaborative": _compute_collaborative,
+    "crosssell": _compute_crosssell,
+}
+
+
+# ------------------------
+# Nightly materialization
+# ------------------------
+ACTIVITY_SOURCES = [
+    (Rating, "updated_at"),    # not `timestamp`: edited ratings must count too
+    (TaxInvoice, "created_at"),
+    (Interaction, "timestamp"),
+]
+
+
+def customers_to_refresh(strategy):
+    """Customer ids whose row is missing, expired, or older than their latest rating/invoice/interaction write."""
+    all_ids = set(customer_details.objects.values_list("id", flat=True))
+    computed = dict(
+        CustomerRecommendationCache.objects
+        .filter(strategy=strategy, computed_at__gte=timezone.now() - CACHE_TTL)
+        .values_list("customer_id", "computed_at")
+    )
+    stale = all_ids - set(computed)
+    if not computed:
+        return stale
+
+    since = min(computed.values())
+    for model, field in ACTIVITY_SOURCES:
+        latest = (
+            model.objects
+            .filter(**{f"{field}__gte": since}, customer__isnull=False)
+            .values("customer_id")
+            .annotate(last=Max(field))
+            .values_list("customer_id", "last")
+        )
+        for cid, last in latest:
+            if cid in computed and last >= computed[cid]:
+                stale.add(cid)
+    return stale
+
+
+def materialize_recommendations(strategies=None, full=False, top_n=DEFAULT_TOP_N, chunk_size=5000):
+    """Recompute the cache table; returns {strategy: customers refreshed}."""
+    summary = {}
+    for strategy in strategies or STRATEGIES:
+        compute = STRATEGIES[strategy]
+        if full:
+            customer_ids = list(customer_details.objects.values_list("id", flat=True))
+        else:
+            customer_ids = sorted(customers_to_refresh(strategy))
+
+        for start in range(0, len(customer_ids), chunk_size):
+            chunk = customer_ids[start:start + chunk_size]
+            _bulk_store(strategy, compute(chunk, top_n))
+        summary[strategy] = len(customer_ids)
+    return summary
@@ -0,0 +1,88 @@
+# recommender/recommendation_writer.py
+"""
+Buffered, de-duplicating writer for PestRecommendation rows.
+
+Rows are keyed by PestRecommendation.make_dedup_key (customer, base product,
+recommended product, type) and upserted with
+`bulk_create(update_conflicts=True)`, i.e. MySQL's INSERT ... ON DUPLICATE
+KEY UPDATE on the unique `dedup_key` index (MySQL takes no conflict target,
+so no `unique_fields`), so scoring
+the same customer again refreshes the confidence instead of adding another
+row. Types are normalised once per distinct raw value rather than in
+`save()` per row. The buffer is flushed every `batch_size` rows and when the
+writer is closed:
+
+    with RecommendationWriter() as writer:
+        for cid, ranked in results.items():
+            for pid, score in ranked:
+                writer.add(cid, pid, "collaborative", score)
+"""
+from decimal import Decimal
+
+from recommender.models import PestRecommendation
+
+
+BATCH_SIZE = 2000
+# confidence_score is DecimalField(max_digits=5, decimal_places=2)
+MAX_CONFIDENCE = Decimal("999.99")
+
+
+class RecommendationWriter:
+    def __init__(self, batch_size=BATCH_SIZE):
+        self.batch_size = batch_size
+        self._buffer = {}           # dedup_key -> PestRecommendation (last write wins)
+        self._types = {}            # raw type -> canonical key or None
+        self.written = 0
+
+    def _normalize_type(self, value):
+        if value not in self._types:
+            self._types[value] = PestRecommendation.normalize_recommendation_type(value)
+        return self._types[value]
+
+    @staticmethod
+    def _confidence(score):
+        if score is None:
+            return None
+        value = Decimal(str(round(float(score), 2)))
+        return max(-MAX_CONFIDENCE, min(MAX_CONFIDENCE, value))
+
+    def add(self, customer_id, recommended_product_id, recommendation_type, confidence_score=None,
+            base_product_id=None):
+        rec_type = self._normalize_type(recommendation_type)
+        key = PestRecommendation.make_dedup_key(customer_id, base_product_id, recommended_product_id, rec_type)
+        self._buffer[key] = PestRecommendation(
+            customer_id=customer_id,
+            base_product_id=base_product_id,
+            recommended_product_id=recommended_product_id,
+            recommendation_type=rec_type,
+            confidence_score=self._confidence(confidence_score),
+            dedup_key=key,
+        )
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Upsert the buffered rows in one statement. Returns the number written."""
+        if not self._buffer:
+            return 0
+        rows = list(self._buffer.values())
+        self._buffer = {}
+        PestRecommendation.objects.bulk_create(
+            rows,
+            batch_size=self.batch_size,
+            update_conflicts=True,
+            update_fields=["confidence_score", "created_at"],
+        )
+        self.written += len(rows)
+        return len(rows)
+
+    def close(self):
+        return self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.flush()
+        return False
@@ -7,9 +7,16 @@ from django.db import models
 
 
 from django.db import connection
+from scipy import sparse
 from sklearn.metrics.pairwise import cosine_similarity
 
 from recommender.models import Rating, Item, SavedModel, PestRecommendation
+from recommender import artifacts, model_registry
+from recommender.rating_store import get_user_item_snapshot
+from recommender.copurchase_index import load_copurchase_index
+from recommender.user_based_cf import load_user_based_cf
+from recommender.sparse_similarity import topk_cosine_similarity, compare_with_dense
+from recommender.implicit_als import recommend_implicit
 from crmapp.models import Product, customer_details
 
 
@@ -20,29 +27,49 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 TRAINED_MODELS_DIR = os.path.join(BASE_DIR, "..", "trained_models")
 os.makedirs(TRAINED_MODELS_DIR, exist_ok=True)
 
-USER_ITEM_MATRIX = os.path.join(TRAINED_MODELS_DIR, "user_item_matrix.csv")
-ITEM_SIM_MODEL = os.path.join(TRAINED_MODELS_DIR, "item_similarity_model.pkl")
-USER_TOP5 = os.path.join(TRAINED_MODELS_DIR, "user_top5_recommendations.csv")
+# Artifact names (recommender.artifacts) inside TRAINED_MODELS_DIR
+USER_ITEM_MATRIX = "user_item_matrix"
+ITEM_SIM_MODEL = "item_similarity_model"
+USER_TOP5 = "user_top5_recommendations"
+USER_SIMILARITY_MATRIX = "user_similarity_matrix"
+
+
+def _legacy_csv(name):
+    """CSV the artifact `name` replaced; read only until the artifact is written."""
+    return os.path.join(TRAINED_MODELS_DIR, f"{name}.csv")
+
+
+def load_trained_matrix(name):
+    """
+    Memory-mapped DataFrame (or LabelledCSR for sparse top-K models) for
+    artifact `name`; the legacy CSV until converted; None if neither exists.
+    """
+    return artifacts.load(TRAINED_MODELS_DIR, name, legacy_csv=_legacy_csv(name))
+
+# Neighbours weighted per user in user-based CF (None = every similar user)
+USER_CF_NEIGHBOURS = 50
 
 
 # ------------------------
 # Fabricated helpers
 # ------------------------
 def load_fabricated_models():
-    """Load fabricated CSVs if present (optional helper)."""
+    """Load fabricated matrices if present (optional helper, memory-mapped)."""
     try:
-        user_item_df = pd.read_csv(USER_ITEM_MATRIX, index_col=0) if os.path.exists(USER_ITEM_MATRIX) else None
-        item_sim_df = pd.read_csv(ITEM_SIM_MODEL, index_col=0) if os.path.exists(ITEM_SIM_MODEL) else None
-        rec_df = pd.read_csv(USER_TOP5, index_col=0) if os.path.exists(USER_TOP5) else None
+        user_item_df = load_trained_matrix(USER_ITEM_MATRIX)
+        item_sim_df = load_trained_matrix(ITEM_SIM_MODEL)
+        rec_df = load_trained_matrix(USER_TOP5)
         return user_item_df, item_sim_df, rec_df
     except Exception as e:
         print("⚠️ Error loading fabricated models:", e)
         return None, None, None
 
 
-def get_fabricated_recommendations(user_id, top_n=5):
-    """Return fabricated top-n if available (index may be str or int)."""
-    _, _, rec_df = load_fabricated_models()
+def get_fabricated_recommendations(user_id, top_n=5, rec_df=None):
+    """Return fabricated top-n if available (index may be str or int).
+    Pass a preloaded `rec_df` when calling for many users."""
+    if rec_df is None:
+        _, _, rec_df = load_fabricated_models()
     if rec_df is None:
         return []
 
@@ -70,16 +97,14 @@ def get_fabricated_recommendations(user_id, top_n=5):
 # ------------------------
 def load_trained_model(model_name="recommender_similarity"):
     """
-    Loads a saved similarity matrix (pickled DataFrame or numpy array).
-    The SavedModel table (recommender.SavedModel) stores file_path.
+    Loads a saved similarity matrix (artifact directory, or a legacy pickled
+    DataFrame / numpy array). The SavedModel table (recommender.SavedModel)
+    stores file_path; the loaded object is cached per process by model_registry.
     """
     try:
-        saved_model = SavedModel.objects.filter(name=model_name).latest("created_at")
-        model_path = saved_model.file_path
-        with open(model_path, "rb") as f:
-            model_obj = pickle.load(f)
-        # Accept pandas.DataFrame or numpy array.
-        if isinstance(model_obj, pd.DataFrame):
+        model_obj = model_registry.get_model(model_name)
+        # Accept pandas.DataFrame, sparse top-K model or numpy array.
+        if isinstance(model_obj, (pd.DataFrame, artifacts.LabelledCSR)):
             return model_obj
         else:
             # if numpy array, convert to DataFrame with no index (caller must know mapping)
@@ -95,14 +120,40 @@ def load_trained_model(model_name="recommender_similarity"):
 # ------------------------
 # Generate recommendations for a single user
 # ------------------------ 
-def generate_recommendations_for_user(customer_id, top_n=5):  # Renamed from user_id
+def _implicit_items(customer_id, top_n, exclude=()):
+    """Items from the implicit-feedback ALS model with .score attached, ranked; [] if no factors."""
+    ranked = recommend_implicit(customer_id, top_n, exclude=exclude)
+    if not ranked:
+        return []
+    scores = dict(ranked)
+    items = {i.product_id: i for i in Item.objects.filter(product_id__in=scores)}
+    for pid, item in items.items():
+        item.score = scores[pid]
+    return [items[pid] for pid, _ in ranked if pid in items]
+
+
+def generate_recommendations_for_user(customer_id, top_n=5, strategy="auto"):  # Renamed from user_id
     """
     Return top-N Item queryset for given customer_id (customer id).
-    Priorities:
+    strategy="implicit" ranks with the ALS model trained on the Interaction
+    log only; strategy="hybrid" fuses all candidate sources with
+    recommender.hybrid_ranker. strategy="auto" priorities:
       1) fabricated (CSV)
       2) collaborative model (saved similarity)
-      3) popular fallback
+      3) implicit-feedback ALS for customers without ratings
+      4) popular fallback
     """
+    if strategy == "implicit":
+        return _implicit_items(customer_id, top_n)
+    if strategy == "hybrid":
+        from recommender.hybrid_ranker import rank_for_customer   # imports this module
+        ranked = rank_for_customer(customer_id, top_n)
+        items = {i.product_id: i for i in Item.objects.filter(product_id__in=[r["product_id"] for r in ranked])}
+        for r in ranked:
+            if r["product_id"] in items:
+                items[r["product_id"]].score = r["score"]
+        return [items[r["product_id"]] for r in ranked if r["product_id"] in items]
+
     try:
         # 1) fabricated
         fabricated = get_fabricated_recommendations(customer_id, top_n)  # Updated
@@ -114,10 +165,9 @@ def generate_recommendations_for_user(customer_id, top_n=5):  # Renamed from use
                 item.score = None  # Or compute if possible
             return items
 
-        # 2) build rating pivot
-        qs = Rating.objects.all().values("customer_id", "product_id", "rating")
-        df = pd.DataFrame(list(qs))
-        if df.empty:
+        # 2) user-item ratings (kept in memory by rating_store, no per-request pivot)
+        snapshot = get_user_item_snapshot()
+        if snapshot.empty:
             # fallback: return first top items by popularity (empty if none)
             top_products = Rating.objects.all().values("product_id").annotate(avg=models.Avg("rating")).order_by("-avg")[:top_n]
             top_pids = [r["product_id"] for r in top_products]
@@ -126,12 +176,13 @@ def generate_recommendations_for_user(customer_id, top_n=5):  # Renamed from use
                 item.score = None
             return items
 
-        # pivot: index = customer_id, columns = product_id
-        pivot = df.pivot_table(index="customer_id", columns="product_id", values="rating", aggfunc="mean").fillna(0)
-
-        if customer_id not in pivot.index:  # Updated
-            # user has no ratings -> return top-rated products
-            top_products = df.groupby("product_id")["rating"].mean().sort_values(ascending=False).head(top_n).index.tolist()
+        if not snapshot.has_customer(customer_id):  # Updated
+            # user has no ratings -> interactions (views, clicks, calls...) if we know any
+            implicit = _implicit_items(customer_id, top_n)
+            if implicit:
+                return implicit
+            # otherwise return top-rated products
+            top_products = snapshot.top_rated_products(top_n)
             items = Item.objects.filter(product_id__in=top_products)
             for item in items:
                 item.score = None
@@ -141,39 +192,40 @@ def generate_recommendations_for_user(customer_id, top_n=5):  # Renamed from use
         similarity_df = load_trained_model()
         if similarity_df is None:
             # fallback: compute simple item similarity from current data
-            matrix = pivot.values
-            if matrix.size == 0:
+            if snapshot.matrix.size == 0:
                 return Item.objects.none()  # Empty queryset
             try:
-                computed = cosine_similarity(matrix.T)
-                similarity_df = pd.DataFrame(computed, index=pivot.columns, columns=pivot.columns)
+                computed = cosine_similarity(snapshot.matrix.T, dense_output=True)
+                similarity_df = pd.DataFrame(computed, index=snapshot.product_ids, columns=snapshot.product_ids)
             except Exception as e:
                 print(f"⚠️ Error computing similarity: {e}")
                 # fallback to popularity
-                top_products = df.groupby("product_id")["rating"].mean().sort_values(ascending=False).head(top_n).index.tolist()
+                top_products = snapshot.top_rated_products(top_n)
                 items = Item.objects.filter(product_id__in=top_products)
                 for item in items:
                     item.score = None
                 return items
 
         # align matrix columns (similarity_df index must be product ids)
-        if isinstance(similarity_df, pd.DataFrame):
+        if isinstance(similarity_df, (pd.DataFrame, artifacts.LabelledCSR)):
             sim_index = list(map(int, similarity_df.index))
         else:
-            sim_index = list(pivot.columns)  # best-effort
+            sim_index = [int(p) for p in snapshot.product_ids]  # best-effort
 
         # create user vector aligned to sim_index
-        user_vector = pivot.loc[customer_id].reindex(index=sim_index, fill_value=0).values.reshape(1, -1)  # Updated
+        user_vector = snapshot.user_vector(customer_id, sim_index).reshape(1, -1)  # Updated
 
         # if similarity is df, convert to numpy with same order
-        if isinstance(similarity_df, pd.DataFrame):
+        if isinstance(similarity_df, artifacts.LabelledCSR):
+            sim_mat = similarity_df.matrix                     # sparse top-K, already in sim_index order
+        elif isinstance(similarity_df, pd.DataFrame):
             sim_mat = similarity_df.reindex(index=sim_index, columns=sim_index).fillna(0).values
         else:
             sim_mat = np.array(similarity_df)
 
         # score = sim * user_vector
         try:
-            scores = np.dot(sim_mat, user_vector.T).flatten()
+            scores = np.asarray(sim_mat @ user_vector.T).flatten()
         except Exception as e:
             print(f"⚠️ Error computing scores: {e}")
             scores = np.zeros(len(sim_index))
@@ -181,7 +233,7 @@ def generate_recommendations_for_user(customer_id, top_n=5):  # Renamed from use
         # build predictions DataFrame
         preds = pd.DataFrame({"product_id": sim_index, "score": scores})
         # exclude items already rated by user
-        rated = pivot.loc[customer_id][pivot.loc[customer_id] > 0].index.tolist()  # Updated
+        rated = snapshot.rated_products(customer_id)  # Updated
         preds = preds[~preds["product_id"].isin(rated)]
         preds = preds.sort_values("score", ascending=False).head(top_n)
 
@@ -196,6 +248,87 @@ def generate_recommendations_for_user(customer_id, top_n=5):  # Renamed from use
         print(f"⚠️ Unexpected error in generate_recommendations_for_user for customer {customer_id}: {e}")  # Updated
         return Item.objects.none()  # Return empty queryset on any error
 
+
+# ------------------------
+# Generate recommendations for many users at once
+# ------------------------
+BULK_BATCH_SIZE = 4096
+
+
+def _aligned_similarity(snapshot):
+    """Return (sim_matrix, product_ids) for the saved item-item model, or one computed from ratings."""
+    similarity_df = load_trained_model()
+    if similarity_df is None:
+        sim = cosine_similarity(snapshot.matrix.T, dense_output=True)
+        return sim, np.asarray(snapshot.product_ids, dtype=np.int64)
+
+    sim_index = np.asarray(list(map(int, similarity_df.index)), dtype=np.int64)
+    if isinstance(similarity_df, artifacts.LabelledCSR):
+        return similarity_df.matrix, sim_index
+    return similarity_df.values, sim_index
+
+
+def generate_recommendations_bulk(customer_ids, top_n=5, batch_size=BULK_BATCH_SIZE):
+    """
+    Score every customer in `customer_ids` with the collaborative (item-item)
+    model in one sparse ratings × similarity product per batch.
+    Returns {customer_id: [(product_id, score), ...]} best first. Customers
+    without ratings get the top-rated products with score None.
+    """
+    customer_ids = [int(c) for c in customer_ids]
+    snapshot = get_user_item_snapshot()
+    if snapshot.empty:
+        return {cid: [] for cid in customer_ids}
+
+    popular = [(pid, None) for pid in snapshot.top_rated_products(top_n)]
+    results = {cid: popular for cid in customer_ids if not snapshot.has_customer(cid)}
+    known = [cid for cid in customer_ids if snapshot.has_customer(cid)]
+    if not known:
+        return results
+
+    sim_mat, sim_index = _aligned_similarity(snapshot)
+    n_items = len(sim_index)
+    if n_items == 0:
+        return {**results, **{cid: [] for cid in known}}
+
+    # project rating columns (snapshot product order) onto similarity order
+    position = {pid: i for i, pid in enumerate(sim_index.tolist())}
+    src_cols = [j for j, pid in enumerate(snapshot.product_ids.tolist()) if pid in position]
+    dst_cols = [position[int(snapshot.product_ids[j])] for j in src_cols]
+    projection = sparse.csr_matrix(
+        (np.ones(len(src_cols)), (src_cols, dst_cols)),
+        shape=(len(snapshot.product_ids), n_items),
+    )
+    if sparse.issparse(sim_mat):
+        sim_t = sim_mat.T.tocsr()                             # top-K model: stays sparse
+    else:
+        sim_t = np.ascontiguousarray(sim_mat.T)
+    k = min(top_n, n_items)
+
+    for start in range(0, len(known), batch_size):
+        batch = known[start:start + batch_size]
+        rows = [snapshot.customer_index[cid] for cid in batch]
+        ratings = snapshot.matrix[rows] @ projection          # (batch, n_items), sparse
+        scores = ratings @ sim_t                              # (batch, n_items)
+        scores = scores.toarray() if sparse.issparse(scores) else np.asarray(scores)
+
+        # exclude already-rated items
+        rated = ratings.multiply(ratings > 0).tocoo()
+        scores[rated.row, rated.col] = -np.inf
+
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+
+        for cid, pids, vals in zip(batch, sim_index[top], top_scores):
+            results[cid] = [
+                (int(pid), float(score)) for pid, score in zip(pids, vals) if np.isfinite(score)
+            ]
+
+    return results
+
 # ------------------------
 # SQL/ORM-based content & collaborative helpers
 # ------------------------
@@ -255,117 +388,102 @@ def get_upsell_recommendations(product_id, top_n=5):
 
 def get_crosssell_recommendations(user, top_n=5):
     """
-    Recommend items for a user (customer) excluding already rated/purchased.
-    Returns Item objects.
+    Recommend items for a user (customer) excluding already rated/purchased,
+    ranked by co-purchase confidence with the customer's invoiced products.
+    Falls back to the most purchased products. Returns Item objects.
     """
     user_id = user.id if hasattr(user, "id") else int(user)
-    purchased_pids = Rating.objects.filter(customer_id=user_id).values_list("product_id", flat=True).distinct()
-    crosssell = Item.objects.exclude(product_id__in=list(purchased_pids)).order_by("?")[:top_n]
-    return list(crosssell)
+    purchased_pids = set(
+        Rating.objects.filter(customer_id=user_id).values_list("product_id", flat=True).distinct()
+    )
+
+    index = load_copurchase_index()
+    if index is None:
+        crosssell = Item.objects.exclude(product_id__in=purchased_pids).order_by("-created_at")[:top_n]
+        return list(crosssell)
+
+    pids = [pid for pid, _, _ in index.recommend_for_customer(user_id, top_n, exclude=purchased_pids)]
+    if len(pids) < top_n:
+        pids += index.popular(top_n - len(pids), exclude=purchased_pids | set(pids)
+                              | set(index.customer_products.get(user_id, ())))
+
+    items = {i.product_id: i for i in Item.objects.filter(product_id__in=pids)}
+    return [items[pid] for pid in pids if pid in items]
 
 
 # ------------------------
 # User-based recommender (file-backed)
 # ------------------------
-def get_user_based_recommendations(user_id, top_n=5):
+def get_user_based_recommendations(user_id, top_n=5, k_neighbours=USER_CF_NEIGHBOURS):
     """
-    Uses precomputed CSVs user_item_matrix and user_similarity_matrix
-    to recommend items for a user.
+    Uses the precomputed user_item_matrix and user_similarity_matrix
+    artifacts (scored by recommender.user_based_cf) to recommend items for a
+    user, weighting ratings of the `k_neighbours` most similar users.
     """
-    base_dir = os.getcwd()
-    user_item_path = os.path.join(base_dir, "trained_models", "user_item_matrix.csv")
-    similarity_path = os.path.join(base_dir, "trained_models", "user_similarity_matrix.csv")
-
-    if not os.path.exists(user_item_path) or not os.path.exists(similarity_path):
+    model = load_user_based_cf(load_trained_matrix(USER_ITEM_MATRIX), load_trained_matrix(USER_SIMILARITY_MATRIX))
+    if model is None:
         print("⚠️ Precomputed files missing.")
         return []
 
-    user_item = pd.read_csv(user_item_path, index_col=0)
-    similarity = pd.read_csv(similarity_path, index_col=0)
-
-    # ensure integer indices
-    try:
-        user_item.index = user_item.index.astype(int)
-        similarity.index = similarity.index.astype(int)
-        similarity.columns = similarity.columns.astype(int)
-    except Exception:
-        pass
-
-    if user_id not in user_item.index:
+    user_id = int(user_id)
+    if not model.has_user(user_id):
         print(f"⚠️ User {user_id} not found in matrix.")
         return []
 
-    sim_scores = similarity.loc[user_id]
-    sim_scores = sim_scores[sim_scores > 0]
+    ranked = model.recommend(user_id, top_n=top_n, k_neighbours=k_neighbours)
+    if not ranked:
+        return [int(i) for i in model.popular_items[:top_n]]
 
-    if sim_scores.empty:
-        print("⚠️ No similar users found.")
-        return []
-
-    user_ratings = user_item.loc[user_id]
-    unrated_items = user_ratings[user_ratings == 0].index
-
-    weighted_scores = {}
-    for item in unrated_items:
-        total_sim, weighted_sum = 0.0, 0.0
-        for other_user, score in sim_scores.items():
-            if user_item.loc[other_user, item] > 0:
-                weighted_sum += score * user_item.loc[other_user, item]
-                total_sim += score
-        if total_sim > 0:
-            weighted_scores[item] = weighted_sum / total_sim
-
-    if not weighted_scores:
-        item_means = user_item.replace(0, np.nan).mean(axis=0).sort_values(ascending=False)
-        return item_means.head(top_n).index.tolist()
-
-    ranked = sorted(weighted_scores.items(), key=lambda x: x[1], reverse=True)
-    top_items = [int(item) for item, _ in ranked[:top_n]]
-    items = Item.objects.filter(product_id__in=top_items).values_list("product_id", "title", "category")
-    return [f"{i[1]} (Category: {i[2]})" for i in items]
+    top_items = [item for item, _ in ranked]
+    items = {
+        pid: (title, category)
+        for pid, title, category in Item.objects.filter(product_id__in=top_items)
+        .values_list("product_id", "title", "category")
+    }
+    return [f"{items[pid][0]} (Category: {items[pid][1]})" for pid in top_items if pid in items]
 
 
 # ------------------------
 # Train and save collaborative (item-item) model
 # ------------------------
-def train_and_save_model():
+def train_and_save_model(top_k=None, min_similarity=0.0):
     """
-    Train item-item similarity (cosine) from Rating table and save with SavedModel.
+    Train item-item similarity (cosine) from the rating store and save with SavedModel.
+    With `top_k`, keep only each item's top_k neighbours (>= min_similarity)
+    as a sparse CSR model and record its agreement with the dense model.
     """
-    qs = Rating.objects.all().values("customer_id", "product_id", "rating")
-    df = pd.DataFrame(list(qs))
+    snapshot = get_user_item_snapshot()
 
-    if df.empty:
+    if snapshot.empty:
         print("❌ No ratings found in DB.")
         return None
 
-    # pivot table: rows=customers, cols=products
-    matrix = df.pivot_table(index="customer_id", columns="product_id", values="rating", aggfunc="mean").fillna(0)
+    product_ids = snapshot.product_ids
 
-    # compute item-item similarity
-    sim = cosine_similarity(matrix.T)
-    sim_df = pd.DataFrame(sim, index=matrix.columns, columns=matrix.columns)
+    if top_k is None:
+        # compute item-item similarity (dense, O(items²))
+        sim = cosine_similarity(snapshot.matrix.T, dense_output=True)
+        sim_df = pd.DataFrame(sim, index=product_ids, columns=product_ids)
 
-    # save to disk
-    model_path = os.path.join(TRAINED_MODELS_DIR, "recommender_similarity.pkl")
-    with open(model_path, "wb") as f:
-        pickle.dump(sim_df, f)
+        # save as a memory-mapped artifact and point SavedModel at it
+        model_path = model_registry.publish_frame("recommender_similarity", sim_df, TRAINED_MODELS_DIR)
+        print(f"✅ Model trained (items={len(sim_df)}) and saved → {model_path}")
+        return sim_df
 
-    # save path to SavedModel table
-    SavedModel.objects.update_or_create(
-        name="recommender_similarity",
-        defaults={"file_path": model_path},
+    sim, stats = topk_cosine_similarity(snapshot.matrix, k=top_k, min_similarity=min_similarity)
+    stats["accuracy_vs_dense"] = compare_with_dense(snapshot.matrix, sim)
+    model_path = model_registry.publish_csr(
+        "recommender_similarity", sim, product_ids, TRAINED_MODELS_DIR, meta=stats
     )
-
-    print(f"✅ Model trained (items={len(sim_df)}) and saved → {model_path}")
-    return sim_df
+    print(f"✅ Sparse model trained (items={stats['n']}, k={stats['k']}, nnz={stats['nnz']}, "
+          f"overlap@{stats['accuracy_vs_dense']['top_n']}={stats['accuracy_vs_dense']['overlap_at_n']}) "
+          f"and saved → {model_path}")
+    return artifacts.LabelledCSR(sim, product_ids, stats)
 
 
 
 def recommendations_with_scores(user_id, top_n=5):
     """Return top-N recommendations with predicted scores."""
-    from recommender.models import Rating, Item
-    import pandas as pd
 
     # Get recommended items
     items = generate_recommendations_for_user(user_id, top_n=top_n)
@@ -378,29 +496,27 @@ def recommendations_with_scores(user_id, top_n=5):
             for r in items
         ]
 
-    # Create user-item pivot table
-    ratings_df = pd.DataFrame(list(Rating.objects.all().values("customer_id", "product_id", "rating")))
-    if ratings_df.empty:
-        return [
-            {"product_id": r.product_id, "title": r.title, "category": r.category, "score": None}
-            for r in items
-        ]
-
-    pivot_table = ratings_df.pivot_table(index="customer_id", columns="product_id", values="rating").fillna(0)
-
-    if user_id not in pivot_table.index:
+    # User ratings from the in-memory user-item store
+    snapshot = get_user_item_snapshot()
+    if snapshot.empty or not snapshot.has_customer(user_id):
         return [
             {"product_id": r.product_id, "title": r.title, "category": r.category, "score": None}
             for r in items
         ]
 
-    user_vector = pivot_table.loc[user_id].values.reshape(1, -1)
-    scores = (similarity_matrix.values @ user_vector.T).flatten()
+    if isinstance(similarity_matrix, (pd.DataFrame, artifacts.LabelledCSR)) and len(similarity_matrix.index):
+        sim_index = [int(p) for p in similarity_matrix.index]
+    else:
+        sim_index = [int(p) for p in snapshot.product_ids]
+    user_vector = snapshot.user_vector(user_id, sim_index).reshape(1, -1)
+    sim_mat = similarity_matrix.matrix if isinstance(similarity_matrix, artifacts.LabelledCSR) else similarity_matrix.values
+    scores = np.asarray(sim_mat @ user_vector.T).flatten()
+    position = {pid: i for i, pid in enumerate(sim_index)}
 
     scored_items = []
     for r in items:
-        if r.product_id in pivot_table.columns:
-            score = scores[pivot_table.columns.get_loc(r.product_id)]
+        if r.product_id in position:
+            score = scores[position[r.product_id]]
         else:
             score = None
         scored_items.append({
@@ -0,0 +1,99 @@
+# recommender/signals.py
+import threading
+
+from django.db import transaction
+from django.db.models import Avg
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from crmapp.models import Product, TaxInvoice, TaxInvoiceItem
+from recommender.models import Item, Rating
+from recommender.copurchase_index import FOLD_DELAY_SECONDS, queue_invoice_baskets
+from recommender.product_catalog import product_catalog
+from recommender.rating_store import rating_store
+from recommender.tasks import update_copurchase_baskets
+
+
+def _refresh_rating_cell(customer_id, product_id):
+    """Recompute the mean rating of one (customer, product) cell after commit."""
+    if customer_id is None or product_id is None:
+        return
+
+    def apply():
+        avg = (
+            Rating.objects
+            .filter(customer_id=customer_id, product_id=product_id)
+            .aggregate(avg=Avg("rating"))["avg"]
+        )
+        rating_store.update_cell(customer_id, product_id, avg)
+
+    transaction.on_commit(apply)
+
+
+# ------------------- Rating → user-item store -------------------
+@receiver(pre_save, sender=Rating)
+def remember_previous_rating_cell(sender, instance, **kwargs):
+    """Keep the old cell so a rating moved to another customer/product clears it."""
+    instance._previous_cell = None
+    if instance.pk and not instance._state.adding:
+        instance._previous_cell = (
+            Rating.objects.filter(pk=instance.pk).values_list("customer_id", "product_id").first()
+        )
+
+
+@receiver(post_save, sender=Rating)
+def update_store_on_rating_save(sender, instance, **kwargs):
+    cell = (instance.customer_id, instance.product_id)
+    previous = getattr(instance, "_previous_cell", None)
+    if previous and previous != cell:
+        _refresh_rating_cell(*previous)
+    _refresh_rating_cell(*cell)
+
+
+@receiver(post_delete, sender=Rating)
+def update_store_on_rating_delete(sender, instance, **kwargs):
+    _refresh_rating_cell(instance.customer_id, instance.product_id)
+
+
+# ------------------- Product / Item → product catalogue -------------------
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Item)
+@receiver(post_delete, sender=Item)
+def invalidate_product_catalog(sender, instance, **kwargs):
+    transaction.on_commit(product_catalog.invalidate)
+
+
+# ------------------- TaxInvoice → co-purchase index -------------------
+_pending = threading.local()
+
+
+def _flush_invoices():
+    invoice_ids = getattr(_pending, "invoice_ids", None)
+    if not invoice_ids:
+        return
+    _pending.invoice_ids = set()
+    if queue_invoice_baskets(sorted(invoice_ids)):
+        update_copurchase_baskets.apply_async(countdown=FOLD_DELAY_SECONDS)
+
+
+def _queue_invoice(invoice_id):
+    """Collect invoices touched in this transaction; the first callback after commit records them all."""
+    if invoice_id is None:
+        return
+    if getattr(_pending, "invoice_ids", None) is None:
+        _pending.invoice_ids = set()
+    _pending.invoice_ids.add(invoice_id)
+    transaction.on_commit(_flush_invoices)
+
+
+@receiver(post_save, sender=TaxInvoiceItem)
+@receiver(post_delete, sender=TaxInvoiceItem)
+def update_copurchase_on_invoice_item(sender, instance, **kwargs):
+    _queue_invoice(instance.tax_invoice_id)
+
+
+@receiver(post_save, sender=TaxInvoice)
+@receiver(post_delete, sender=TaxInvoice)
+def update_copurchase_on_invoice(sender, instance, **kwargs):
+    _queue_invoice(instance.pk)
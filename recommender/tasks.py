@@ -2,6 +2,9 @@ from celery import shared_task
 from recommender.utils import train_content_model, train_cf_svd
 from recommender.models import PestRecommendation, SentMessageLog
 from recommender.rapbooster_api import send_recommendation_message
+from recommender.recommendation_cache import materialize_recommendations
+from recommender.copurchase_index import build_copurchase_index, fold_pending_baskets
+from recommender.implicit_als import train_implicit_als
 from crmapp.models import customer_details as Customer
 
 
@@ -10,12 +13,41 @@ from crmapp.models import customer_details as Customer
 # ==========================================
 @shared_task
 def retrain_recommenders():
-    """Retrain both recommender models (content & collaborative)."""
+    """Retrain the recommender models (content, collaborative, co-purchase & implicit ALS)."""
     train_content_model()
     train_cf_svd()
+    build_copurchase_index()
+    train_implicit_als()
     return "✅ Recommenders retrained successfully"
 
 
+# ==========================================
+# 🔹 Task 1b: Materialize Per-Customer Recommendations
+# ==========================================
+@shared_task
+def refresh_recommendation_cache(full=False):
+    """
+    Fill CustomerRecommendationCache in bulk. Only customers whose ratings,
+    invoices or interactions changed (or whose row expired) are recomputed
+    unless `full` is set.
+    """
+    summary = materialize_recommendations(full=full)
+    return f"✅ Recommendation cache refreshed: {summary}"
+
+
+# ==========================================
+# 🔹 Task 1c: Fold Changed Invoices into the Co-Purchase Index
+# ==========================================
+@shared_task
+def update_copurchase_baskets():
+    """
+    Apply the invoices saved / deleted since the last fold (recorded by
+    recommender.signals; scheduled with a countdown and swept by beat).
+    """
+    count = fold_pending_baskets()
+    return f"✅ Co-purchase index updated for {count} invoices"
+
+
 # ==========================================
 # 🔹 Task 2: Send Recommendations via API
 # ==========================================
@@ -0,0 +1,31 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from .rating_store import UserItemStore
+
+
+@override_settings(CACHES={
+    "default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": "rating-store-tests"},
+})
+class UserItemStoreGenerationTests(TestCase):
+    """Two UserItemStores sharing one cache stand in for two worker processes."""
+
+    def setUp(self):
+        cache.clear()
+        self.first, self.second = UserItemStore(), UserItemStore()
+        self.first.snapshot()
+        self.second.snapshot()
+
+    def test_own_write_keeps_store_current(self):
+        self.first.update_cell(1, 10, 4.0)
+        self.assertFalse(self.first._is_stale())
+        self.assertTrue(self.second._is_stale())
+
+    def test_own_write_does_not_adopt_other_processes_writes(self):
+        self.first.update_cell(1, 10, 4.0)
+        self.second.update_cell(2, 20, 5.0)
+        self.assertTrue(self.second._is_stale())
+        self.assertTrue(self.first._is_stale())
+
+        self.second.snapshot()
+        self.assertFalse(self.second._is_stale())
@@ -35,6 +35,7 @@ urlpatterns = [
     path('api/collaborative/<int:customer_id>/', views.collaborative_view, name='api_collaborative'),
     path('api/upsell/<int:product_id>/', views.upsell_view, name='api_upsell'),
     path('api/crosssell/<int:customer_id>/', views.crosssell_view, name='api_crosssell'),
+    path('api/hybrid/<int:customer_id>/', views.hybrid_view, name='api_hybrid'),
 
     # ======================================
     # 💬 MESSAGE CREATION & SENDING
@@ -0,0 +1,132 @@
+# recommender/user_based_cf.py
+"""
+NumPy user-based collaborative filtering over the precomputed user × item
+rating matrix and user × user similarity matrix in trained_models/.
+
+Both matrices come from recommender.artifacts as memory-mapped arrays and
+are used in place (the similarity matrix is only copied if its user order
+differs from the rating matrix). The similarity may be dense or a sparse
+top-K model (LabelledCSR). The engine is rebuilt only when a new
+artifact version is published. Scoring a user is two matrix-vector products:
+
+    weighted_sum = s @ R            total_sim = s @ (R > 0)
+    score        = weighted_sum / total_sim   (unrated items, total_sim > 0)
+
+where `s` is the user's similarity row with non-positive entries zeroed and,
+optionally, everything outside the `k_neighbours` most similar users dropped.
+The rated mask (R > 0) is built once, as a sparse matrix, when the engine
+is loaded rather than materialised densely on every request.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from recommender.artifacts import LabelledCSR
+
+
+class UserBasedCF:
+    def __init__(self, user_item, similarity):
+        self.user_ids = user_item.index.astype(np.int64).to_numpy()
+        self.item_ids = user_item.columns.astype(np.int64).to_numpy()
+        self.user_index = {int(u): i for i, u in enumerate(self.user_ids)}
+        # views over the (memory-mapped) artifact arrays; no per-process copies
+        self.ratings = user_item.to_numpy(dtype=np.float64, copy=False)
+
+        if isinstance(similarity, LabelledCSR):
+            self.similarity = self._align_sparse(similarity)
+        else:
+            self.similarity = self._align_dense(similarity)
+
+        # (R > 0) as float CSR, transposed for the per-request product
+        self.rated_t = sparse.csr_matrix(self.ratings > 0, dtype=np.float64).T.tocsr()
+        sums = self.ratings.sum(axis=0)
+        counts = np.diff(self.rated_t.indptr)
+        means = np.divide(sums, counts, out=np.full_like(sums, -np.inf), where=counts > 0)
+        self.popular_items = self.item_ids[np.argsort(-means, kind="stable")[:int((counts > 0).sum())]]
+
+    def _align_dense(self, similarity):
+        """Dense user similarity in this model's user order; users without a row / column get 0."""
+        sim_ids = similarity.index.astype(np.int64).to_numpy()
+        sim_cols = similarity.columns.astype(np.int64).to_numpy()
+        if np.array_equal(sim_ids, self.user_ids) and np.array_equal(sim_cols, self.user_ids):
+            return similarity.to_numpy(dtype=np.float64, copy=False)
+        aligned = pd.DataFrame(similarity.to_numpy(), index=sim_ids, columns=sim_cols)
+        return aligned.reindex(index=self.user_ids, columns=self.user_ids, fill_value=0.0).to_numpy(dtype=np.float64)
+
+    def _align_sparse(self, similarity):
+        """Top-K user similarity (LabelledCSR) in this model's user order; unknown users dropped."""
+        sim_ids = np.asarray(similarity.index, dtype=np.int64)
+        if np.array_equal(sim_ids, self.user_ids):
+            return similarity.matrix
+        position = np.array([self.user_index.get(int(u), -1) for u in sim_ids])
+        coo = similarity.matrix.tocoo()
+        rows, cols = position[coo.row], position[coo.col]
+        keep = (rows >= 0) & (cols >= 0)
+        n = len(self.user_ids)
+        return sparse.csr_matrix((coo.data[keep], (rows[keep], cols[keep])), shape=(n, n))
+
+    def has_user(self, user_id):
+        return user_id in self.user_index
+
+    def neighbour_weights(self, user_id, k_neighbours=None):
+        """Similarity row of `user_id` with non-positive weights (and, with k, all but the top k) zeroed."""
+        row = self.user_index[user_id]
+        sim_row = self.similarity[row]
+        sim_row = sim_row.toarray().ravel() if sparse.issparse(sim_row) else sim_row
+        weights = np.where(sim_row > 0, sim_row, 0.0)
+        if k_neighbours is not None:
+            weights[row] = 0.0
+            nonzero = np.count_nonzero(weights)
+            if nonzero > k_neighbours:
+                cutoff = np.argpartition(-weights, k_neighbours)[k_neighbours:]
+                weights[cutoff] = 0.0
+        return weights
+
+    def scores(self, user_id, k_neighbours=None):
+        """(item_ids, scores) for the items `user_id` has not rated and similar users have."""
+        row = self.user_index[user_id]
+        weights = self.neighbour_weights(user_id, k_neighbours)
+        weighted_sum = weights @ self.ratings
+        total_sim = self.rated_t @ weights
+
+        candidates = (self.ratings[row] == 0) & (total_sim > 0)
+        return self.item_ids[candidates], weighted_sum[candidates] / total_sim[candidates]
+
+    def recommend(self, user_id, top_n=5, k_neighbours=None):
+        """Best `top_n` (item_id, score) pairs, highest first."""
+        item_ids, scores = self.scores(user_id, k_neighbours)
+        if len(scores) == 0:
+            return []
+        k = min(top_n, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(int(item_ids[i]), float(scores[i])) for i in top]
+
+
+# ------------------------
+# Process-wide cache
+# ------------------------
+_lock = threading.Lock()
+_loaded = None  # (user_item frame, similarity frame, UserBasedCF)
+
+
+def load_user_based_cf(user_item, similarity):
+    """
+    UserBasedCF over the given frames, rebuilt only when a new artifact
+    version (a different frame object) is passed in. None if either is missing.
+    """
+    global _loaded
+    if user_item is None or similarity is None:
+        return None
+
+    entry = _loaded
+    if entry is not None and entry[0] is user_item and entry[1] is similarity:
+        return entry[2]
+
+    with _lock:
+        entry = _loaded
+        if entry is None or entry[0] is not user_item or entry[1] is not similarity:
+            entry = _loaded = (user_item, similarity, UserBasedCF(user_item, similarity))
+        return entry[2]
@@ -1,13 +1,20 @@
+import itertools
 import os
+import resource
+import time
+import tracemalloc
 import joblib
 import numpy as np
 import pandas as pd
+from scipy import sparse
 from django.conf import settings
 from django.db import models  # ✅ Added for Avg() aggregation
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.decomposition import TruncatedSVD
 from .models import Item, Rating, SavedModel
+from . import model_registry
+from .ann_index import build_content_index
 
 from .models import SentMessageLog
 import requests
@@ -40,20 +47,25 @@ def train_content_model(save=True):
 
     # Save the model to disk
     model_path = os.path.join(MODEL_DIR, 'content_tfidf.joblib')
+    ids = df['id'].tolist()
+    payload = {
+        'tfidf': tfidf,
+        'matrix': tfidf_matrix,
+        'ids': ids,
+        'positions': {id_: i for i, id_ in enumerate(ids)},
+        'index': build_content_index(tfidf_matrix),
+    }
     if save:
-        joblib.dump({'tfidf': tfidf, 'matrix': tfidf_matrix, 'ids': df['id'].tolist()}, model_path)
-        SavedModel.objects.update_or_create(name='content_tfidf', defaults={'file_path': model_path})
+        model_registry.publish_model('content_tfidf', payload, model_path)
 
-    return {'tfidf': tfidf, 'matrix': tfidf_matrix, 'ids': df['id'].tolist()}
+    return payload
 
 
 def load_content_model():
-    """Load the saved TF-IDF model."""
+    """Load the saved TF-IDF model (cached per process by model_registry)."""
     try:
-        sm = SavedModel.objects.get(name='content_tfidf')
-        data = joblib.load(sm.file_path)
-        return data
-    except SavedModel.DoesNotExist:
+        return model_registry.get_model('content_tfidf')
+    except (SavedModel.DoesNotExist, OSError):
         return None
 
 
@@ -66,19 +78,22 @@ def recommended_items_content(item_id, top_k=10):
             return []
 
     ids = data['ids']
-    if item_id not in ids:
+    positions = data.get('positions') or {id_: i for i, id_ in enumerate(ids)}
+    idx = positions.get(item_id)
+    if idx is None:
         return []
 
-    idx = ids.index(item_id)
-    matrix = data['matrix']
-
-    # Compute cosine similarity between the given item and all others
-    sim = cosine_similarity(matrix[idx], matrix).flatten()
-
-    # Sort and exclude the same item
-    top_idx = np.argsort(-sim)
-    top_idx = [i for i in top_idx if ids[i] != item_id][:top_k]
-    top_ids = [ids[i] for i in top_idx]
+    index = data.get('index')
+    if index is not None:
+        # ANN lookup built at training time (exact scan for small catalogues)
+        top_ids = [ids[i] for i, _ in index.query(idx, top_k)]
+    else:
+        # models saved before the index existed: exact scan
+        sim = cosine_similarity(data['matrix'][idx], data['matrix']).flatten()
+        sim[idx] = -np.inf
+        k = min(top_k, len(ids) - 1)
+        top_idx = np.argpartition(-sim, k - 1)[:k] if k > 0 else []
+        top_ids = [ids[i] for i in sorted(top_idx, key=lambda i: -sim[i])]
 
     # Return Item queryset in same order
     id_to_order = {id_: i for i, id_ in enumerate(top_ids)}
@@ -90,54 +105,109 @@ def recommended_items_content(item_id, top_k=10):
 # =======================================================
 # 🤝 COLLABORATIVE FILTERING (SVD)
 # =======================================================
-def train_cf_svd(n_components=50, save=True):
-    """Train a Collaborative Filtering model using SVD."""
-    ratings = Rating.objects.all().values('user_id', 'item_id', 'rating')
-    df = pd.DataFrame(list(ratings))
-    if df.empty:
-        return None
-
-    user_ids = df['user_id'].unique().tolist()
-    item_ids = df['item_id'].unique().tolist()
-    user_map = {u: i for i, u in enumerate(user_ids)}
-    item_map = {it: i for i, it in enumerate(item_ids)}
-
-    # Build user-item matrix
-    R = np.zeros((len(user_ids), len(item_ids)))
-    for row in df.itertuples():
-        R[user_map[row.user_id], item_map[row.item_id]] = row.rating
-
-    # Train SVD
-    svd = TruncatedSVD(n_components=min(n_components, min(R.shape) - 1))
-    user_factors = svd.fit_transform(R)  # (n_users, k)
-    item_factors = svd.components_.T     # (n_items, k)
+RATING_CHUNK_SIZE = 20000
+
+
+def _stream_rating_matrix(chunk_size=RATING_CHUNK_SIZE):
+    """
+    Stream (customer, product, rating) rows from the DB in chunks into a CSR
+    matrix (mean rating per cell). Memory grows with the number of ratings,
+    never with users × items. Returns (csr, customer_ids, product_ids).
+    """
+    rows = (
+        Rating.objects
+        .filter(customer__isnull=False, product__isnull=False)
+        .values_list('customer_id', 'product_id', 'rating')
+        .iterator(chunk_size=chunk_size)
+    )
+    customers, products, values = [], [], []
+    while True:
+        chunk = list(itertools.islice(rows, chunk_size))
+        if not chunk:
+            break
+        c, p, r = zip(*chunk)
+        customers.append(np.asarray(c, dtype=np.int64))
+        products.append(np.asarray(p, dtype=np.int64))
+        values.append(np.asarray(r, dtype=np.float32))
+
+    if not values:
+        return None, [], []
+
+    user_ids, user_idx = np.unique(np.concatenate(customers), return_inverse=True)
+    item_ids, item_idx = np.unique(np.concatenate(products), return_inverse=True)
+    ratings = np.concatenate(values)
+    shape = (len(user_ids), len(item_ids))
+
+    sums = sparse.csr_matrix((ratings, (user_idx, item_idx)), shape=shape, dtype=np.float32)
+    counts = sparse.csr_matrix((np.ones_like(ratings), (user_idx, item_idx)), shape=shape, dtype=np.float32)
+    sums.sum_duplicates()
+    counts.sum_duplicates()
+    sums.data /= counts.data
+    return sums, user_ids.tolist(), item_ids.tolist()
+
+
+def train_cf_svd(n_components=50, save=True, chunk_size=RATING_CHUNK_SIZE, trace_memory=False):
+    """
+    Train a Collaborative Filtering model using SVD on the sparse
+    customer × product rating matrix (streamed from the DB in chunks).
+    Wall time and the process's peak RSS are stored in
+    payload['training_stats']; trace_memory=True also records the peak of
+    tracemalloc, which slows every allocation down while training.
+    """
+    started = time.perf_counter()
+    tracing = trace_memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    try:
+        R, user_ids, item_ids = _stream_rating_matrix(chunk_size)
+        if R is None or min(R.shape) < 2:
+            return None
+
+        # Train SVD directly on the sparse matrix (randomized solver, no densification)
+        svd = TruncatedSVD(n_components=min(n_components, min(R.shape) - 1), algorithm='randomized')
+        user_factors = svd.fit_transform(R).astype(np.float32)  # (n_users, k)
+        item_factors = svd.components_.T.astype(np.float32)     # (n_items, k)
+        peak_bytes = tracemalloc.get_traced_memory()[1] if trace_memory else None
+    finally:
+        if tracing:
+            tracemalloc.stop()
+
+    stats = {
+        'n_users': R.shape[0],
+        'n_items': R.shape[1],
+        'n_ratings': int(R.nnz),
+        'n_components': int(svd.n_components),
+        'wall_seconds': round(time.perf_counter() - started, 3),
+        'max_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    if peak_bytes is not None:
+        stats['peak_traced_mb'] = round(peak_bytes / 2**20, 1)
+    print(f"✅ CF SVD trained: {stats}")
 
     model_path = os.path.join(MODEL_DIR, 'cf_svd.joblib')
     payload = {
         'svd': svd,
-        'user_map': user_map,
-        'item_map': item_map,
+        'user_map': {u: i for i, u in enumerate(user_ids)},
+        'item_map': {it: i for i, it in enumerate(item_ids)},
         'user_ids': user_ids,
         'item_ids': item_ids,
         'user_factors': user_factors,
         'item_factors': item_factors,
+        'training_stats': stats,
     }
 
     # Save model
     if save:
-        joblib.dump(payload, model_path)
-        SavedModel.objects.update_or_create(name='cf_svd', defaults={'file_path': model_path})
+        model_registry.publish_model('cf_svd', payload, model_path)
 
     return payload
 
 
 def load_cf_svd():
-    """Load the saved SVD collaborative filtering model."""
+    """Load the saved SVD collaborative filtering model (cached per process by model_registry)."""
     try:
-        sm = SavedModel.objects.get(name='cf_svd')
-        data = joblib.load(sm.file_path)
-        return data
-    except SavedModel.DoesNotExist:
+        return model_registry.get_model('cf_svd')
+    except (SavedModel.DoesNotExist, OSError):
         return None
 
 
@@ -159,23 +229,26 @@ def recommended_items_cf(user_id, top_k=10):
     # Cold-start handling
     if user_id not in user_map:
         popular = (
-            Rating.objects.values('item_id')
+            Rating.objects.filter(product__isnull=False)
+            .values('product_id')
             .annotate(avg=models.Avg('rating'))
             .order_by('-avg')[:top_k]
         )
-        return [Item.objects.get(pk=p['item_id']) for p in popular]
-
-    # Compute recommendations
-    uidx = user_map[user_id]
-    user_vector = user_factors[uidx]  # (k,)
-    scores = item_factors.dot(user_vector)  # (n_items,)
-    top_idx = np.argsort(-scores)[:top_k]
-    top_item_ids = [item_ids[i] for i in top_idx]
-
-    # Return Items in order
+        top_item_ids = [p['product_id'] for p in popular]
+    else:
+        # Compute recommendations
+        uidx = user_map[user_id]
+        user_vector = user_factors[uidx]  # (k,)
+        scores = item_factors.dot(user_vector)  # (n_items,)
+        k = min(top_k, len(scores))
+        top_idx = np.argpartition(-scores, k - 1)[:k]
+        top_idx = top_idx[np.argsort(-scores[top_idx])]
+        top_item_ids = [item_ids[i] for i in top_idx]
+
+    # Return Items in order (model ids are product ids)
     id_to_order = {id_: i for i, id_ in enumerate(top_item_ids)}
-    items = list(Item.objects.filter(id__in=top_item_ids))
-    items.sort(key=lambda x: id_to_order[x.id])
+    items = list(Item.objects.filter(product_id__in=top_item_ids))
+    items.sort(key=lambda x: id_to_order[x.product_id])
     return items
 
  
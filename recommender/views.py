@@ -5,7 +5,6 @@ from django.db import connection
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
-from django.core.paginator import Paginator
 import json
 import pickle
 import os
@@ -27,6 +26,10 @@ from .recommender_engine import (
 )
 
 from .utils import send_recommendation_message
+from .recommendation_cache import get_cached_recommendations, store_recommendations
+from .hybrid_ranker import rank_for_customer
+from . import dashboard_query
+from .product_catalog import product_catalog
 
 # Helper: Render placeholders
 def render_template(text, data):
@@ -93,7 +96,10 @@ def recommendations_view(request):
 # ============================================================
 def collaborative_view(request, customer_id):
     try:
-        results = get_collaborative_recommendations(customer_id)
+        results = get_cached_recommendations(customer_id, "collaborative")
+        if results is None:
+            results = get_collaborative_recommendations(customer_id)
+            store_recommendations(customer_id, "collaborative", results)
         return JsonResponse({'similar_customers': results})
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
@@ -113,11 +119,39 @@ def upsell_view(request, product_id):
 # ============================================================
 def crosssell_view(request, customer_id):
     try:
-        results = get_crosssell_recommendations(customer_id)
+        results = get_cached_recommendations(customer_id, "crosssell")
+        if results is None:
+            results = [
+                {"product_id": i.product_id, "title": i.title, "category": i.category}
+                for i in get_crosssell_recommendations(customer_id)
+            ]
+            store_recommendations(customer_id, "crosssell", results)
         return JsonResponse({'cross_sell_suggestions': results})
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
+# ============================================================
+# 🔀 HYBRID RANKING (all candidate sources, fused)
+# ============================================================
+def _may_force_debug(user):
+    """?debug=1 writes a HybridRankingDebug row per call: staff and CRM admins only."""
+    if not user.is_authenticated:
+        return False
+    return user.is_staff or (hasattr(user, 'userprofile') and user.userprofile.role == 'admin')
+
+
+def hybrid_view(request, customer_id):
+    try:
+        top_n = int(request.GET.get("top_n", 10))
+        # everyone else gets the sampled default (DEBUG_SAMPLE_RATE)
+        debug = True if request.GET.get("debug") == "1" and _may_force_debug(request.user) else None
+        results = rank_for_customer(customer_id, top_n=top_n, debug=debug)
+        for r in results:
+            r["title"] = product_catalog.title(r["product_id"])
+        return JsonResponse({'customer_id': customer_id, 'recommendations': results})
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
 # ============================================================
 # 6️⃣ DASHBOARD TABLE (CRM)
 # ============================================================
@@ -127,82 +161,25 @@ def recommendation_dashboard(request):
         search = request.GET.get("search", "").strip()
         sort_column = request.GET.get("sort", "confidence_score")
         sort_order = request.GET.get("order", "desc")
-
-        # Allowed sorting fields
-        valid_columns = {
-            "customer_name": "c.fullname",
-            "base_product": "bp.product_name",
-            "recommended_product": "rp.product_name",
-            "recommendation_type": "pr.recommendation_type",
-            "confidence_score": "pr.confidence_score",
-        }
-        sort_field = valid_columns.get(sort_column, "pr.confidence_score")
-        order_sql = "DESC" if sort_order == "desc" else "ASC"
-
-        # Base SQL
-        sql = """
-            SELECT 
-                c.fullname AS customer_name,
-                c.primarycontact AS phone_number,
-                bp.product_name AS base_product,
-                bp.category AS base_product_category,
-                rp.product_name AS recommended_product,
-                rp.category AS recommended_product_category,
-                pr.recommendation_type,
-                pr.confidence_score
-            FROM pest_recommendations pr
-            LEFT JOIN crmapp_customer_details c ON pr.customer_id = c.id
-            LEFT JOIN crmapp_product bp ON pr.base_product_id = bp.product_id
-            LEFT JOIN crmapp_product rp ON pr.recommended_product_id = rp.product_id
-            WHERE 1=1
-        """
-
-        params = []
-
-        # 🔥 Filter recommendation type (case-insensitive)
-        # Handles: "upsell", "UpSell", "up sell", "UP_SELL", etc.
-        if filter_type:
-            sql += " AND LOWER(pr.recommendation_type) LIKE %s"
-            params.append(f"%{filter_type.lower()}%")
-
-        # 🔍 Search (customer or products)
-        if search:
-            sql += """
-                AND (
-                    c.fullname LIKE %s OR
-                    bp.product_name LIKE %s OR
-                    rp.product_name LIKE %s
-                )
-            """
-            params.extend([f"%{search}%"] * 3)
-
-        # Sorting
-        sql += f" ORDER BY {sort_field} {order_sql};"
-
-        # Fetch data
-        with connection.cursor() as cursor:
-            cursor.execute(sql, params)
-            rows = cursor.fetchall()
-
-        data = []
-        for row in rows:
-            data.append({
-                "customer_name": row[0],
-                "phone_number": str(row[1]) if row[1] else None,
-                "base_product": row[2],
-                "base_product_category": row[3],
-                "recommended_product": row[4],
-                "recommended_product_category": row[5],
-                "recommendation_type": row[6],
-                "confidence_score": float(row[7]) if row[7] is not None else None,
-            })
-
-        # Pagination
-        page_obj = Paginator(data, 10).get_page(request.GET.get("page"))
+        if sort_column not in dashboard_query.SORT_COLUMNS:
+            sort_column = "confidence_score"
+
+        # Keyset pagination: one LIMITed query per page (see recommender/dashboard_query.py)
+        filters = dashboard_query.build_filters(filter_type, search)
+        page = dashboard_query.fetch_page(
+            sort=sort_column,
+            order=sort_order,
+            after=request.GET.get("after"),
+            before=request.GET.get("before"),
+            filters=filters,
+        )
+        total, total_capped = dashboard_query.count_rows(filter_type, search, filters=filters)
 
         return render(request, "recommender/recommendation_dashboard.html", {
-            "recommendations": page_obj.object_list,
-            "page_obj": page_obj,
+            "recommendations": page["rows"],
+            "page": page,
+            "total": total,
+            "total_capped": total_capped,
             "sort": sort_column,
             "order": sort_order,
             "filter_type": filter_type,
@@ -242,47 +219,55 @@ def api_ai_personalized(request, customer_id):
         customer_id = int(customer_id)  # Ensure it's an integer
         customer = get_object_or_404(customer_details, id=customer_id)
         
-        # Generate recommendations with error handling
-        try:
-            recommendations = generate_recommendations_for_user(customer_id=customer_id, top_n=5)
-        except Exception as e:
-            logger.error(f"Error generating recommendations for customer {customer_id}: {str(e)}")
-            recommendations = Item.objects.none()  # Fallback to empty queryset
-        
-        # Process recommendations into a consistent format
-        results = []
-        for r in recommendations:
+        # Materialized list first (filled nightly, refreshed on expiry)
+        results = get_cached_recommendations(customer_id, "personalized", top_n=5)
+        if results is None:
+            # Generate recommendations with error handling
+            generated = True
             try:
-                if isinstance(r, Item):
-                    # Use Item fields directly; product_id is the ForeignKey value
-                    results.append({
-                        "product_id": r.product_id,  # ID of the related Product
-                        "title": r.title,
-                        "category": r.category,
-                        "tags": r.tags,
-                        "confidence_score": getattr(r, "score", None),  # Attached in engine
-                    })
-                elif hasattr(r, 'id'):  # For Product or other models (fallback)
-                    results.append({
-                        "product_id": r.id,
-                        "title": getattr(r, "product_name", str(r)),  # Assuming Product has product_name
-                        "category": getattr(r, "category", None),
-                        "tags": getattr(r, "tags", ""),
-                        "confidence_score": getattr(r, "score", None),
-                    })
-                else:
-                    # Generic fallback for unexpected types
-                    results.append({
-                        "product_id": getattr(r, "id", None),
-                        "title": getattr(r, "title", str(r)),
-                        "category": getattr(r, "category", None),
-                        "tags": getattr(r, "tags", None),
-                        "confidence_score": getattr(r, "score", None),
-                    })
+                recommendations = generate_recommendations_for_user(customer_id=customer_id, top_n=5)
             except Exception as e:
-                logger.warning(f"Error processing recommendation item for customer {customer_id}: {str(e)}")
-                continue  # Skip malformed items
+                logger.error(f"Error generating recommendations for customer {customer_id}: {str(e)}")
+                recommendations = Item.objects.none()  # Fallback to empty queryset
+                generated = False
         
+            # Process recommendations into a consistent format
+            results = []
+            for r in recommendations:
+                try:
+                    if isinstance(r, Item):
+                        # Use Item fields directly; product_id is the ForeignKey value
+                        results.append({
+                            "product_id": r.product_id,  # ID of the related Product
+                            "title": r.title,
+                            "category": r.category,
+                            "tags": r.tags,
+                            "confidence_score": getattr(r, "score", None),  # Attached in engine
+                        })
+                    elif hasattr(r, 'id'):  # For Product or other models (fallback)
+                        results.append({
+                            "product_id": r.id,
+                            "title": getattr(r, "product_name", str(r)),  # Assuming Product has product_name
+                            "category": getattr(r, "category", None),
+                            "tags": getattr(r, "tags", ""),
+                            "confidence_score": getattr(r, "score", None),
+                        })
+                    else:
+                        # Generic fallback for unexpected types
+                        results.append({
+                            "product_id": getattr(r, "id", None),
+                            "title": getattr(r, "title", str(r)),
+                            "category": getattr(r, "category", None),
+                            "tags": getattr(r, "tags", None),
+                            "confidence_score": getattr(r, "score", None),
+                        })
+                except Exception as e:
+                    logger.warning(f"Error processing recommendation item for customer {customer_id}: {str(e)}")
+                    continue  # Skip malformed items
+
+            if generated:
+                store_recommendations(customer_id, "personalized", results)
+
         # Always return a successful response
         return JsonResponse({
             "customer_id": customer.id,
@@ -459,7 +444,10 @@ def send_message_view(request):
 # ============================================================
 def customer_recommendations_api(request, customer_id):
     try:
-        recommendations = get_user_based_recommendations(customer_id)
+        recommendations = get_cached_recommendations(customer_id, "user_based")
+        if recommendations is None:
+            recommendations = get_user_based_recommendations(customer_id)
+            store_recommendations(customer_id, "user_based", recommendations)
         return JsonResponse({
             "customer_id": customer_id,
             "recommendations": recommendations
@@ -1,13 +1,11 @@
-import pickle
 import numpy as np
 import pandas as pd
 
-# Load trained model
-with open("recommender_model.pkl", "rb") as f:
-    model_data = pickle.load(f)
+from recommender import artifacts
 
-pivot = model_data["pivot"]
-user_similarity = model_data["user_similarity"]
+# Load trained model (written by train_model.py)
+pivot = artifacts.load_frame("trained_models", "simple_cf_pivot")
+user_similarity = artifacts.load_frame("trained_models", "simple_cf_user_similarity")
 
 # Extract user and item lists
 users = pivot.index.tolist()
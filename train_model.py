@@ -1,7 +1,10 @@
 import pandas as pd
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
-import pickle
+
+from recommender import artifacts
+
+MODELS_DIR = "trained_models"
 
 # ===================================
 # 📥 Load fabricated or database data
@@ -22,12 +25,7 @@ print("✅ User similarity matrix shape:", user_similarity_df.shape)
 # ===================================
 # 💾 Save model artifacts
 # ===================================
-model_data = {
-    "pivot": pivot,
-    "user_similarity": user_similarity_df
-}
-
-with open("recommender_model.pkl", "wb") as f:
-    pickle.dump(model_data, f)
+artifacts.save_frame(MODELS_DIR, "simple_cf_pivot", pivot)
+artifacts.save_frame(MODELS_DIR, "simple_cf_user_similarity", user_similarity_df)
 
 print("✅ Model trained and saved successfully (simple CF model).")